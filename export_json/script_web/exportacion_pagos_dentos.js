@@ -1,9 +1,10 @@
 // ==UserScript==
 // @name         DentOS - Exportar Listado de Pagos (Dia/Semana)
 // @namespace    yonnier.dentos
-// @version      1.0.0
+// @version      1.1.0
 // @description  Exporta Listado de pagos por dia o semana (Lun-Sab) en JSON
 // @match        https://previred.clinicos.co/cuadrecaja/*
+// @match        http://localhost:8000/*
 // @grant        none
 // @run-at       document-idle
 // ==/UserScript==
@@ -23,6 +24,18 @@
   const TIMEOUT_ACCION_MS = 20000;
   const TIMEOUT_TABLA_MS = 20000;
 
+  // Modo directo ("Exportar semana (rapido)"): pide el HTML de cada dia con fetch, sin tocar la vista.
+  // Plantillas con {fecha} (dd/mm/aaaa) y {fecha_iso}; null = se arma con el formulario de la pagina
+  // (Mostrar) y se sigue el enlace Detalles. Se pueden cambiar sin editar el script con
+  // localStorage "dentos_export.url_listado" / "dentos_export.url_totales" (p. ej. HTML guardados en local).
+  // (El @match de localhost:8000 es solo para esos HTML guardados: python -m http.server 8000.)
+  const URL_LISTADO_TEMPLATE = null;
+  const URL_TOTALES_TEMPLATE = null;
+  // Solo con plantilla de listado: sin ella cada dia cambia la fecha de la sesion (Mostrar -> Detalles)
+  // y dos dias en paralelo se pisarian la fecha entre una peticion y otra; entonces va de a uno.
+  const FETCH_CONCURRENCIA = 3;
+  const TIMEOUT_FETCH_MS = 20000;
+
   let busy = false;
 
   function log(...args) {
@@ -157,8 +170,8 @@
     });
   }
 
-  function getFirstListadoDate() {
-    const table = findListadoTable();
+  function getFirstListadoDate(root = document) {
+    const table = findListadoTable(root);
     if (!table) return "";
     const firstRow = table.querySelectorAll("tr")[1];
     if (!firstRow) return "";
@@ -239,8 +252,8 @@
     log("Scroll obligatorio completado para validar carga de filas");
   }
 
-  function findListadoTable() {
-    const tables = Array.from(document.querySelectorAll("#cuadre_caja_detallado table, table"));
+  function findListadoTable(root = document) {
+    const tables = Array.from(root.querySelectorAll("#cuadre_caja_detallado table, table"));
     for (const table of tables) {
       const heads = Array.from(table.querySelectorAll("tr:first-child td, tr:first-child th"))
         .map((x) => keyText(x.textContent));
@@ -274,8 +287,8 @@
     return Number.isFinite(v) ? Math.round(v) : 0;
   }
 
-  function extractTotalDocumentos() {
-    const tables = Array.from(document.querySelectorAll("#cuadre_caja_detallado table, table"));
+  function extractTotalDocumentos(root = document) {
+    const tables = Array.from(root.querySelectorAll("#cuadre_caja_detallado table, table"));
     for (const table of tables) {
       const heads = Array.from(table.querySelectorAll("tr:first-child td, tr:first-child th"))
         .map((x) => keyText(x.textContent));
@@ -342,9 +355,8 @@
     }
   }
 
-  async function exportDia(dateObj, source = "dia", batchMeta = null) {
+  async function capturarDiaUI(dateObj) {
     const targetDate = formatFechaDDMMYYYY(dateObj);
-    log(`Procesando: ${targetDate} (${nombreDia(dateObj)})`);
     let lastErr = null;
     for (let intento = 1; intento <= MAX_REINTENTOS_DIA; intento += 1) {
       try {
@@ -370,9 +382,13 @@
     await forceScrollListado();
 
     const table = await waitForListadoTable();
-    const listado = extractListado(table);
+    return { listado: extractListado(table), totalDocumentos: extractTotalDocumentos() };
+  }
+
+  async function exportDia(dateObj, source = "dia", batchMeta = null) {
+    log(`Procesando: ${formatFechaDDMMYYYY(dateObj)} (${nombreDia(dateObj)})`);
+    const { listado, totalDocumentos } = await capturarDiaUI(dateObj);
     const total = listado.reduce((acc, r) => acc + r.valor, 0);
-    const totalDocumentos = extractTotalDocumentos();
     const iso = formatFechaISO(dateObj);
 
     const payload = {
@@ -398,6 +414,127 @@
     log(`Exportado ${fileName} | registros=${listado.length} | total=${total}`);
   }
 
+  function plantillaURL(tipo) {
+    let guardada = null;
+    try {
+      guardada = localStorage.getItem(`dentos_export.url_${tipo}`);
+    } catch (_) {
+      // no-op
+    }
+    return guardada || (tipo === "listado" ? URL_LISTADO_TEMPLATE : URL_TOTALES_TEMPLATE);
+  }
+
+  function aplicarPlantilla(tpl, date) {
+    const url = tpl
+      .replace(/\{fecha\}/g, encodeURIComponent(formatFechaDDMMYYYY(date)))
+      .replace(/\{fecha_iso\}/g, formatFechaISO(date));
+    return new URL(url, location.href).href;
+  }
+
+  function requestMostrar(date) {
+    // Lo mismo que envia el boton Mostrar, con la fecha del dia pedido.
+    const input = getFechaInput();
+    const form = input && input.form;
+    if (!form) throw new Error("Sin plantilla de URL y sin formulario de fecha en la pagina");
+    const params = new URLSearchParams();
+    for (const [k, v] of new FormData(form)) {
+      if (typeof v === "string") params.set(k, v);
+    }
+    params.set(input.name, formatFechaDDMMYYYY(date));
+    const btn = form.querySelector('input[name="btmostrar"]');
+    if (btn) params.set(btn.name, btn.value || "Mostrar");
+
+    const action = new URL(form.getAttribute("action") || location.href, location.href);
+    if ((form.getAttribute("method") || "get").toLowerCase() === "post") {
+      return { url: action.href, init: { method: "POST", body: params } };
+    }
+    params.forEach((v, k) => action.searchParams.set(k, v));
+    return { url: action.href, init: {} };
+  }
+
+  async function fetchDocumento(url, init = {}) {
+    const ctrl = new AbortController();
+    const timer = setTimeout(() => ctrl.abort(), TIMEOUT_FETCH_MS);
+    try {
+      const resp = await fetch(url, { credentials: "include", ...init, signal: ctrl.signal });
+      if (!resp.ok) throw new Error(`HTTP ${resp.status} en ${url}`);
+      // DentOS puede responder en latin-1: se decodifica con el charset declarado
+      const tipo = resp.headers.get("content-type") || "";
+      const charset = (tipo.match(/charset=([^;]+)/i) || [])[1] || "utf-8";
+      let decoder;
+      try {
+        decoder = new TextDecoder(charset.trim());
+      } catch (_) {
+        decoder = new TextDecoder("utf-8");
+      }
+      const html = decoder.decode(await resp.arrayBuffer());
+      // Documento aparte: no se ejecutan scripts ni se toca la vista actual
+      return { doc: new DOMParser().parseFromString(html, "text/html"), url: resp.url || url };
+    } catch (e) {
+      if (e.name === "AbortError") throw new Error(`Timeout (${TIMEOUT_FETCH_MS} ms) pidiendo ${url}`);
+      throw e;
+    } finally {
+      clearTimeout(timer);
+    }
+  }
+
+  function enlaceDetalles(doc, baseUrl) {
+    const a = Array.from(doc.querySelectorAll("a[href]")).find((x) => keyText(x.textContent) === "detalles");
+    const href = a ? a.getAttribute("href") : "";
+    if (!href || href.startsWith("#") || href.toLowerCase().startsWith("javascript:")) return null;
+    return new URL(href, baseUrl).href;
+  }
+
+  async function fetchDiaDirecto(dateObj) {
+    const targetDate = formatFechaDDMMYYYY(dateObj);
+    const tpl = plantillaURL("listado");
+    const req = tpl ? { url: aplicarPlantilla(tpl, dateObj), init: {} } : requestMostrar(dateObj);
+    const pagina = await fetchDocumento(req.url, req.init);
+    const docs = [pagina.doc];
+
+    if (!findListadoTable(pagina.doc)) {
+      const detalles = enlaceDetalles(pagina.doc, pagina.url);
+      if (!detalles) throw new Error(`${targetDate}: la respuesta no trae "Listado de pagos" ni enlace Detalles`);
+      docs.unshift((await fetchDocumento(detalles)).doc);
+    }
+    const table = findListadoTable(docs[0]);
+    if (!table) throw new Error(`${targetDate}: no se encontro la tabla "Listado de pagos"`);
+    const firstDate = getFirstListadoDate(docs[0]);
+    if (firstDate && firstDate !== targetDate) {
+      throw new Error(`Fecha cargada distinta. Esperada=${targetDate} actual=${firstDate}`);
+    }
+
+    const tplTotales = plantillaURL("totales");
+    if (tplTotales) docs.push((await fetchDocumento(aplicarPlantilla(tplTotales, dateObj))).doc);
+    let totalDocumentos = null;
+    for (const doc of docs) {
+      totalDocumentos = extractTotalDocumentos(doc);
+      if (totalDocumentos !== null) break;
+    }
+    if (totalDocumentos === null) log(`${targetDate}: sin tabla "Totales por documentos" (total_documentos = null)`);
+    return { listado: extractListado(table), totalDocumentos };
+  }
+
+  async function mapConcurrente(items, limite, fn) {
+    // Resultado por posicion: { value } o { error }; un fallo no corta a los demas
+    const resultados = new Array(items.length);
+    let siguiente = 0;
+    async function worker() {
+      while (siguiente < items.length) {
+        const i = siguiente;
+        siguiente += 1;
+        try {
+          resultados[i] = { value: await fn(items[i]) };
+        } catch (error) {
+          resultados[i] = { error };
+        }
+      }
+    }
+    const n = Math.max(1, Math.min(limite, items.length));
+    await Promise.all(Array.from({ length: n }, worker));
+    return resultados;
+  }
+
   async function exportarDiaEnVistaActual() {
     // Modo manual: no cambia fecha ni hace click en Mostrar.
     await clickDetallesAndWaitTable(null);
@@ -448,18 +585,26 @@
     }
   }
 
+  function semanaDesdeFechaActual() {
+    const input = getFechaInput();
+    if (!input) throw new Error("No se encontro input fecha");
+    let date = parseFechaDDMMYYYY(input.value);
+    if (!date) throw new Error(`Fecha invalida en input: ${input.value}`);
+
+    if (isSunday(date)) date = nextHabil(date);
+    const weekEnd = endOfWeekSaturday(date);
+    const weekRange = `${formatFechaISO(date)}_a_${formatFechaISO(weekEnd)}`;
+    const fechas = [];
+    for (let d = date; d <= weekEnd; d = nextHabil(d)) fechas.push(d);
+    return { date, weekEnd, weekRange, fechas };
+  }
+
   async function exportarSemanaDesdeFechaActual() {
     if (busy) return;
     busy = true;
     try {
-      const input = getFechaInput();
-      if (!input) throw new Error("No se encontro input fecha");
-      let date = parseFechaDDMMYYYY(input.value);
-      if (!date) throw new Error(`Fecha invalida en input: ${input.value}`);
-
-      if (isSunday(date)) date = nextHabil(date);
-      const weekEnd = endOfWeekSaturday(date);
-      const weekRange = `${formatFechaISO(date)}_a_${formatFechaISO(weekEnd)}`;
+      const { date: inicio, weekEnd, weekRange } = semanaDesdeFechaActual();
+      let date = inicio;
       const batchMeta = { weekRange };
       log(`Semana objetivo: ${weekRange}`);
 
@@ -488,6 +633,62 @@
     }
   }
 
+  async function exportarSemanaDirecta() {
+    if (busy) return;
+    busy = true;
+    try {
+      const { weekRange, fechas } = semanaDesdeFechaActual();
+      const t0 = Date.now();
+      const concurrencia = plantillaURL("listado") ? FETCH_CONCURRENCIA : 1;
+      log(`Semana objetivo (directo): ${weekRange} | dias=${fechas.length} | concurrencia=${concurrencia}`);
+      const resultados = await mapConcurrente(fechas, concurrencia, fetchDiaDirecto);
+
+      const dias = [];
+      let porVista = 0;
+      for (let i = 0; i < fechas.length; i += 1) {
+        let captura = resultados[i].value;
+        if (resultados[i].error) {
+          // Respaldo: ese dia se toma por la vista (Mostrar -> Detalles), como en "Exportar semana"
+          log(`Fetch directo fallo para ${formatFechaDDMMYYYY(fechas[i])}: ${resultados[i].error.message} | usando la vista`);
+          captura = await capturarDiaUI(fechas[i]);
+          porVista += 1;
+        }
+        const { listado, totalDocumentos } = captura;
+        dias.push({
+          fecha_consulta: formatFechaDDMMYYYY(fechas[i]),
+          fecha_iso: formatFechaISO(fechas[i]),
+          mes_tag: monthTag(fechas[i]),
+          registros: listado.length,
+          total_valor: listado.reduce((acc, r) => acc + r.valor, 0),
+          total_documentos: totalDocumentos,
+          listado_pagos: listado
+        });
+      }
+
+      // Un solo JSON para la semana; el script 03 lee cada entrada de "dias" como un JSON diario
+      const payload = {
+        fuente: "DentOS/cuadrecaja",
+        modo: "semana_directa",
+        destino_sugerido: "export_json/facturacion_json",
+        semana_rango: weekRange,
+        extraido_en: new Date().toISOString(),
+        registros: dias.reduce((acc, d) => acc + d.registros, 0),
+        total_valor: dias.reduce((acc, d) => acc + d.total_valor, 0),
+        dias
+      };
+      const fileName = `listado_pagos_semana_${weekRange}.json`;
+      downloadJSON(payload, fileName);
+      const seg = ((Date.now() - t0) / 1000).toFixed(1);
+      log(`Exportado ${fileName} | dias=${dias.length} | por vista=${porVista} | registros=${payload.registros} | ${seg}s`);
+      alert(`Exportar semana (rapido): OK (${dias.length} dias, ${porVista} por la vista, ${seg}s)`);
+    } catch (e) {
+      console.error(e);
+      alert(`Error exportar semana (rapido): ${e.message}`);
+    } finally {
+      busy = false;
+    }
+  }
+
   function addUI() {
     if (document.getElementById("dentos-export-ui")) return;
 
@@ -511,8 +712,14 @@
     btnSemana.style.cssText = "padding:10px 12px;border:none;border-radius:8px;background:#0f9d58;color:#fff;font-weight:700;cursor:pointer;";
     btnSemana.addEventListener("click", exportarSemanaDesdeFechaActual);
 
+    const btnSemanaDirecta = document.createElement("button");
+    btnSemanaDirecta.textContent = "Exportar semana (rapido)";
+    btnSemanaDirecta.style.cssText = "padding:10px 12px;border:none;border-radius:8px;background:#e37400;color:#fff;font-weight:700;cursor:pointer;";
+    btnSemanaDirecta.addEventListener("click", exportarSemanaDirecta);
+
     box.appendChild(btnDia);
     box.appendChild(btnSemana);
+    box.appendChild(btnSemanaDirecta);
     document.body.appendChild(box);
   }
 
@@ -2,10 +2,19 @@
 import pandas as pd
 from pathlib import Path
 from datetime import date
+import argparse
+import os
 import re
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
 from decimal import Decimal
 
+import corrida_parcial
+import esquemas
+import lectura_excel
+import maestros
+from calendario_clinico import semanas_del_mes
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 INPUT_DIR = BASE_DIR / 'excel_dentos' / '01_citas_detallado'
 OUTPUT_DIR = BASE_DIR / 'excel_generado'
@@ -27,9 +36,10 @@ def _find_input(prefix: str) -> Path:
     candidates.sort(key=lambda p: p.stat().st_mtime, reverse=True)
     return candidates[0]
 
-# Fuente: archivo en inputs/01_citas
-SRC = _find_input('citas detallado')
+# Fuente: archivo en inputs/01_citas (se resuelve al ejecutar)
+SRC_PREFIX = 'citas detallado'
 # Plantilla destino: busca en OUTPUT_DIR para actualización incremental
+# (solo si no hay maestro vigente registrado, ver scripts/maestros.py)
 def _find_output_master(prefix: str) -> Path:
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     candidates = []
@@ -42,9 +52,10 @@ def _find_output_master(prefix: str) -> Path:
     candidates.sort(key=lambda p: p.stat().st_mtime, reverse=True)
     return candidates[0]
 
-# Intentamos buscar un archivo maestro existente en outputs/
-# Intentamos buscar un archivo maestro existente en outputs/
-DEST = _find_output_master('formato_odontologia')
+# El maestro existente en outputs/ se busca al ejecutar (modo mes: el vigente registrado;
+# modo lote: el de cada mes y año, formato_odontologia_{MES}_{AÑO}). El que se genera queda
+# registrado como vigente para 02/04/05.
+DEST_PREFIX = 'formato_odontologia'
 
 # El archivo de salida se define dinámicamente según el mes y se versiona si existe
 # No redefinimos OUTPUT_DIR aquí porque ya está arriba
@@ -73,15 +84,66 @@ MONTH_MAP = {
 }
 
 
-def load_source():
-    src = pd.read_excel(SRC)
+def _normalize_doc(doc):
+    if pd.isna(doc):
+        return ''
+    if isinstance(doc, (int, float)):
+        try:
+            return str(int(round(doc)))
+        except Exception:
+            return str(doc).strip()
+    s = str(doc).strip()
+    if not s:
+        return ''
+    s = s.replace(',', '')
+    if 'e' in s.lower():
+        try:
+            return str(int(Decimal(s)))
+        except Exception:
+            pass
+    if re.match(r'^\d+\.0+$', s):
+        return s.split('.')[0]
+    if '.' in s:
+        try:
+            return str(int(float(s)))
+        except Exception:
+            return s.split('.')[0]
+    # Si tiene más de 11 dígitos, recortar a 11 (nos quedamos con los últimos 11)
+    if re.match(r'^\d{12,}$', s):
+        s = s[-11:]
+    # Si quedó con 11 dígitos:
+    # - Si empieza con 1: eliminar el último dígito
+    # - Si no empieza con 1: eliminar el primer dígito
+    if re.match(r'^\d{11}$', s):
+        if s.startswith('1'):
+            return s[:-1]
+        return s[1:]
+    return s
+
+
+def read_source(path=None, parcial=None):
+    path = path or _find_input(SRC_PREFIX)
+    # Chequeo de encabezados antes de cargar: falla en milisegundos si falta una columna
+    columnas = esquemas.verificar(path, 'citas')
+    src = lectura_excel.leer(path, doc_cols=['documento'], columnas=columnas)
     # Elimina columnas duplicadas invisibles que rompen el agg
     src = src.loc[:, ~src.columns.duplicated()]
     src['Fecha_dt'] = pd.to_datetime(src['fecha'], errors='coerce')
+    if parcial is not None:
+        docs = src['documento'].map({v: _normalize_doc(v) for v in src['documento'].unique()})
+        src = parcial.filtrar(src, src['Fecha_dt'], docs, path.name)
+    return src
+
+
+def load_source(src=None, week_ranges=None):
+    if src is None:
+        src = read_source()
+    if week_ranges is None:
+        week_ranges = WEEK_RANGES
 
     # Etiquetar semana según rango configurado
     src['Semana'] = pd.NA
-    for name, (start, end) in WEEK_RANGES.items():
+    for name, (start, end) in week_ranges.items():
         mask = (src['Fecha_dt'].dt.date >= start) & (src['Fecha_dt'].dt.date <= end)
         src.loc[mask, 'Semana'] = name
 
@@ -92,42 +154,6 @@ def load_source():
     src['Paciente'] = src[name_cols].fillna('').astype(str).agg(' '.join, axis=1)
     src['Paciente'] = src['Paciente'].str.replace(r'\s+', ' ', regex=True).str.strip()
 
-    def _normalize_doc(doc):
-        if pd.isna(doc):
-            return ''
-        if isinstance(doc, (int, float)):
-            try:
-                return str(int(round(doc)))
-            except Exception:
-                return str(doc).strip()
-        s = str(doc).strip()
-        if not s:
-            return ''
-        s = s.replace(',', '')
-        if 'e' in s.lower():
-            try:
-                return str(int(Decimal(s)))
-            except Exception:
-                pass
-        if re.match(r'^\d+\.0+$', s):
-            return s.split('.')[0]
-        if '.' in s:
-            try:
-                return str(int(float(s)))
-            except Exception:
-                return s.split('.')[0]
-        # Si tiene más de 11 dígitos, recortar a 11 (nos quedamos con los últimos 11)
-        if re.match(r'^\d{12,}$', s):
-            s = s[-11:]
-        # Si quedó con 11 dígitos:
-        # - Si empieza con 1: eliminar el último dígito
-        # - Si no empieza con 1: eliminar el primer dígito
-        if re.match(r'^\d{11}$', s):
-            if s.startswith('1'):
-                return s[:-1]
-            return s[1:]
-        return s
-
     src['Numero_Documento'] = src['documento'].apply(_normalize_doc)
     # Log de documentos corregidos a 10 dígitos (regla de 11 dígitos)
     src['doc_raw_str'] = src['documento'].astype(str).str.strip()
@@ -216,37 +242,133 @@ def build_new_rows(src, start_from):
     return src[DEST_COLS]
 
 
-def main():
-    if DEST is not None:
+def _read_dest(dest_path):
+    if dest_path is not None:
         try:
-            dest = pd.read_excel(DEST, sheet_name=SHEET)
+            return lectura_excel.leer(dest_path, sheet_name=SHEET, doc_cols=['Numero_Documento'])
         except FileNotFoundError:
-            dest = pd.DataFrame(columns=DEST_COLS)
-    else:
-        dest = pd.DataFrame(columns=DEST_COLS)
+            pass
+    return pd.DataFrame(columns=DEST_COLS)
+
+
+def _versioned_output(base_name):
+    # Nombre fijo para el maestro acumulado; versionado si ya existe
+    candidate = OUTPUT_DIR / f"{base_name}.xlsx"
+    idx = 1
+    while candidate.exists():
+        candidate = OUTPUT_DIR / f"{base_name}.{idx}.xlsx"
+        idx += 1
+    return candidate
+
+
+def build_master(dest, src, week_ranges):
     # Quitar semanas que vamos a recalcular (normalizando a minúsculas)
-    weeks_lower = {w.lower() for w in WEEK_RANGES.keys()}
+    weeks_lower = {w.lower() for w in week_ranges.keys()}
     dest_keep = dest[~dest['Semana'].astype(str).str.lower().isin(weeks_lower)].copy()
     dest_keep = dest_keep.reindex(columns=DEST_COLS)
 
-    src = load_source()
-    # Determinar mes para nombre de archivo
-    month_label = src['Mes'].dropna().iloc[0] if not src['Mes'].dropna().empty else 'MES'
-
     start = next_id_start(dest)
     new_rows = build_new_rows(src, start)
 
     out = pd.concat([dest_keep, new_rows], ignore_index=True)
+    return out, new_rows
+
+
+def _dest_del_mes(year, month):
+    """Maestro previo del mes en modo lote: formato_odontologia_{MES}_{AÑO}.
+
+    Si no existe, sirve el de un lote anterior sin año en el nombre (formato_odontologia_{MES})
+    solo si todas sus fechas son de ese año (`maestros.del_mes`, la misma regla que usa el 03);
+    si no, el mes arranca vacío.
+    """
+    return _read_dest(maestros.del_mes(OUTPUT_DIR, year, month))
+
+
+def build_month(year, month, src_month):
+    """Construye el maestro de un mes con su propio calendario y secuencia de id_registro."""
+    week_ranges = semanas_del_mes(year, month)
+    # Siempre con año: el mismo mes de otro año es otro maestro
+    base_name = f"{DEST_PREFIX}_{MONTH_MAP[month]}_{year}"
+
+    src = load_source(src_month, week_ranges)
+    dest = _dest_del_mes(year, month)
+    out, new_rows = build_master(dest, src, week_ranges)
+
+    candidate = _versioned_output(base_name)
+    out.to_excel(candidate, sheet_name=SHEET, index=False)
+    return candidate, new_rows['Semana'].value_counts().to_dict()
+
+
+def run_batch(desde, hasta, workers):
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    raw = read_source()
+    fechas = raw['Fecha_dt']
+    if desde is None:
+        desde = fechas.min().normalize()
+    if hasta is None:
+        hasta = fechas.max().normalize()
+    raw = raw[(fechas >= desde) & (fechas < hasta + pd.Timedelta(days=1))]
+    if raw.empty:
+        print(f"Sin citas entre {desde.date()} y {hasta.date()}")
+        return
+
+    # Un maestro por mes calendario; cada mes viaja solo con sus filas al proceso que lo construye
+    months = raw.groupby([raw['Fecha_dt'].dt.year, raw['Fecha_dt'].dt.month], sort=True)
+    print(f"Lote {desde.date()} -> {hasta.date()}: {months.ngroups} meses, {workers} procesos")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            (year, month): pool.submit(build_month, year, month, group.copy())
+            for (year, month), group in months
+        }
+        generados = {}
+        for (year, month), fut in futures.items():
+            path, counts = fut.result()
+            generados[(year, month)] = path
+            print(f"Generado: {path}")
+            print(f"Filas nuevas por semana ({MONTH_MAP[month]} {year}):", counts)
+    # 02/04/05 toman por defecto el último mes del rango (los demás con --mes)
+    if generados:
+        maestros.registrar_vigente(OUTPUT_DIR, generados[max(generados)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crea el maestro Datos Mercadeo desde citas detallado.')
+    parser.add_argument('--from', dest='desde', help='Modo lote: fecha inicial YYYY-MM-DD (un maestro por mes)')
+    parser.add_argument('--to', dest='hasta', help='Modo lote: fecha final YYYY-MM-DD (incluida)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Procesos para el modo lote')
+    corrida_parcial.agregar_argumentos(parser)
+    args = parser.parse_args()
+    parcial = corrida_parcial.desde_args(parser, args)
+    if parcial is not None and (args.desde or args.hasta):
+        parser.error('la corrida parcial no aplica al modo lote (--from/--to)')
+
+    if args.desde or args.hasta:
+        desde = pd.Timestamp(args.desde) if args.desde else None
+        hasta = pd.Timestamp(args.hasta) if args.hasta else None
+        run_batch(desde, hasta, max(1, args.workers or 1))
+        return
+
+    dest = _read_dest(maestros.vigente(OUTPUT_DIR) or _find_output_master(DEST_PREFIX))
+    src = load_source(read_source(parcial=parcial))
+    # Determinar mes para nombre de archivo
+    month_label = src['Mes'].dropna().iloc[0] if not src['Mes'].dropna().empty else 'MES'
+
+    out, new_rows = build_master(dest, src, WEEK_RANGES)
+    if parcial is not None:
+        # Solo las filas construidas desde el subconjunto; el maestro no se toca
+        counts = new_rows['Semana'].value_counts().to_dict()
+        destino = parcial.destino(OUTPUT_DIR, '01', f"formato_odontologia_{month_label}")
+        if destino is not None:
+            new_rows.to_excel(destino, sheet_name=SHEET, index=False)
+            print(f"Generado (parcial): {destino}")
+        print("Filas nuevas por semana:", counts)
+        return
     # Crear nombre de salida versionado
-    # Nombre fijo para el maestro acumulado
-    base_name = f"formato_odontologia_{month_label}"
-    candidate = OUTPUT_DIR / f"{base_name}.xlsx"
-    idx = 1
-    while candidate.exists():
-        candidate = OUTPUT_DIR / f"{base_name}.{idx}.xlsx"
-        idx += 1
+    candidate = _versioned_output(f"formato_odontologia_{month_label}")
 
     out.to_excel(candidate, sheet_name=SHEET, index=False)
+    maestros.registrar_vigente(OUTPUT_DIR, candidate)
     OUTPUT_PATH = candidate
 
     counts = new_rows['Semana'].value_counts().to_dict()
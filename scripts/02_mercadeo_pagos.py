@@ -1,13 +1,28 @@
 ﻿# -*- coding: utf-8 -*-
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
+import argparse
 import re
-import unicodedata
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import almacen_sqlite
+import claves
+import corrida_parcial
+import esquemas
+import huellas
+import lectura_excel
+import maestros
+import parseo
+import puntos_control
+from calendario_clinico import semana_de
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 INPUT_DIR = BASE_DIR / 'excel_dentos' / '02_citas_con_pagos'
 OUTPUT_DIR = BASE_DIR / 'excel_generado'
+CACHE_DIR = OUTPUT_DIR / '.cache'
 EXPECTED_RECAUDO_ROWS = None  # Desactivado: ahora se reporta sin validar fijo
 # Filtros por etapas (actívalos uno a uno para depurar)
 APPLY_FAC_ANUL = True       # fac_anulada == NO
@@ -15,7 +30,30 @@ APPLY_ANTICIPO = True       # excluir forma_pago con "anticipo"
 APPLY_DEDUPE = True         # deduplicar por clave
 EXPAND_MASTER = True        # crear filas nuevas si faltan pagos (solo caso factura igual con forma/valor distinto)
 
-# Debug opcional: filtra y muestra solo un día (YYYY-MM-DD). Deja en None para modo normal.
+# Procesamiento por particiones: acota lo que la asignación suma en memoria (particiones en curso),
+# no el pico total: maestro y pagos se leen completos y el maestro se escribe completo. Para acotar
+# por mes, un maestro por mes (modo lote del 01) y el 02 sobre cada uno con --mes.
+# None = todo junto (modo normal), 'dia' o 'semana'.
+PARTITION_MODE = None
+PARTITION_WORKERS = 1       # >1: procesa particiones en paralelo (procesos)
+
+# Almacén de huellas: re-ejecuciones aplican solo pagos nuevos/quitados si el maestro no cambió
+USE_FINGERPRINT_STORE = True
+# Columnas del maestro que definen su estado (si cambian fuera del script 02 se recalcula todo)
+MASTER_FINGERPRINT_COLS = [
+    'id_registro', 'Numero_Documento', 'Fecha', 'Recaudo (venta día)',
+    'Factura', 'Metodo_Pago', 'Asesor_Comercial', 'Efectivo',
+]
+# Espejo SQLite (excel_generado/odontologia.sqlite3) para consultas por documento/semana
+SYNC_SQLITE = True
+# Puntos de control por fase (fuentes, pagos_limpios, asignado) para retomar con --resume
+USE_CHECKPOINTS = True
+CHECKPOINT_DIR = OUTPUT_DIR / '.checkpoints'
+CHECKPOINT_SCRIPT = '02'
+CHECKPOINT_FASES = ('fuentes', 'pagos_limpios', 'asignado')
+
+# Debug opcional: corrida parcial de un día (YYYY-MM-DD) / documento, igual que --day / --doc.
+# Deja en None para modo normal.
 DEBUG_DAY = None
 DEBUG_DOC = None
 
@@ -25,21 +63,10 @@ MONTH_MAP = {
     9: 'SEPTIEMBRE', 10: 'OCTUBRE', 11: 'NOVIEMBRE', 12: 'DICIEMBRE',
 }
 
-# Rango de semanas (actualiza aquí cuando cambie el mes)
-WEEK_RANGES = {
-    'SEMANA1': (datetime(2026, 2, 2).date(), datetime(2026, 2, 7).date()),
-    'SEMANA2': (datetime(2026, 2, 9).date(), datetime(2026, 2, 14).date()),
-    'SEMANA3': (datetime(2026, 2, 16).date(), datetime(2026, 2, 21).date()),
-    'SEMANA4': (datetime(2026, 2, 23).date(), datetime(2026, 2, 28).date()),
-}
-
+# Semanas clinicas: el mismo calendario que 01 y 03 (scripts/calendario_clinico.py)
 def _week_from_date(d):
-    if not d:
-        return pd.NA
-    for name, (start, end) in WEEK_RANGES.items():
-        if start <= d <= end:
-            return name
-    return pd.NA
+    semana = semana_de(d)
+    return semana if semana else pd.NA
 
 # Busca el primer archivo de pagos
 def _find_input(prefix: str) -> Path:
@@ -59,21 +86,6 @@ def _find_input(prefix: str) -> Path:
     candidates.sort(key=lambda p: p.stat().st_mtime, reverse=True)
     return candidates[0]
 
-# Busca el archivo maestro más reciente en outputs
-def _find_master() -> Path:
-    candidates = []
-    if not OUTPUT_DIR.exists():
-        raise FileNotFoundError(f"No existe el directorio {OUTPUT_DIR}. Ejecuta el script 01 primero.")
-
-    for f in OUTPUT_DIR.glob('formato_odontologia_*.xlsx'):
-        candidates.append(f)
-    
-    if not candidates:
-        raise FileNotFoundError("No se encontró el archivo maestro formato_odontologia_*.xlsx en excel_generado")
-    
-    candidates.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    return candidates[0]
-
 def normalize_doc(doc):
     if pd.isna(doc):
         return ''
@@ -121,47 +133,56 @@ def normalize_doc(doc):
         return s[1:]
     return s
 
-def _norm_col(name: str) -> str:
-    if name is None:
-        return ''
-    s = str(name).strip().lower()
-    s = unicodedata.normalize('NFD', s)
-    s = ''.join(c for c in s if unicodedata.category(c) != 'Mn')
-    s = re.sub(r'[^a-z0-9]', '', s)
-    return s
-
-def _find_col(df, candidates):
-    norm_map = { _norm_col(c): c for c in df.columns }
-    for cand in candidates:
-        key = _norm_col(cand)
-        if key in norm_map:
-            return norm_map[key]
-    return None
-
-def _parse_valor_pagado(val):
-    if pd.isna(val):
-        return 0
-    s = str(val).strip()
-    if not s:
-        return 0
-    # Quitar símbolos y espacios
-    s = re.sub(r'[^0-9\.,\-]', '', s)
-    if not s:
-        return 0
-    # Si tiene coma, asumir coma decimal y punto miles
-    if ',' in s:
-        s = s.replace('.', '').replace(',', '.')
-    else:
-        # Sin coma: si termina en .0/.00 lo tratamos como decimal y quitamos solo la parte decimal
-        if re.match(r'^\d+\.0+$', s):
-            s = s.split('.')[0]
-        else:
-            # Sin coma: asumir puntos como miles
-            s = s.replace('.', '')
-    try:
-        return int(float(s))
-    except Exception:
-        return 0
+def _filtro_fac_anul(df, cols, vivas):
+    # Excluir facturas anuladas (fac_anulada = SI)
+    if not APPLY_FAC_ANUL or not cols['fac_anul']:
+        return None
+    return df[cols['fac_anul']].fillna('').astype(str).str.strip().str.upper() != 'SI'
+
+def _filtro_anticipo(df, cols, vivas):
+    # Excluir forma_pago = "Descontar anticipo" (incluye variaciones/typos)
+    if not APPLY_ANTICIPO or not cols['forma']:
+        return None
+    forma = df[cols['forma']].fillna('').astype(str).str.lower()
+    # Pocas formas de pago distintas: se normaliza cada una una sola vez
+    forma_norm = forma.map({v: esquemas.norm_col(v) for v in forma.unique()})
+    # Si no queda ninguna fila (p. ej. una corrida parcial sin pagos para ese filtro), map
+    # devuelve una serie vacía float64 y .str falla: se fuerza texto
+    forma_norm = forma_norm.astype(str)
+    return ~(forma_norm.str.contains('anticipo') | forma_norm.str.contains('anticpo'))
+
+def _filtro_dedupe(df, cols, vivas):
+    # Primera aparición de cada huella entre las filas que pasaron las etapas anteriores
+    if not APPLY_DEDUPE:
+        return None
+    keep = pd.Series(True, index=df.index)
+    keep[vivas] = ~df.loc[vivas, 'huella'].duplicated()
+    return keep
+
+# Etapas de filtrado de pagos, en orden: (nombre, regla).
+# Cada regla recibe (df_pagos, columnas, filas_vivas) y devuelve la máscara de filas que se quedan
+# (None = no aplica). Se combinan en una sola máscara y df_pagos se recorta una sola vez,
+# así que una regla nueva solo necesita su entrada aquí.
+PAGOS_FILTROS = [
+    ('fac_anulada', _filtro_fac_anul),
+    ('anticipo', _filtro_anticipo),
+    ('dedupe', _filtro_dedupe),
+]
+
+def _filtrar_pagos(df_pagos, cols):
+    """Aplica PAGOS_FILTROS en orden sobre una sola máscara. Devuelve (máscara, {etapa: filas que quedaban antes})."""
+    vivas = pd.Series(True, index=df_pagos.index)
+    antes = {}
+    for nombre, regla in PAGOS_FILTROS:
+        t0 = time.perf_counter()
+        antes[nombre] = int(vivas.sum())
+        keep = regla(df_pagos, cols, vivas)
+        if keep is None:
+            continue
+        vivas &= keep.fillna(False).astype(bool)
+        quitadas = antes[nombre] - int(vivas.sum())
+        print(f"[LOG] Filtro pagos '{nombre}': -{quitadas} filas ({time.perf_counter() - t0:.3f}s)")
+    return vivas, antes
 
 def _next_id_start(df):
     if 'id_registro' not in df.columns:
@@ -171,346 +192,644 @@ def _next_id_start(df):
         return 0
     return nums.astype(int).max()
 
-def main():
-    try:
-        master_path = _find_master()
-        input_path = _find_input('')
-        
-        print(f"Leyendo Maestro: {master_path.name}")
-        print(f"Leyendo Pagos: {input_path.name}")
-
-        df_master = pd.read_excel(master_path)
-        df_pagos = pd.read_excel(input_path)
-
-        # Asegurar columnas nuevas en maestro
-        if 'Factura' not in df_master.columns:
-            df_master['Factura'] = pd.NA
-        if 'Metodo_Pago' not in df_master.columns:
-            df_master['Metodo_Pago'] = pd.NA
-        if 'Asesor_Comercial' not in df_master.columns:
-            df_master['Asesor_Comercial'] = pd.NA
-        # Forzar dtype object para evitar warnings al asignar texto
-        for col in ['Factura', 'Metodo_Pago', 'Asesor_Comercial']:
-            df_master[col] = df_master[col].astype(object)
-
-        # Usar documento normalizado para el match
-        df_master['doc_norm'] = df_master['Numero_Documento'].apply(normalize_doc)
-        df_pagos['doc_norm'] = df_pagos['documento'].apply(normalize_doc)
-        # Mantener paciente solo para logs
-        df_master['paciente_raw'] = df_master['Paciente'].astype(str).str.strip()
-        df_pagos['paciente_raw'] = df_pagos['paciente'].astype(str).str.strip()
-
-        # Log de documentos corregidos (regla 11 dígitos -> 10)
-        facturador_col = _find_col(df_pagos, ['facturador', 'asesor_comercial', 'asesor comercial'])
-        df_pagos['doc_raw_str'] = df_pagos['documento'].astype(str).str.strip()
-        df_pagos['doc_raw_digits'] = df_pagos['doc_raw_str'].str.replace(r'\D', '', regex=True)
-        doc_changes = df_pagos[df_pagos['doc_raw_digits'].str.len() == 11].copy()
-        if not doc_changes.empty:
-            cols = ['doc_raw_str', 'doc_norm', 'paciente_raw']
-            if facturador_col:
-                cols.append(facturador_col)
-            unique_changes = doc_changes[cols].drop_duplicates()
-            print(f"[LOG] Documentos corregidos (11->10): {len(unique_changes)}")
-            if facturador_col:
-                counts = unique_changes[facturador_col].fillna('').astype(str).str.strip().value_counts()
-                print("[LOG] Facturador con correcciones (Asesor_Comercial):")
-                print(counts.to_string())
-            print(unique_changes.head(20).to_string(index=False))
-        
-        # Convertir fechas para comparar
-        # Asumiendo formato DD/MM/YYYY en maestro (es string según script 01)
-        df_master['Fecha_dt'] = pd.to_datetime(df_master['Fecha'], format='%d/%m/%Y', errors='coerce')
-        # Asumiendo fecha en pagos es datetime o string.
-        df_pagos['Fecha_dt'] = pd.to_datetime(df_pagos['fecha'], errors='coerce')
-        # Fecha sin hora para dedupe/agrupación por día
-        df_pagos['Fecha_dia'] = df_pagos['Fecha_dt'].dt.date
-
-        # Debug: filtrar solo un día si está configurado
-        if DEBUG_DAY:
-            debug_date = pd.to_datetime(DEBUG_DAY, errors='coerce')
-            if pd.notna(debug_date):
-                df_pagos = df_pagos[df_pagos['Fecha_dia'] == debug_date.date()].copy()
-        # Debug: filtrar solo un documento si está configurado
-        if DEBUG_DOC:
-            df_pagos = df_pagos[df_pagos['documento'].astype(str).str.split('.').str[0].str.strip() == DEBUG_DOC].copy()
-
-        # Normalizar valor_pagado a número (evita duplicados por formato)
-        if 'valor_pagado' in df_pagos.columns:
-            df_pagos['valor_pagado_num'] = df_pagos['valor_pagado'].apply(_parse_valor_pagado)
-        else:
-            df_pagos['valor_pagado_num'] = 0
-
-        # Lógica de Actualización
-        # 1. Filtrar y deduplicar pagos:
-        # - fac_anulada: solo NO
-        # - forma_pago: excluir "Descontar anticipo"
-        # - Clave de pago: documento + fecha + factura + forma_pago + valor_pagado
-        # - Si las columnas son idénticas, se deja una sola fila (no se duplica)
-        factura_col = _find_col(df_pagos, ['factura', 'n_factura', 'numero_factura'])
-        fac_anul_col = _find_col(df_pagos, ['fac_anul', 'fac_anulada', 'factura_anulada', 'factura anulada'])
-        forma_col = _find_col(
-            df_pagos,
-            ['forma_pago', 'forma de pago', 'medio_pago', 'medio de pago', 'metodo_pago', 'metodo de pago', 'tipo_pago'],
+def _partition_labels(fechas_dia, mode):
+    # Etiqueta de partición a partir de Fecha_dia (la clave de match siempre incluye el día)
+    dt = pd.to_datetime(fechas_dia, errors='coerce')
+    if mode == 'dia':
+        labels = dt.dt.strftime('%Y-%m-%d')
+    elif mode == 'semana':
+        iso = dt.dt.isocalendar()
+        labels = iso['year'].astype(str) + '-W' + iso['week'].astype(str).str.zfill(2)
+    else:
+        return pd.Series('TODO', index=fechas_dia.index)
+    return labels.where(dt.notna(), 'SIN_FECHA')
+
+def _filas_por_clave(df_master):
+    # clave -> índices del maestro (en orden), solo filas con fecha válida
+    con_fecha = df_master['Fecha_dt'].notna()
+    key_to_rows = {}
+    for idx, key in zip(df_master.index[con_fecha], df_master.loc[con_fecha, 'clave']):
+        key_to_rows.setdefault(key, []).append(idx)
+    return key_to_rows
+
+# Columnas del maestro que escribe la asignación (se limpian antes de reasignar una clave)
+COLS_ASIGNACION = ['Recaudo (venta día)', 'Asesor_Comercial', 'Factura', 'Metodo_Pago', 'Efectivo']
+
+def _procesar_particion(df_master, df_pagos_clean, factura_col, forma_col, facturador_col):
+    """Limpia, expande y asigna los pagos de una partición sobre sus filas del maestro.
+
+    Devuelve el maestro de la partición (filas nuevas marcadas con _nueva_tipo/_nueva_orden),
+    las claves sin match para el log y los contadores de asignación.
+    """
+    # Limpiar valores previos en maestro para las fechas/documentos que vamos a recalcular
+    mask = df_master['clave'].isin(df_pagos_clean['clave'].unique())
+    for col in COLS_ASIGNACION:
+        if col in df_master.columns:
+            df_master.loc[mask, col] = pd.NA
+
+    # (logs removidos)
+
+    # 2. Agrupar pagos por Paciente y Fecha (Día) SIN SUMAR
+    # Clave: (doc_norm, fecha_date) empacada en un entero (claves.paciente_dia)
+    # -> {pagos: [...], factura_counts: {factura: set((forma, valor))}}
+    daily_payments = {}
+    pagos_by_key = {}
+    for _, row in df_pagos_clean.iterrows():
+        doc = row['doc_norm']
+        if not doc:
+            continue
+
+        if pd.isna(row['Fecha_dt']):
+            continue
+        day_key = row['clave']
+        pagos_by_key.setdefault(day_key, []).append(row)
+
+        valor = row.get('valor_pagado_num', 0)
+        try:
+            valor = float(valor)
+        except:
+            valor = 0
+
+        if day_key not in daily_payments:
+            daily_payments[day_key] = {'pagos': [], 'factura_counts': {}}
+
+        if valor > 0:
+            factura_val = ''
+            if factura_col:
+                factura_val = row.get(factura_col, '')
+            if pd.isna(factura_val) or str(factura_val).strip().lower() in ('nan', 'none'):
+                factura_val = ''
+            factura_vacia = str(factura_val).strip() == ''
+            forma_val = row.get(forma_col, '') if forma_col else ''
+            daily_payments[day_key]['pagos'].append({
+                'valor': valor,
+                'factura_vacia': factura_vacia,
+                'facturador': row.get(facturador_col, '') if facturador_col else '',
+                'huella': row['huella'],
+                'factura': str(factura_val).strip(),
+                'forma': str(forma_val).strip(),
+            })
+            # Track distinct (forma, valor) per factura
+            factura_key = str(factura_val).strip()
+            fv_set = daily_payments[day_key]['factura_counts'].setdefault(factura_key, set())
+            fv_set.add((str(forma_val).strip(), valor))
+
+    # 3. Asignar al Maestro
+    # Convertir columna a objeto para evitar FutureWarning si estaba vacía (float/NaN)
+    df_master['Asesor_Comercial'] = df_master['Asesor_Comercial'].astype(object)
+    
+    updates_asesor = 0
+    updates_efectivo = 0
+    updates_recaudo = 0 # Nuevo contador
+
+    # Expandir maestro si faltan filas por:
+    # - misma factura con forma/valor distintos
+    # - pagos con factura vacía
+    key_to_rows = _filas_por_clave(df_master)
+
+    rows_to_append = []
+
+    # Documentos/fechas que no existen en el maestro (el log se imprime al unir particiones)
+    missing_keys = []
+    for key in daily_payments.keys():
+        if key not in key_to_rows:
+            missing_keys.append(key)
+    missing_log = []
+    for key in missing_keys:
+        rows = pagos_by_key.get(key, [])
+        if not rows:
+            continue
+        r0 = rows[0]
+        missing_log.append((r0['_orden_clave'], (r0['doc_norm'], r0['Fecha_dia']), str(r0.get('paciente', '')).strip()))
+
+    # Si no hay match en el maestro, agregar filas nuevas al final con datos mínimos.
+    # El id_registro se asigna al unir particiones para mantener una sola secuencia.
+    rows_added_missing = 0
+    if EXPAND_MASTER and missing_keys:
+        for key in missing_keys:
+            pagos_list = pagos_by_key.get(key, [])
+            for pago_row in pagos_list:
+                doc, fecha_dia = pago_row['doc_norm'], pago_row['Fecha_dia']
+                new_row = {col: pd.NA for col in df_master.columns}
+                new_row['_nueva_tipo'] = 0
+                new_row['_nueva_orden'] = pago_row['_orden_clave']
+                new_row['Numero_Documento'] = doc
+                pac = str(pago_row.get('paciente', '')).strip()
+                new_row['Paciente'] = pac if pac else pd.NA
+                dt = pd.to_datetime(fecha_dia, errors='coerce')
+                if pd.notna(dt):
+                    new_row['Fecha'] = dt.strftime('%d/%m/%Y')
+                    new_row['Año'] = dt.year
+                    new_row['Mes'] = MONTH_MAP.get(dt.month, pd.NA)
+                new_row['Semana'] = _week_from_date(fecha_dia)
+                new_row['doc_norm'] = doc
+                new_row['Fecha_dt'] = pd.to_datetime(fecha_dia, errors='coerce')
+                new_row['Fecha_dia'] = fecha_dia
+                new_row['clave'] = key
+                rows_to_append.append(new_row)
+                rows_added_missing += 1
+
+    for key, info in daily_payments.items():
+        if key not in key_to_rows:
+            continue
+        rows = key_to_rows[key]
+        needed = len(info['pagos']) - len(rows)
+        if needed > 0:
+            # Expandir si hay facturas con múltiples (forma,valor) o pagos con factura vacía
+            has_multi_for_factura = any(len(v) > 1 for v in info['factura_counts'].values())
+            has_empty_factura = any(p.get('factura_vacia') for p in info['pagos'])
+            if has_multi_for_factura or has_empty_factura:
+                template = df_master.loc[rows[0]].copy()
+                template['_nueva_tipo'] = 1
+                template['_nueva_orden'] = pagos_by_key[key][0]['_orden_clave']
+                for _ in range(needed):
+                    rows_to_append.append(template.copy())
+
+    rows_added = len(rows_to_append)
+    if EXPAND_MASTER and rows_to_append:
+        df_master = pd.concat([df_master, pd.DataFrame(rows_to_append)], ignore_index=True)
+        # Recalcular índice de filas por clave después de expandir
+        key_to_rows = _filas_por_clave(df_master)
+
+    for key, rows in key_to_rows.items():
+        if key not in daily_payments:
+            continue
+        for idx in rows:
+            info = daily_payments[key]
+
+            # Recaudo: asignar un pago por fila (sin sumar)
+            if info['pagos']:
+                pago = info['pagos'].pop(0)
+                factura_vacia = bool(pago.get('factura_vacia'))
+                if not factura_vacia:
+                    valor_asignado = pago['valor']
+                    try:
+                        valor_asignado = int(valor_asignado)
+                    except Exception:
+                        pass
+                    df_master.at[idx, 'Recaudo (venta día)'] = valor_asignado
+                    updates_recaudo += 1
+                # Siempre marcar efectivo si hay pago, pero sin recaudo si no hay factura
+                df_master.at[idx, 'Efectivo'] = 1
+                df_master.at[idx, '_huella'] = pago['huella']
+                updates_efectivo += 1
+                # Factura y Metodo_Pago del pago asignado
+                df_master.at[idx, 'Factura'] = pago.get('factura', '')
+                df_master.at[idx, 'Metodo_Pago'] = pago.get('forma', '')
+                # Asesor_Comercial: solo el facturador de este pago
+                fact_name = str(pago.get('facturador', '')).strip()
+                if fact_name:
+                    df_master.at[idx, 'Asesor_Comercial'] = fact_name
+                    updates_asesor += 1
+
+    stats = {
+        'rows_added': rows_added,
+        'rows_added_missing': rows_added_missing,
+        'updates_recaudo': updates_recaudo,
+        'updates_asesor': updates_asesor,
+        'updates_efectivo': updates_efectivo,
+    }
+    return df_master, missing_log, stats
+
+
+
+def _procesar_en_particiones(df_master, df_pagos_clean, factura_col, forma_col, facturador_col, next_id):
+    """Procesa las particiones y vuelca cada resultado sobre `df_master` apenas termina.
+
+    Las filas originales se actualizan en el mismo `df_master` (columnas de asignación) y el
+    resultado de la partición se suelta; solo las filas nuevas se guardan hasta el final. Así,
+    además del maestro y los pagos (que siguen completos), solo hay en memoria las particiones en curso.
+    """
+    master_labels = _partition_labels(df_master['Fecha_dia'], PARTITION_MODE)
+    pagos_labels = _partition_labels(df_pagos_clean['Fecha_dia'], PARTITION_MODE)
+    master_idx = df_master.groupby(master_labels, sort=True).indices
+    pagos_idx = df_pagos_clean.groupby(pagos_labels, sort=True).indices
+    empty_idx = master_labels.iloc[:0].index.to_numpy(dtype=int)
+    del master_labels, pagos_labels
+
+    if PARTITION_MODE:
+        largest = max(pagos_idx.items(), key=lambda kv: len(kv[1]), default=(None, []))
+        print(
+            f"[LOG] Particiones ({PARTITION_MODE}): {len(pagos_idx)} con pagos | workers: {PARTITION_WORKERS} | "
+            f"mayor: {largest[0]} ({len(largest[1])} pagos)"
         )
 
-        # Excluir facturas anuladas (fac_anulada = SI)
-        if APPLY_FAC_ANUL and fac_anul_col:
-            fac_anul_norm = df_pagos[fac_anul_col].fillna('').astype(str).str.strip().str.upper()
-            df_pagos = df_pagos[fac_anul_norm != 'SI'].copy()
-
-        # Excluir forma_pago = "Descontar anticipo" (incluye variaciones/typos)
-        if APPLY_ANTICIPO and forma_col:
-            forma_norm = df_pagos[forma_col].fillna('').astype(str).str.lower().apply(_norm_col)
-            is_anticipo = forma_norm.str.contains('anticipo') | forma_norm.str.contains('anticpo')
-            df_pagos = df_pagos[~is_anticipo].copy()
-
-        # Dedupe exacto por las 5 columnas:
-        # fecha (día) + documento + factura + forma_pago + valor_pagado
-        dedup_subset = ['doc_norm', 'Fecha_dia', 'valor_pagado_num']
-        if factura_col:
-            df_pagos[factura_col] = (
-                df_pagos[factura_col]
-                .fillna('')
-                .astype(str)
-                .str.strip()
-                .replace({'nan': '', 'None': '', 'NONE': ''})
+    def _tasks():
+        # Se construye una partición a la vez: solo sus filas viajan al proceso que la atiende
+        for label, p_idx in pagos_idx.items():
+            m_idx = master_idx.get(label, empty_idx)
+            yield (
+                df_master.iloc[m_idx].copy(),
+                df_pagos_clean.iloc[p_idx].copy(),
+                factura_col,
+                forma_col,
+                facturador_col,
             )
-            dedup_subset.append(factura_col)
-        if forma_col:
-            df_pagos[forma_col] = df_pagos[forma_col].astype(str)
-            dedup_subset.append(forma_col)
-        facturador_col = _find_col(df_pagos, ['facturador', 'asesor_comercial', 'asesor comercial'])
-        if facturador_col:
-            df_pagos[facturador_col] = df_pagos[facturador_col].astype(str).str.strip()
-        if APPLY_DEDUPE:
-            df_pagos_clean = df_pagos.drop_duplicates(
-                subset=[c for c in dedup_subset if c in df_pagos.columns]
-            )
-        else:
-            df_pagos_clean = df_pagos.copy()
-
-        # (logs removidos)
-
-        # Limpiar valores previos en maestro para las fechas/documentos que vamos a recalcular
-        keys = set(zip(df_pagos_clean['doc_norm'], df_pagos_clean['Fecha_dia']))
-        df_master['Fecha_dia'] = df_master['Fecha_dt'].dt.date
-        mask = df_master.apply(lambda r: (r['doc_norm'], r['Fecha_dia']) in keys, axis=1)
-        cols_clear = ['Recaudo (venta día)', 'Asesor_Comercial', 'Factura', 'Metodo_Pago', 'Efectivo']
-        for col in cols_clear:
-            if col in df_master.columns:
-                df_master.loc[mask, col] = pd.NA
-
-        # (logs removidos)
-
-        # Debug: mostrar conteos
-        if DEBUG_DAY:
-            print(f"[DEBUG] Fecha filtro: {DEBUG_DAY}")
-            print(f"[DEBUG] Pagos leídos: {len(df_pagos)}")
-            print(f"[DEBUG] Pagos después dedupe: {len(df_pagos_clean)}")
-
-        # 2. Agrupar pagos por Paciente y Fecha (Día) SIN SUMAR
-        # Clave: (doc_norm, fecha_date) -> {pagos: [...], factura_counts: {factura: set((forma, valor))}}
-        daily_payments = {}
-        pagos_by_key = {}
-        for _, row in df_pagos_clean.iterrows():
-            doc = row['doc_norm']
-            if not doc:
-                continue
 
-            if pd.isna(row['Fecha_dt']):
+    master_cols = list(df_master.columns)
+    # La partición convierte Asesor_Comercial a objeto; se hace una vez aquí para poder volcar en su lugar
+    df_master['Asesor_Comercial'] = df_master['Asesor_Comercial'].astype(object)
+    nuevas, missing_log, stats = [], [], {}
+
+    def _volcar(result):
+        part, missing, part_stats = result
+        orig = np.ones(len(part), dtype=bool)
+        if '_nueva_tipo' in part.columns:
+            orig = part['_nueva_tipo'].isna().to_numpy()
+            if not orig.all():
+                nuevas.append(part[~orig])
+        pos = part['_pos'].to_numpy()[orig].astype(np.int64)
+        for col in COLS_ASIGNACION + ['_huella']:
+            if col not in part.columns:
                 continue
-            day_key = (doc, row['Fecha_dia'])
-            pagos_by_key.setdefault(day_key, []).append(row)
-
-            valor = row.get('valor_pagado_num', 0)
-            try:
-                valor = float(valor)
-            except:
-                valor = 0
+            if col not in df_master.columns:
+                df_master[col] = pd.Series(pd.NA, index=df_master.index, dtype=object)
+            # Mismo dtype que daría unir las particiones con pd.concat (p. ej. float + texto -> objeto)
+            dtype = pd.concat([df_master[col].iloc[:0], part[col].iloc[:0]]).dtype
+            if df_master[col].dtype != dtype:
+                df_master[col] = df_master[col].astype(dtype)
+            df_master.iloc[pos, df_master.columns.get_loc(col)] = part[col].to_numpy()[orig]
+        missing_log.extend(missing)
+        for k, v in part_stats.items():
+            stats[k] = stats.get(k, 0) + v
+
+    if PARTITION_WORKERS and PARTITION_WORKERS > 1 and len(pagos_idx) > 1:
+        with ProcessPoolExecutor(max_workers=PARTITION_WORKERS) as pool:
+            pending = set()
+            for task in _tasks():
+                pending.add(pool.submit(_procesar_particion, *task))
+                del task
+                if len(pending) >= PARTITION_WORKERS * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        _volcar(f.result())
+            for f in pending:
+                _volcar(f.result())
+    else:
+        for task in _tasks():
+            result = _procesar_particion(*task)
+            del task
+            _volcar(result)
+            del result
+
+    # Filas originales en su orden (df_master no se reordena) + filas nuevas en el orden global
+    # de aparición de la clave
+    df_master.drop(columns=['_pos'], inplace=True)
+    if nuevas:
+        new = pd.concat(nuevas).sort_values(['_nueva_tipo', '_nueva_orden'], kind='stable')
+        del nuevas
+        new_missing = new['_nueva_tipo'] == 0
+        new.loc[new_missing, 'id_registro'] = [
+            f"ODON-{str(next_id + i + 1).zfill(7)}" for i in range(int(new_missing.sum()))
+        ]
+        new = new.drop(columns=['_pos', '_nueva_tipo', '_nueva_orden'])
+        merged = pd.concat([df_master, new], ignore_index=True)
+        del new
+    else:
+        merged = df_master.reset_index(drop=True)
+
+    extra_order = ['Año', 'Recaudo (venta día)']
+    extras = [c for c in merged.columns if c not in master_cols]
+    extras.sort(key=lambda c: extra_order.index(c) if c in extra_order else len(extra_order))
+    cols = [c for c in master_cols + extras if c != '_pos']
+    if list(merged.columns) != cols:
+        merged = merged[cols]
+
+    missing_log.sort(key=lambda m: m[0])
+    return merged, missing_log, stats
+
+def _log_missing(missing_log):
+    if not missing_log:
+        return
+    print(f"[LOG] Claves sin filas en maestro: {len(missing_log)}")
+    # Resumen por cédula (doc_norm) para revisar casos
+    missing_docs = [key[0] for _, key, _ in missing_log if key and key[0]]
+    if missing_docs:
+        doc_counts = pd.Series(missing_docs).value_counts()
+        print("[LOG] Cedulas sin match (conteo por doc):")
+        print(doc_counts.head(50).to_string())
+    samples = [
+        {'doc_norm': key[0], 'fecha': key[1], 'paciente': paciente}
+        for _, key, paciente in missing_log
+    ]
+    df_missing = pd.DataFrame(samples).drop_duplicates()
+    print(df_missing.head(20).to_string(index=False))
+
+def _docs_norm(serie):
+    # normalize_doc por valor único (solo para decidir qué filas entran en una corrida parcial)
+    return serie.map({v: normalize_doc(v) for v in serie.unique()})
+
+def _cargar_fuentes(master_path, input_path, parcial=None):
+    """Fase 'fuentes': lee maestro y pagos y normaliza documentos, fechas, montos y claves."""
+    # Chequeo de encabezados antes de cargar: falla en milisegundos si falta una columna
+    esquemas.verificar(master_path, 'maestro')
+    pagos_cols = esquemas.verificar(input_path, 'pagos')
+
+    df_master = lectura_excel.leer(master_path, doc_cols=['Numero_Documento'])
+    df_pagos = lectura_excel.leer(input_path, doc_cols=['documento'], columnas=pagos_cols)
+    master_firma = huellas.firma_frame(df_master, MASTER_FINGERPRINT_COLS)
+    # Los id_registro nuevos siguen la secuencia del maestro completo
+    next_id = _next_id_start(df_master)
+    if parcial is not None:
+        fechas_master = pd.to_datetime(df_master['Fecha'], format='%d/%m/%Y', errors='coerce')
+        df_master = parcial.filtrar(df_master, fechas_master, _docs_norm(df_master['Numero_Documento']), master_path.name)
+        fechas_pagos = pd.to_datetime(df_pagos['fecha'], errors='coerce')
+        df_pagos = parcial.filtrar(df_pagos, fechas_pagos, _docs_norm(df_pagos['documento']), input_path.name)
+
+    # Asegurar columnas nuevas en maestro
+    if 'Factura' not in df_master.columns:
+        df_master['Factura'] = pd.NA
+    if 'Metodo_Pago' not in df_master.columns:
+        df_master['Metodo_Pago'] = pd.NA
+    if 'Asesor_Comercial' not in df_master.columns:
+        df_master['Asesor_Comercial'] = pd.NA
+    # Forzar dtype object para evitar warnings al asignar texto
+    for col in ['Factura', 'Metodo_Pago', 'Asesor_Comercial']:
+        df_master[col] = df_master[col].astype(object)
+
+    # Usar documento normalizado para el match
+    df_master['doc_norm'] = df_master['Numero_Documento'].apply(normalize_doc)
+    df_pagos['doc_norm'] = df_pagos['documento'].apply(normalize_doc)
+    # Mantener paciente solo para logs
+    df_master['paciente_raw'] = df_master['Paciente'].astype(str).str.strip()
+    df_pagos['paciente_raw'] = df_pagos['paciente'].astype(str).str.strip()
+
+    # Log de documentos corregidos (regla 11 dígitos -> 10)
+    facturador_col = esquemas.buscar_columna(df_pagos.columns, esquemas.ALIAS['facturador'])
+    df_pagos['doc_raw_str'] = df_pagos['documento'].astype(str).str.strip()
+    df_pagos['doc_raw_digits'] = df_pagos['doc_raw_str'].str.replace(r'\D', '', regex=True)
+    doc_changes = df_pagos[df_pagos['doc_raw_digits'].str.len() == 11].copy()
+    if not doc_changes.empty:
+        cols = ['doc_raw_str', 'doc_norm', 'paciente_raw']
+        if facturador_col:
+            cols.append(facturador_col)
+        unique_changes = doc_changes[cols].drop_duplicates()
+        print(f"[LOG] Documentos corregidos (11->10): {len(unique_changes)}")
+        if facturador_col:
+            counts = unique_changes[facturador_col].fillna('').astype(str).str.strip().value_counts()
+            print("[LOG] Facturador con correcciones (Asesor_Comercial):")
+            print(counts.to_string())
+        print(unique_changes.head(20).to_string(index=False))
+
+    # Convertir fechas para comparar
+    # Asumiendo formato DD/MM/YYYY en maestro (es string según script 01)
+    df_master['Fecha_dt'] = pd.to_datetime(df_master['Fecha'], format='%d/%m/%Y', errors='coerce')
+    # Asumiendo fecha en pagos es datetime o string.
+    df_pagos['Fecha_dt'] = pd.to_datetime(df_pagos['fecha'], errors='coerce')
+    # Fecha sin hora para dedupe/agrupación por día
+    df_pagos['Fecha_dia'] = df_pagos['Fecha_dt'].dt.date
+    # (documento, día) como un solo entero para todos los cruces; maestro y pagos con el mismo diccionario
+    pacientes = claves.cargar(claves.ruta(CACHE_DIR))
+    n_pacientes = len(pacientes)
+    df_master['clave'] = claves.paciente_dia(df_master['doc_norm'], df_master['Fecha_dt'], pacientes)
+    df_pagos['clave'] = claves.paciente_dia(df_pagos['doc_norm'], df_pagos['Fecha_dt'], pacientes)
+    if parcial is None and len(pacientes) > n_pacientes:
+        claves.guardar(claves.ruta(CACHE_DIR), pacientes)
+        print(f"[LOG] Diccionario de pacientes: {len(pacientes)} documentos ({len(pacientes) - n_pacientes} nuevos)")
+    # Rango de días que cubre la exportación (para detectar pagos quitados)
+    export_desde = df_pagos['Fecha_dt'].min()
+    export_hasta = df_pagos['Fecha_dt'].max()
+
+    # Normalizar valor_pagado a número (evita duplicados por formato)
+    df_pagos['valor_pagado_num'], invalid = parseo.valor_pagado_serie(df_pagos['valor_pagado'])
+    parseo.reportar_invalidos('valor_pagado', df_pagos['valor_pagado'], invalid)
+
+    # Lógica de Actualización
+    # 1. Filtrar y deduplicar pagos (etapas en PAGOS_FILTROS):
+    # - fac_anulada: solo NO
+    # - forma_pago: excluir "Descontar anticipo"
+    # - Clave de pago: documento + fecha + factura + forma_pago + valor_pagado
+    # - Si las columnas son idénticas, se deja una sola fila (no se duplica)
+    factura_col = esquemas.buscar_columna(df_pagos.columns, esquemas.ALIAS['factura'])
+    fac_anul_col = esquemas.buscar_columna(df_pagos.columns, esquemas.ALIAS['fac_anul'])
+    forma_col = esquemas.buscar_columna(df_pagos.columns, esquemas.ALIAS['forma'])
+    cols_pagos = {'factura': factura_col, 'fac_anul': fac_anul_col, 'forma': forma_col}
+
+    # Dedupe exacto por las 5 columnas:
+    # fecha (día) + documento + factura + forma_pago + valor_pagado
+    dedup_subset = ['doc_norm', 'Fecha_dia', 'valor_pagado_num']
+    if factura_col:
+        df_pagos[factura_col] = (
+            df_pagos[factura_col]
+            .fillna('')
+            .astype(str)
+            .str.strip()
+            .replace({'nan': '', 'None': '', 'NONE': ''})
+        )
+        dedup_subset.append(factura_col)
+    if forma_col:
+        df_pagos[forma_col] = df_pagos[forma_col].astype(str)
+        dedup_subset.append(forma_col)
+    facturador_col = esquemas.buscar_columna(df_pagos.columns, esquemas.ALIAS['facturador'])
+    if facturador_col:
+        df_pagos[facturador_col] = df_pagos[facturador_col].astype(str).str.strip()
+    # Huella de 64 bits de la clave normalizada: el dedupe pasa a ser una comparación de enteros
+    df_pagos['huella'] = huellas.hash_filas(df_pagos, [c for c in dedup_subset if c in df_pagos.columns])
+
+    return {
+        'df_master': df_master, 'df_pagos': df_pagos, 'master_firma': master_firma,
+        'export_desde': export_desde, 'export_hasta': export_hasta, 'cols_pagos': cols_pagos,
+        'factura_col': factura_col, 'forma_col': forma_col, 'facturador_col': facturador_col,
+        'next_id': next_id, 'parcial': parcial is not None, 'pacientes': pacientes,
+    }
+
+def _limpiar_pagos(st):
+    """Fase 'pagos_limpios': filtros y dedupe de pagos (PAGOS_FILTROS)."""
+    df_master, df_pagos = st['df_master'], st['df_pagos']
+    vivas, antes = _filtrar_pagos(df_pagos, st['cols_pagos'])
+    df_pagos_clean = df_pagos[vivas].copy()
+
+    # Debug: mostrar conteos
+    if st['parcial']:
+        print(f"[DEBUG] Pagos leídos: {antes.get('dedupe', int(vivas.sum()))}")
+        print(f"[DEBUG] Pagos después dedupe: {len(df_pagos_clean)}")
+
+    df_master['Fecha_dia'] = df_master['Fecha_dt'].dt.date
+
+    st = {k: v for k, v in st.items() if k != 'df_pagos'}
+    return dict(st, df_master=df_master, df_pagos_clean=df_pagos_clean)
+
+def _asignar_pagos(st, master_path):
+    """Fase 'asignado': asigna los pagos al maestro. None si no hay nada que reescribir."""
+    # Se sacan del estado (ya guardado en su punto de control) para que el maestro de entrada
+    # se libere apenas se arma el de salida
+    df_master, df_pagos_clean = st.pop('df_master'), st.pop('df_pagos_clean')
+    master_firma, export_desde, export_hasta = st['master_firma'], st['export_desde'], st['export_hasta']
+    factura_col, forma_col, facturador_col = st['factura_col'], st['forma_col'], st['facturador_col']
+    # Almacén de huellas: si el maestro es el mismo que dejó la corrida anterior,
+    # solo se recalculan las claves (doc, día) con pagos nuevos o quitados.
+    store_file = huellas.store_path(CACHE_DIR, master_path)
+    use_store = USE_FINGERPRINT_STORE and not st['parcial']
+    store = huellas.cargar(store_file) if use_store else None
+    if store is not None and store.get('firma') != master_firma:
+        print("[LOG] El maestro cambió desde la última corrida: se recalculan todos los pagos.")
+        store = None
+    valid = (df_pagos_clean['doc_norm'] != '') & df_pagos_clean['Fecha_dt'].notna()
+    prev_huellas = store['huellas'] if store is not None else None
+    affected = prev_claves = None
+    if prev_huellas is not None:
+        # El almacén guarda doc_norm/Fecha_dia: la clave se recalcula con el mismo diccionario
+        prev_claves = claves.paciente_dia(prev_huellas['doc_norm'], prev_huellas['Fecha_dia'], st['pacientes'])
+        incoming = df_pagos_clean.loc[valid, ['huella', 'clave']]
+        nuevos = incoming[~incoming['huella'].isin(prev_huellas['huella'])]
+        prev_dt = pd.to_datetime(prev_huellas['Fecha_dia'], errors='coerce')
+        en_rango = (prev_dt >= export_desde.normalize()) & (prev_dt <= export_hasta)
+        quitados = prev_claves[en_rango & ~prev_huellas['huella'].isin(incoming['huella'])]
+        affected = np.union1d(nuevos['clave'].to_numpy(), quitados.to_numpy())
+        print(
+            f"[LOG] Huellas: conocidas {len(incoming) - len(nuevos)} | nuevas {len(nuevos)} | "
+            f"quitadas {len(quitados)} | claves a recalcular {len(affected)}"
+        )
+        if not len(affected):
+            print("Proceso completado. Sin pagos nuevos ni quitados: el maestro no se reescribe.")
+            return None
+        # Claves que se quedaron sin pagos no se tocan: la corrida completa tampoco las limpia
+        # (solo limpia y reasigna claves con pagos en la exportación) y el almacén no cambia el resultado
+        in_affected = df_pagos_clean['clave'].isin(affected)
+        df_pagos_clean = df_pagos_clean[in_affected]
+        valid = valid[in_affected]
+
+    # 2-3. Agrupar pagos por (doc, día) y asignarlos al maestro.
+    # La clave siempre incluye el día, así que el trabajo se puede partir por día/semana.
+    df_master['_pos'] = range(len(df_master))
+    df_master['_huella'] = pd.Series(pd.NA, index=df_master.index, dtype=object)
+    df_pagos_clean['_orden_clave'] = df_pagos_clean.groupby('clave', sort=False).ngroup()
+    df_master, missing_log, stats = _procesar_en_particiones(
+        df_master, df_pagos_clean, factura_col, forma_col, facturador_col, st['next_id']
+    )
+    pagos_valid = df_pagos_clean.loc[valid, ['huella', 'doc_norm', 'Fecha_dia']]
+    del df_pagos_clean
+    _log_missing(missing_log)
+
+    # Limpieza de columnas temporales
+    applied = df_master.loc[df_master['_huella'].notna(), ['_huella', 'id_registro']]
+    df_master.drop(columns=['doc_norm', 'paciente_raw', 'Fecha_dt', 'Fecha_dia', 'clave', '_huella'], inplace=True)
+    print(f"Filas sin Recaudo: {df_master['Recaudo (venta día)'].isna().sum()}")
+
+    # Rellenar vacíos en Efectivo con 0
+    df_master['Efectivo'] = df_master['Efectivo'].fillna(0).astype(int)
+
+    return {
+        'df_master': df_master, 'use_store': use_store, 'store_file': store_file,
+        'prev_huellas': prev_huellas, 'prev_claves': prev_claves, 'affected': affected, 'pagos_valid': pagos_valid, 'applied': applied,
+        'stats': stats,
+    }
+
+def _guardar_maestro(st, master_path, output_path):
+    df_master, applied, pagos_valid = st['df_master'], st['applied'], st['pagos_valid']
+    use_store, store_file = st['use_store'], st['store_file']
+    prev_huellas, prev_claves, affected, stats = st['prev_huellas'], st['prev_claves'], st['affected'], st['stats']
+    rows_added = stats.get('rows_added', 0)
+    rows_added_missing = stats.get('rows_added_missing', 0)
+    updates_recaudo = stats.get('updates_recaudo', 0)
+    updates_asesor = stats.get('updates_asesor', 0)
+    updates_efectivo = stats.get('updates_efectivo', 0)
+
+    # Guardar sin formato de moneda (valores crudos)
+    if output_path is None:
+        print("[LOG] Corrida parcial con --no-write: no se escribe ningún archivo.")
+    else:
+        df_master.to_excel(output_path, index=False)
+    if SYNC_SQLITE and output_path == master_path:
+        almacen_sqlite.sincronizar(OUTPUT_DIR / almacen_sqlite.DB_NAME, output_path.name, mercadeo=df_master)
+
+    if use_store:
+        # Huella -> id_registro al que se aplicó (vacío si el pago no encontró fila)
+        procesados = pagos_valid[['huella', 'doc_norm', 'Fecha_dia']].merge(
+            applied.rename(columns={'_huella': 'huella'}).astype({'huella': 'uint64'}),
+            on='huella',
+            how='left',
+        )
+        if prev_huellas is not None:
+            keep = ~prev_claves.isin(affected)
+            procesados = pd.concat([prev_huellas[keep], procesados], ignore_index=True)
+        huellas.guardar(store_file, {
+            'maestro': master_path.name,
+            'firma': huellas.firma_frame(df_master, MASTER_FINGERPRINT_COLS),
+            'huellas': procesados.reset_index(drop=True),
+        })
+
+    print("Proceso completado.")
+    print(f"Filas nuevas agregadas al maestro: {rows_added} (sin match: {rows_added_missing})")
+    print(f"Filas con Recaudo asignado: {updates_recaudo}")
+    print(f"Filas con Asesor_Comercial asignado: {updates_asesor}")
+    print(f"Filas marcadas como Efectivo: {updates_efectivo}")
+    if output_path is not None:
+        print(f"Archivo actualizado: {output_path}")
 
-            if day_key not in daily_payments:
-                daily_payments[day_key] = {'pagos': [], 'factura_counts': {}}
+def _clave_corrida(master_path, input_path):
+    # Entradas + todo lo que cambia el resultado (PARTITION_* no: mismo maestro con o sin particiones;
+    # DEBUG_* no: las corridas parciales no dejan puntos de control)
+    config = {
+        'APPLY_FAC_ANUL': APPLY_FAC_ANUL, 'APPLY_ANTICIPO': APPLY_ANTICIPO, 'APPLY_DEDUPE': APPLY_DEDUPE,
+        'EXPAND_MASTER': EXPAND_MASTER, 'USE_FINGERPRINT_STORE': USE_FINGERPRINT_STORE,
+        'MASTER_FINGERPRINT_COLS': tuple(MASTER_FINGERPRINT_COLS), 'CLAVES_VERSION': claves.VERSION,
+    }
+    return puntos_control.clave([master_path, input_path, huellas.store_path(CACHE_DIR, master_path)], config)
 
-            if valor > 0:
-                factura_val = ''
-                if factura_col:
-                    factura_val = row.get(factura_col, '')
-                if pd.isna(factura_val) or str(factura_val).strip().lower() in ('nan', 'none'):
-                    factura_val = ''
-                factura_vacia = str(factura_val).strip() == ''
-                forma_val = row.get(forma_col, '') if forma_col else ''
-                daily_payments[day_key]['pagos'].append({
-                    'valor': valor,
-                    'factura_vacia': factura_vacia,
-                    'facturador': row.get(facturador_col, '') if facturador_col else '',
-                    'factura': str(factura_val).strip(),
-                    'forma': str(forma_val).strip(),
-                })
-                # Track distinct (forma, valor) per factura
-                factura_key = str(factura_val).strip()
-                fv_set = daily_payments[day_key]['factura_counts'].setdefault(factura_key, set())
-                fv_set.add((str(forma_val).strip(), valor))
-
-        # 3. Asignar al Maestro
-        # Convertir columna a objeto para evitar FutureWarning si estaba vacía (float/NaN)
-        df_master['Asesor_Comercial'] = df_master['Asesor_Comercial'].astype(object)
-        
-        updates_asesor = 0
-        updates_efectivo = 0
-        updates_recaudo = 0 # Nuevo contador
-
-        # Expandir maestro si faltan filas por:
-        # - misma factura con forma/valor distintos
-        # - pagos con factura vacía
-        key_to_rows = {}
-        for idx, row in df_master.iterrows():
-            doc = row['doc_norm']
-            if pd.isna(row['Fecha_dt']):
-                continue
-            key = (doc, row['Fecha_dt'].date())
-            key_to_rows.setdefault(key, []).append(idx)
-
-        rows_to_append = []
-
-        # Log: documentos/fechas que no existen en el maestro
-        missing_keys = []
-        for key in daily_payments.keys():
-            if key not in key_to_rows:
-                missing_keys.append(key)
-        if missing_keys:
-            print(f"[LOG] Claves sin filas en maestro: {len(missing_keys)}")
-            # Resumen por cédula (doc_norm) para revisar casos
-            missing_docs = [k[0] for k in missing_keys if k and k[0]]
-            if missing_docs:
-                doc_counts = pd.Series(missing_docs).value_counts()
-                print("[LOG] Cedulas sin match (conteo por doc):")
-                print(doc_counts.head(50).to_string())
-            samples = []
-            for key in missing_keys:
-                rows = pagos_by_key.get(key, [])
-                if not rows:
-                    continue
-                r0 = rows[0]
-                samples.append({
-                    'doc_norm': key[0],
-                    'fecha': key[1],
-                    'paciente': str(r0.get('paciente', '')).strip(),
-                })
-            if samples:
-                df_missing = pd.DataFrame(samples).drop_duplicates()
-                print(df_missing.head(20).to_string(index=False))
-
-        # Si no hay match en el maestro, agregar filas nuevas al final con datos mínimos
-        rows_added_missing = 0
-        if EXPAND_MASTER and missing_keys:
-            next_id = _next_id_start(df_master)
-            for key in missing_keys:
-                pagos_list = pagos_by_key.get(key, [])
-                for pago_row in pagos_list:
-                    next_id += 1
-                    new_row = {col: pd.NA for col in df_master.columns}
-                    new_row['id_registro'] = f"ODON-{str(next_id).zfill(7)}"
-                    new_row['Numero_Documento'] = key[0]
-                    pac = str(pago_row.get('paciente', '')).strip()
-                    new_row['Paciente'] = pac if pac else pd.NA
-                    dt = pd.to_datetime(key[1], errors='coerce')
-                    if pd.notna(dt):
-                        new_row['Fecha'] = dt.strftime('%d/%m/%Y')
-                        new_row['Año'] = dt.year
-                        new_row['Mes'] = MONTH_MAP.get(dt.month, pd.NA)
-                    new_row['Semana'] = _week_from_date(key[1])
-                    new_row['doc_norm'] = key[0]
-                    new_row['Fecha_dt'] = pd.to_datetime(key[1], errors='coerce')
-                    new_row['Fecha_dia'] = key[1]
-                    rows_to_append.append(new_row)
-                    rows_added_missing += 1
-
-        for key, info in daily_payments.items():
-            if key not in key_to_rows:
-                continue
-            rows = key_to_rows[key]
-            needed = len(info['pagos']) - len(rows)
-            if needed > 0:
-                # Expandir si hay facturas con múltiples (forma,valor) o pagos con factura vacía
-                has_multi_for_factura = any(len(v) > 1 for v in info['factura_counts'].values())
-                has_empty_factura = any(p.get('factura_vacia') for p in info['pagos'])
-                if has_multi_for_factura or has_empty_factura:
-                    template = df_master.loc[rows[0]].copy()
-                    for _ in range(needed):
-                        rows_to_append.append(template.copy())
-
-        rows_added = len(rows_to_append)
-        if EXPAND_MASTER and rows_to_append:
-            df_master = pd.concat([df_master, pd.DataFrame(rows_to_append)], ignore_index=True)
-            # Recalcular índice de filas por clave después de expandir
-            key_to_rows = {}
-            for idx, row in df_master.iterrows():
-                doc = row['doc_norm']
-                if pd.isna(row['Fecha_dt']):
-                    continue
-                key = (doc, row['Fecha_dt'].date())
-                key_to_rows.setdefault(key, []).append(idx)
-
-        for idx, row in df_master.iterrows():
-            doc = row['doc_norm']
-            if pd.isna(row['Fecha_dt']):
-                continue
-            fecha_cita_date = row['Fecha_dt'].date()
-            key = (doc, fecha_cita_date)
-
-            if key in daily_payments:
-                info = daily_payments[key]
-
-                # Recaudo: asignar un pago por fila (sin sumar)
-                if info['pagos']:
-                    pago = info['pagos'].pop(0)
-                    factura_vacia = bool(pago.get('factura_vacia'))
-                    if not factura_vacia:
-                        valor_asignado = pago['valor']
-                        try:
-                            valor_asignado = int(valor_asignado)
-                        except Exception:
-                            pass
-                        df_master.at[idx, 'Recaudo (venta día)'] = valor_asignado
-                        updates_recaudo += 1
-                    # Siempre marcar efectivo si hay pago, pero sin recaudo si no hay factura
-                    df_master.at[idx, 'Efectivo'] = 1
-                    updates_efectivo += 1
-                    # Factura y Metodo_Pago del pago asignado
-                    df_master.at[idx, 'Factura'] = pago.get('factura', '')
-                    df_master.at[idx, 'Metodo_Pago'] = pago.get('forma', '')
-                    # Asesor_Comercial: solo el facturador de este pago
-                    fact_name = str(pago.get('facturador', '')).strip()
-                    if fact_name:
-                        df_master.at[idx, 'Asesor_Comercial'] = fact_name
-                        updates_asesor += 1
-
-        # Limpieza de columnas temporales
-        df_master.drop(columns=['doc_norm', 'paciente_raw', 'Fecha_dt', 'Fecha_dia'], inplace=True)
-        print(f"Filas sin Recaudo: {df_master['Recaudo (venta día)'].isna().sum()}")
-        
-        # Rellenar vacíos en Efectivo con 0
-        df_master['Efectivo'] = df_master['Efectivo'].fillna(0).astype(int)
-        
-        # Guardar sin formato de moneda (valores crudos)
-        output_path = master_path
-        df_master.to_excel(output_path, index=False)
+def main():
+    parser = argparse.ArgumentParser(description='Asigna los pagos de DentOS al maestro de mercadeo.')
+    parser.add_argument(
+        '--resume', action='store_true',
+        help='Retoma desde el último punto de control de una corrida fallida con las mismas entradas',
+    )
+    corrida_parcial.agregar_argumentos(parser)
+    maestros.agregar_argumentos(parser)
+    args = parser.parse_args()
+    parcial = corrida_parcial.desde_args(parser, args, dia=DEBUG_DAY, doc=DEBUG_DOC)
+    if parcial is not None and args.resume:
+        parser.error('--resume no aplica a corridas parciales')
+    # Las corridas parciales no dejan puntos de control
+    checkpoints = USE_CHECKPOINTS and parcial is None
+
+    clave = None
+    try:
+        # El maestro que registró el 01, o el pedido con --maestro / --mes
+        master_path = maestros.resolver(parser, args, OUTPUT_DIR)
+        input_path = _find_input('')
         
-        print("Proceso completado.")
-        print(f"Filas nuevas agregadas al maestro: {rows_added} (sin match: {rows_added_missing})")
-        print(f"Filas con Recaudo asignado: {updates_recaudo}")
-        print(f"Filas con Asesor_Comercial asignado: {updates_asesor}")
-        print(f"Filas marcadas como Efectivo: {updates_efectivo}")
-        print(f"Archivo actualizado: {output_path}")
+        print(f"Leyendo Maestro: {master_path.name}")
+        print(f"Leyendo Pagos: {input_path.name}")
+
+        fase, st = None, None
+        if checkpoints:
+            clave = _clave_corrida(master_path, input_path)
+            if args.resume:
+                fase, st = puntos_control.ultimo(CHECKPOINT_DIR, CHECKPOINT_SCRIPT, clave, CHECKPOINT_FASES)
+                if fase is None:
+                    print("[LOG] Sin punto de control para estas entradas: corrida completa.")
+            # Puntos de otras entradas ya no sirven
+            puntos_control.limpiar(CHECKPOINT_DIR, CHECKPOINT_SCRIPT, conservar=clave if fase else None)
+
+        def _punto(nombre, estado):
+            if checkpoints:
+                puntos_control.guardar(CHECKPOINT_DIR, CHECKPOINT_SCRIPT, clave, nombre, estado)
+            return estado
+
+        if fase is None:
+            st = _punto('fuentes', _cargar_fuentes(master_path, input_path, parcial))
+        if fase in (None, 'fuentes'):
+            st = _punto('pagos_limpios', _limpiar_pagos(st))
+        if fase != 'asignado':
+            st = _asignar_pagos(st, master_path)
+            if st is None:
+                if checkpoints:
+                    puntos_control.limpiar(CHECKPOINT_DIR, CHECKPOINT_SCRIPT)
+                return
+            st = _punto('asignado', st)
+        destino = master_path if parcial is None else parcial.destino(OUTPUT_DIR, '02', master_path.stem)
+        _guardar_maestro(st, master_path, destino)
+        if checkpoints:
+            puntos_control.limpiar(CHECKPOINT_DIR, CHECKPOINT_SCRIPT)
 
     except Exception as e:
         print(f"Error: {e}")
+        hechas = []
+        if clave:
+            hechas = puntos_control.existentes(CHECKPOINT_DIR, CHECKPOINT_SCRIPT, clave, CHECKPOINT_FASES)
+        if hechas:
+            print(f"[LOG] Puntos de control guardados hasta '{hechas[-1]}'. Corregir y retomar con:")
+            print("      python scripts/02_mercadeo_pagos.py --resume")
 
 if __name__ == '__main__':
     main()
-
-
-
-
-
-
@@ -1,18 +1,34 @@
 # -*- coding: utf-8 -*-
+import argparse
 import json
+import os
 import re
-from datetime import date
+from concurrent.futures import ProcessPoolExecutor
 from itertools import combinations
 from pathlib import Path
 
 import pandas as pd
 
+import almacen_sqlite
+import claves
+import corrida_parcial
+import huellas
+import lectura_excel
+import maestros
+import parseo
+from calendario_clinico import semana_de
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 JSON_DIR = BASE_DIR / "export_json" / "facturacion_json"
 OUTPUT_DIR = BASE_DIR / "excel_generado"
+CACHE_DIR = OUTPUT_DIR / ".cache"
 SHEET_FACTURACION = "facturacion"
 SHEET_CONTROL = "facturacion_control"
+SYNC_SQLITE = True  # espejo en excel_generado/odontologia.sqlite3
+# Firma de las filas de cada mes: si no cambiaron y el libro conserva las hojas, no se reescribe
+USE_FINGERPRINT_STORE = True
+WRITE_WORKERS = os.cpu_count() or 1  # maestros escritos en paralelo (procesos)
 
 MONTH_MAP = {
     1: "ENERO",
@@ -29,107 +45,76 @@ MONTH_MAP = {
     12: "DICIEMBRE",
 }
 
-# Semanas clinicas (4 por mes). Ajusta aqui cuando cambien reglas de negocio.
-WEEK_RANGES_BY_MONTH = {
-    (2026, 1): {
-        "SEMANA1": (date(2026, 1, 2), date(2026, 1, 10)),
-        "SEMANA2": (date(2026, 1, 12), date(2026, 1, 17)),
-        "SEMANA3": (date(2026, 1, 19), date(2026, 1, 24)),
-        "SEMANA4": (date(2026, 1, 26), date(2026, 1, 31)),
-    },
-    (2026, 2): {
-        "SEMANA1": (date(2026, 2, 2), date(2026, 2, 7)),
-        "SEMANA2": (date(2026, 2, 9), date(2026, 2, 14)),
-        "SEMANA3": (date(2026, 2, 16), date(2026, 2, 21)),
-        "SEMANA4": (date(2026, 2, 23), date(2026, 2, 28)),
-    },
-    (2026, 3): {
-        "SEMANA1": (date(2026, 3, 2), date(2026, 3, 7)),
-        "SEMANA2": (date(2026, 3, 9), date(2026, 3, 14)),
-        "SEMANA3": (date(2026, 3, 16), date(2026, 3, 21)),
-        "SEMANA4": (date(2026, 3, 23), date(2026, 3, 31)),
-    },
-    (2026, 4): {
-        "SEMANA1": (date(2026, 4, 1), date(2026, 4, 11)),
-        "SEMANA2": (date(2026, 4, 13), date(2026, 4, 18)),
-        "SEMANA3": (date(2026, 4, 20), date(2026, 4, 25)),
-        "SEMANA4": (date(2026, 4, 27), date(2026, 4, 30)),
-    },
-}
-
 
-
-def _find_output_master(prefix: str) -> Path | None:
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    candidates = [f for f in OUTPUT_DIR.glob("*.xlsx") if f.name.lower().startswith(prefix.lower())]
-    if not candidates:
-        return None
-    candidates.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    return candidates[0]
-
-
-def _parse_valor(v):
-    if pd.isna(v):
-        return 0
-    if isinstance(v, (int, float)):
-        return int(round(v))
-    s = str(v).strip().replace(",", "")
-    try:
-        return int(round(float(s)))
-    except Exception:
-        return 0
+def _semana_clinica(fecha_dt):
+    # Mismo calendario que 01/02: tabla acordada y, fuera de ella, semanas Lun-Sab del mes
+    return semana_de(fecha_dt) or "SIN_SEMANA"
 
 
-def _parse_codigo(codigo: str):
-    txt = "" if pd.isna(codigo) else str(codigo).strip()
-    m = re.search(r"([A-Za-z]+)\s*-\s*(\d+)", txt)
-    if not m:
-        return "", ""
-    return m.group(1).upper(), m.group(2)
 
+def _fechas_del_nombre(name: str):
+    # listado_pagos_AAAA-MM-DD.json y listado_pagos_{inicio}_a_{fin}_AAAA-MM-DD.json: el dia es la ultima fecha;
+    # listado_pagos_semana_{inicio}_a_{fin}.json (exportacion directa): todos los dias del rango
+    fechas = re.findall(r"\d{4}-\d{2}-\d{2}", name)
+    if not fechas:
+        return None
+    if name.startswith("listado_pagos_semana_"):
+        return pd.date_range(fechas[0], fechas[-1], freq="D")
+    return pd.DatetimeIndex([fechas[-1]])
 
-def _semana_clinica(fecha_dt):
-    if pd.isna(fecha_dt):
-        return "SIN_SEMANA"
-    d = fecha_dt.date()
-    ranges = WEEK_RANGES_BY_MONTH.get((d.year, d.month), {})
-    for semana, (start, end) in ranges.items():
-        if start <= d <= end:
-            return semana
-    return "SIN_SEMANA"
 
+def _filtrar_archivos(files, parcial):
+    # La fecha va en el nombre: se descartan sin abrirlos
+    keep = []
+    for f in files:
+        fechas = _fechas_del_nombre(f.name)
+        if fechas is None:
+            keep.append(True)
+            continue
+        fechas = pd.Series(fechas)
+        keep.append(bool(parcial.mascara(fechas, fechas.dt.strftime("%d/%m/%Y")).any()))
+    print(f"[LOG] Parcial JSON: {sum(keep)} de {len(files)} archivos")
+    return [f for f, k in zip(files, keep) if k]
 
 
-def _read_json_files():
+def _read_json_files(parcial=None):
     JSON_DIR.mkdir(parents=True, exist_ok=True)
     files = sorted(JSON_DIR.glob("listado_pagos_*.json"))
     if not files:
         raise FileNotFoundError(f"No se encontraron JSON en: {JSON_DIR}")
+    if parcial is not None:
+        files = _filtrar_archivos(files, parcial)
 
     rows = []
     for f in files:
         with open(f, "r", encoding="utf-8") as fh:
             data = json.load(fh)
 
-        listado = data.get("listado_pagos", []) or []
-        total_documentos = _parse_valor(data.get("total_documentos", 0))
-        total_listado_json = _parse_valor(data.get("total_valor", 0))
-
-        for it in listado:
-            rows.append(
-                {
-                    "Fecha_raw": it.get("fecha", data.get("fecha_consulta", "")),
-                    "Codigo_Tipo_Doc": it.get("codigo_tipo_doc", ""),
-                    "Tipo_Doc": it.get("tipo_doc", ""),
-                    "Tercero": it.get("tercero", ""),
-                    "Valor_raw": it.get("valor", it.get("valor_raw", 0)),
-                    "Archivo_JSON": f.name,
-                    "Total_Documentos_JSON": total_documentos,
-                    "Total_Listado_JSON": total_listado_json,
-                }
-            )
-
-    return files, pd.DataFrame(rows)
+        # Exportacion semanal directa: un archivo con "dias", cada uno con la forma de un JSON diario
+        for dia in data.get("dias") or [data]:
+            listado = dia.get("listado_pagos", []) or []
+            total_documentos = parseo.valor_caja(dia.get("total_documentos", 0))
+            total_listado_json = parseo.valor_caja(dia.get("total_valor", 0))
+
+            for it in listado:
+                rows.append(
+                    {
+                        "Fecha_raw": it.get("fecha", dia.get("fecha_consulta", "")),
+                        "Codigo_Tipo_Doc": it.get("codigo_tipo_doc", ""),
+                        "Tipo_Doc": it.get("tipo_doc", ""),
+                        "Tercero": it.get("tercero", ""),
+                        "Valor_raw": it.get("valor", it.get("valor_raw", 0)),
+                        "Archivo_JSON": f.name,
+                        "Total_Documentos_JSON": total_documentos,
+                        "Total_Listado_JSON": total_listado_json,
+                    }
+                )
+
+    df = pd.DataFrame(rows)
+    if parcial is not None and not df.empty:
+        fechas = pd.to_datetime(df["Fecha_raw"], format="%d/%m/%Y", errors="coerce")
+        df = parcial.filtrar(df, fechas, df["Fecha_raw"].astype(str), "detalle JSON")
+    return files, df
 
 
 def _find_docs_to_exclude(doc_sums: pd.Series, diff: int):
@@ -234,18 +219,20 @@ def _build_facturacion(df_raw: pd.DataFrame):
     df["Año"] = df["Fecha_dt"].dt.year
     df["Mes"] = df["Fecha_dt"].dt.month.map(MONTH_MAP).fillna("SIN_MES")
     df["Semana"] = df["Fecha_dt"].apply(_semana_clinica)
-    df["Recaudo (venta dia)"] = df["Valor_raw"].apply(_parse_valor)
+    df["Recaudo (venta dia)"], invalid = parseo.valor_caja_serie(df["Valor_raw"])
+    parseo.reportar_invalidos("Valor (JSON)", df["Valor_raw"], invalid)
 
-    parsed = df["Codigo_Tipo_Doc"].apply(_parse_codigo)
-    df["Clase_Doc"] = parsed.apply(lambda t: t[0])
-    df["Consecutivo_Doc"] = parsed.apply(lambda t: t[1])
+    parsed, invalid = parseo.codigo_doc_serie(df["Codigo_Tipo_Doc"])
+    parseo.reportar_invalidos("Codigo_Tipo_Doc", df["Codigo_Tipo_Doc"], invalid)
+    df["Clase_Doc"] = parsed["Clase_Doc"]
+    df["Consecutivo_Doc"] = parsed["Consecutivo_Doc"]
     df["Tipo_factura"] = df["Codigo_Tipo_Doc"]
     df["Paciente"] = df["Tercero"]
 
     before = len(df)
-    df = df.drop_duplicates(
-        subset=["Fecha", "Codigo_Tipo_Doc", "Tipo_Doc", "Tercero", "Recaudo (venta dia)"]
-    ).copy()
+    # Misma regla que drop_duplicates(subset=...), sobre una clave entera por fila
+    clave = claves.filas(df, ["Fecha", "Codigo_Tipo_Doc", "Tipo_Doc", "Tercero", "Recaudo (venta dia)"])
+    df = df[~pd.Index(clave).duplicated()].copy()
     removed = before - len(df)
     if removed:
         print(f"[LOG] Duplicados removidos: {removed}")
@@ -273,15 +260,97 @@ def _build_facturacion(df_raw: pd.DataFrame):
 
 
 def _write_sheets(df_fact: pd.DataFrame, df_control: pd.DataFrame, dest: Path):
-    mode = "a" if dest.exists() else "w"
-    with pd.ExcelWriter(dest, engine="openpyxl", mode=mode, if_sheet_exists="replace") as writer:
+    # if_sheet_exists solo es valido al agregar a un libro existente
+    kwargs = {"mode": "a", "if_sheet_exists": "replace"} if dest.exists() else {}
+    with pd.ExcelWriter(dest, engine="openpyxl", **kwargs) as writer:
         df_fact.to_excel(writer, sheet_name=SHEET_FACTURACION, index=False)
         df_control.to_excel(writer, sheet_name=SHEET_CONTROL, index=False)
 
 
+def _partition_by_month(df_fact: pd.DataFrame, df_control: pd.DataFrame, fallback: Path) -> dict:
+    """{maestro: (facturacion, control)} segun Año/Mes de la Fecha de cada fila.
+
+    Meses sin maestro y fechas invalidas (SIN_MES) van a `fallback`.
+    """
+    dests = {}
+
+    def _dest_de(fechas: pd.Series) -> pd.Series:
+        dt = pd.to_datetime(fechas, format="%d/%m/%Y", errors="coerce")
+        keys = [None if pd.isna(d) else (d.year, d.month) for d in dt]
+        for key in set(keys) - set(dests):
+            dest = maestros.del_mes(OUTPUT_DIR, *key) if key else None
+            if dest is None:
+                label = f"{MONTH_MAP[key[1]]} {key[0]}" if key else "SIN_MES"
+                print(f"[LOG] Sin maestro para {label}: sus filas van a {fallback.name}")
+            dests[key] = dest or fallback
+        return pd.Series([dests[k] for k in keys], index=fechas.index, dtype=object)
+
+    fact_dest = _dest_de(df_fact["Fecha"]) if not df_fact.empty else pd.Series(dtype=object)
+    control_dest = _dest_de(df_control["Fecha"]) if not df_control.empty else pd.Series(dtype=object)
+
+    parts = {}
+    for dest in pd.unique(pd.concat([fact_dest, control_dest], ignore_index=True)):
+        parts[dest] = (
+            df_fact[fact_dest == dest].reset_index(drop=True) if not df_fact.empty else df_fact,
+            df_control[control_dest == dest].reset_index(drop=True) if not df_control.empty else df_control,
+        )
+    return parts or {fallback: (df_fact, df_control)}
+
+
+def _store_path(dest: Path) -> Path:
+    return CACHE_DIR / f"facturacion_{dest.stem}.pkl"
+
+
+def _firma(df_fact: pd.DataFrame, df_control: pd.DataFrame) -> tuple:
+    return huellas.firma_frame(df_fact, df_fact.columns), huellas.firma_frame(df_control, df_control.columns)
+
+
+def _sin_cambios(dest: Path, firma: tuple) -> bool:
+    if not USE_FINGERPRINT_STORE or not dest.exists():
+        return False
+    store = huellas.cargar(_store_path(dest))
+    if store is None or store.get("firma") != firma:
+        return False
+    # 01/02 reescriben el maestro completo y se llevan estas hojas
+    with lectura_excel.abrir(dest) as book:
+        return {SHEET_FACTURACION, SHEET_CONTROL} <= set(book.sheet_names)
+
+
+def _write_months(parts: dict) -> list:
+    """Escribe (en paralelo si hay varios) los maestros con cambios. Devuelve los escritos."""
+    pending = {}
+    for dest, (fact, control) in parts.items():
+        firma = _firma(fact, control)
+        if _sin_cambios(dest, firma):
+            print(f"[LOG] Sin cambios: {dest.name} ({len(fact)} filas facturacion)")
+            continue
+        pending[dest] = firma
+
+    workers = min(WRITE_WORKERS, len(pending))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {dest: pool.submit(_write_sheets, *parts[dest], dest) for dest in pending}
+            for fut in futures.values():
+                fut.result()
+    else:
+        for dest in pending:
+            _write_sheets(*parts[dest], dest)
+
+    for dest, firma in pending.items():
+        print(f"[OK] Hojas '{SHEET_FACTURACION}' y '{SHEET_CONTROL}' actualizadas en: {dest} ({len(parts[dest][0])} filas)")
+        if USE_FINGERPRINT_STORE:
+            huellas.guardar(_store_path(dest), {"firma": firma})
+    return list(pending)
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Genera las hojas de facturacion desde los JSON de caja de DentOS.")
+    # El JSON de caja no trae documento del paciente: sin --doc
+    corrida_parcial.agregar_argumentos(parser, doc=False)
+    parcial = corrida_parcial.desde_args(parser, parser.parse_args())
+
     print('[LOG] Nota: rangos de ABRIL 2026 estan provisionales y pendientes de ajuste con gerencia.')
-    files, df_raw = _read_json_files()
+    files, df_raw = _read_json_files(parcial)
     print(f"[LOG] JSON leidos: {len(files)}")
     print(f"[LOG] Filas detalle (entrada): {len(df_raw)}")
 
@@ -297,12 +366,25 @@ def main():
         print("[LOG] Control diario (fecha / diferencia / estado):")
         print(df_control[["Fecha", "Diferencia", "Estado", "Documentos_Excluidos"]].to_string(index=False))
 
-    dest = _find_output_master("formato_odontologia")
-    if dest is None:
-        dest = OUTPUT_DIR / "formato_odontologia_FACTURACION.xlsx"
+    if parcial is not None:
+        # Ni maestros, ni firmas, ni SQLite: solo el libro de trabajo (si se pidio)
+        dest = parcial.destino(OUTPUT_DIR, "03", "facturacion")
+        if dest is not None:
+            _write_sheets(df_fact, df_control, dest)
+            print(f"[OK] Hojas '{SHEET_FACTURACION}' y '{SHEET_CONTROL}' (parcial) en: {dest}")
+        return
 
-    _write_sheets(df_fact, df_control, dest)
-    print(f"[OK] Hojas '{SHEET_FACTURACION}' y '{SHEET_CONTROL}' actualizadas en: {dest}")
+    # Cada mes va a su propio maestro (version .N mas alta); el vigente de 02/04/05 no cambia
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    parts = _partition_by_month(df_fact, df_control, OUTPUT_DIR / f"{maestros.FACTURACION}.xlsx")
+    written = _write_months(parts)
+    print(f"[LOG] Maestros: {len(parts)} | escritos: {len(written)} | sin cambios: {len(parts) - len(written)}")
+
+    if SYNC_SQLITE:
+        for dest in written:
+            almacen_sqlite.sincronizar(
+                OUTPUT_DIR / almacen_sqlite.DB_NAME, dest.name, facturacion=parts[dest][0], control=parts[dest][1]
+            )
 
 
 if __name__ == "__main__":
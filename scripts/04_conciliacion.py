@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+import argparse
+import unicodedata
+from pathlib import Path
+
+import pandas as pd
+
+import lectura_excel
+import maestros
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+OUTPUT_DIR = BASE_DIR / "excel_generado"
+SHEET_MERCADEO = 0  # script 02 reescribe el maestro con la hoja de datos en primera posicion
+SHEET_FACTURACION = "facturacion"
+SHEET_CONCILIACION = "conciliacion"
+
+COL_RECAUDO_MERCADEO = "Recaudo (venta día)"
+COL_RECAUDO_FACTURACION = "Recaudo (venta dia)"
+
+# Clave del cruce: dia + paciente normalizado + valor (+ ocurrencia para pagos repetidos)
+JOIN_KEYS = ["Fecha_dia", "Paciente_norm", "Valor", "Ocurrencia"]
+
+CONCILIACION_COLS = [
+    "Seccion",
+    "Fecha",
+    "Paciente",
+    "Referencia",
+    "Filas_Conciliadas",
+    "Valor_Conciliado",
+    "Recaudo_Mercadeo",
+    "Recaudo_Facturacion",
+    "Solo_Mercadeo",
+    "Solo_Facturacion",
+    "Diferencia",
+]
+
+
+def _norm_nombre(txt) -> str:
+    if pd.isna(txt):
+        return ""
+    txt = unicodedata.normalize("NFD", str(txt).upper())
+    txt = "".join(c if c.isalpha() else " " for c in txt if unicodedata.category(c) != "Mn")
+    # Orden de tokens: "PEREZ ANA" y "ANA PEREZ" son el mismo paciente
+    return " ".join(sorted(txt.split()))
+
+
+def _norm_pacientes(serie: pd.Series) -> pd.Series:
+    # Normaliza solo valores unicos: los nombres se repiten mucho en un año de datos
+    uniques = pd.unique(serie)
+    mapping = {u: _norm_nombre(u) for u in uniques}
+    return serie.map(mapping)
+
+
+def _prepare_side(df: pd.DataFrame, valor_col: str, ref_col: str) -> pd.DataFrame:
+    if df.empty or valor_col not in df.columns:
+        return pd.DataFrame(columns=JOIN_KEYS + ["Fecha", "Paciente", "Referencia"])
+
+    side = pd.DataFrame(
+        {
+            "Fecha_dia": pd.to_datetime(df["Fecha"], format="%d/%m/%Y", errors="coerce"),
+            "Paciente": df["Paciente"],
+            "Valor": pd.to_numeric(df[valor_col], errors="coerce"),
+            "Referencia": df[ref_col] if ref_col in df.columns else pd.NA,
+        }
+    )
+    side = side[side["Fecha_dia"].notna() & side["Valor"].notna() & (side["Valor"] > 0)].copy()
+    side["Valor"] = side["Valor"].round().astype("int64")
+    side["Fecha"] = side["Fecha_dia"].dt.strftime("%d/%m/%Y")
+    side["Paciente_norm"] = _norm_pacientes(side["Paciente"])
+    # Pagos identicos del mismo dia se emparejan uno a uno segun su orden de aparicion
+    side["Ocurrencia"] = side.groupby(["Fecha_dia", "Paciente_norm", "Valor"]).cumcount()
+    return side
+
+
+def _conciliar(df_mercadeo: pd.DataFrame, df_fact: pd.DataFrame):
+    merc = _prepare_side(df_mercadeo, COL_RECAUDO_MERCADEO, "id_registro")
+    fact = _prepare_side(df_fact, COL_RECAUDO_FACTURACION, "Tipo_factura")
+
+    joined = merc.merge(
+        fact,
+        on=JOIN_KEYS,
+        how="outer",
+        suffixes=("_merc", "_fact"),
+        indicator=True,
+    )
+    joined["Fecha_dia"] = pd.to_datetime(joined["Fecha_dia"])
+    is_match = joined["_merge"] == "both"
+    only_merc = joined["_merge"] == "left_only"
+    only_fact = joined["_merge"] == "right_only"
+
+    valor = joined["Valor"]
+    daily = pd.DataFrame(
+        {
+            "Fecha_dia": joined["Fecha_dia"],
+            "Filas_Conciliadas": is_match.astype("int64"),
+            "Valor_Conciliado": valor.where(is_match, 0),
+            "Recaudo_Mercadeo": valor.where(is_match | only_merc, 0),
+            "Recaudo_Facturacion": valor.where(is_match | only_fact, 0),
+            "Solo_Mercadeo": valor.where(only_merc, 0),
+            "Solo_Facturacion": valor.where(only_fact, 0),
+        }
+    ).groupby("Fecha_dia", sort=True).sum()
+    daily["Diferencia"] = daily["Recaudo_Mercadeo"] - daily["Recaudo_Facturacion"]
+    daily = daily.reset_index()
+    daily["Fecha"] = daily["Fecha_dia"].dt.strftime("%d/%m/%Y")
+    daily["Seccion"] = "DIARIO"
+
+    total = daily.drop(columns=["Fecha_dia", "Fecha", "Seccion"]).sum().to_frame().T
+    total["Seccion"] = "TOTAL"
+
+    detail_merc = joined[only_merc].sort_values(["Fecha_dia", "Paciente_norm"])
+    detail_merc = pd.DataFrame(
+        {
+            "Seccion": "SOLO_MERCADEO",
+            "Fecha": detail_merc["Fecha_merc"],
+            "Paciente": detail_merc["Paciente_merc"],
+            "Referencia": detail_merc["Referencia_merc"],
+            "Recaudo_Mercadeo": detail_merc["Valor"],
+        }
+    )
+    detail_fact = joined[only_fact].sort_values(["Fecha_dia", "Paciente_norm"])
+    detail_fact = pd.DataFrame(
+        {
+            "Seccion": "SOLO_FACTURACION",
+            "Fecha": detail_fact["Fecha_fact"],
+            "Paciente": detail_fact["Paciente_fact"],
+            "Referencia": detail_fact["Referencia_fact"],
+            "Recaudo_Facturacion": detail_fact["Valor"],
+        }
+    )
+
+    parts = [p for p in (daily, total, detail_merc, detail_fact) if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=CONCILIACION_COLS), 0, 0, 0
+    out = pd.concat(parts, ignore_index=True).reindex(columns=CONCILIACION_COLS)
+    for col in CONCILIACION_COLS[4:]:
+        out[col] = out[col].astype("Int64")
+    return out, int(is_match.sum()), int(only_merc.sum()), int(only_fact.sum())
+
+
+def _write_sheet(df: pd.DataFrame, dest: Path):
+    with pd.ExcelWriter(dest, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
+        df.to_excel(writer, sheet_name=SHEET_CONCILIACION, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concilia el recaudo de mercadeo contra la facturacion del maestro.")
+    maestros.agregar_argumentos(parser)
+    args = parser.parse_args()
+    dest = maestros.resolver(parser, args, OUTPUT_DIR)
+
+    with lectura_excel.abrir(dest) as book:
+        if SHEET_FACTURACION not in book.sheet_names:
+            raise ValueError(f"El maestro {dest.name} no tiene hoja '{SHEET_FACTURACION}'. Ejecuta el script 03 primero.")
+        df_mercadeo = lectura_excel.leer(book, sheet_name=SHEET_MERCADEO, doc_cols=["Numero_Documento"])
+        df_fact = lectura_excel.leer(book, sheet_name=SHEET_FACTURACION)
+
+    print(f"[LOG] Maestro: {dest.name}")
+    print(f"[LOG] Filas mercadeo: {len(df_mercadeo)} | filas facturacion: {len(df_fact)}")
+
+    out, matched, only_merc, only_fact = _conciliar(df_mercadeo, df_fact)
+    total = out[out["Seccion"] == "TOTAL"]
+    if not total.empty:
+        t = total.iloc[0]
+        print(f"[LOG] Conciliados: {matched} filas | valor {int(t['Valor_Conciliado'])}")
+        print(f"[LOG] Solo mercadeo: {only_merc} filas | valor {int(t['Solo_Mercadeo'])}")
+        print(f"[LOG] Solo facturacion: {only_fact} filas | valor {int(t['Solo_Facturacion'])}")
+        print(f"[LOG] Diferencia total (mercadeo - facturacion): {int(t['Diferencia'])}")
+
+    daily = out[(out["Seccion"] == "DIARIO") & (out["Diferencia"] != 0)]
+    if not daily.empty:
+        print("[LOG] Dias con diferencia:")
+        print(daily[["Fecha", "Recaudo_Mercadeo", "Recaudo_Facturacion", "Diferencia"]].to_string(index=False))
+
+    _write_sheet(out, dest)
+    print(f"[OK] Hoja '{SHEET_CONCILIACION}' actualizada en: {dest}")
+
+
+if __name__ == "__main__":
+    main()
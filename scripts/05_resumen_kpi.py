@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+import lectura_excel
+import maestros
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+OUTPUT_DIR = BASE_DIR / "excel_generado"
+SHEET_MERCADEO = 0  # script 02 reescribe el maestro con la hoja de datos en primera posicion
+SHEET_RESUMEN = "resumen"
+SHEET_CONTROL = "resumen_control"
+
+# Granos del cubo: los mismos campos que gerencia usa en sus tablas dinamicas
+WEEK_KEYS = ["Mes", "Semana"]
+DIMENSIONS = WEEK_KEYS + ["Agente", "Especialidad", "Canal_Captacion", "Profesional_Asignado"]
+MEASURES = ["Programados", "Asistido", "Efectivo", "Recaudo (venta día)"]
+CONTROL_COLS = WEEK_KEYS + ["Filas_Maestro", "Huella"]
+
+
+def _resumen_path(master: Path) -> Path:
+    # Libro aparte junto al maestro: el script 02 reescribe el maestro completo y borraria la hoja
+    return master.with_name(f"resumen_{master.name}")
+
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    data = df.reindex(columns=DIMENSIONS + MEASURES).copy()
+    for col in DIMENSIONS:
+        data[col] = data[col].astype(object).where(data[col].notna(), "").astype(str).str.strip()
+    for col in MEASURES:
+        data[col] = pd.to_numeric(data[col], errors="coerce").fillna(0).round().astype("int64")
+    return data
+
+
+def _week_fingerprints(data: pd.DataFrame) -> pd.DataFrame:
+    # Huella por semana independiente del orden de filas: suma (mod 2^64) del hash de cada fila
+    hashes = pd.util.hash_pandas_object(data, index=False)
+    grouped = hashes.groupby([data[c] for c in WEEK_KEYS], sort=True)
+    control = pd.DataFrame(
+        {
+            "Filas_Maestro": grouped.size(),
+            "Huella": grouped.sum().map(lambda v: f"{int(v) & 0xFFFFFFFFFFFFFFFF:016x}"),
+        }
+    ).reset_index()
+    return control[CONTROL_COLS]
+
+
+def _aggregate(data: pd.DataFrame) -> pd.DataFrame:
+    if data.empty:
+        return pd.DataFrame(columns=DIMENSIONS + MEASURES + ["Filas"])
+    cube = data.groupby(DIMENSIONS, sort=True).agg(
+        **{m: (m, "sum") for m in MEASURES},
+        Filas=("Programados", "size"),
+    )
+    return cube.reset_index()
+
+
+def _read_previous(path: Path):
+    if not path.exists():
+        return pd.DataFrame(columns=DIMENSIONS + MEASURES + ["Filas"]), pd.DataFrame(columns=CONTROL_COLS)
+    sheets = lectura_excel.leer(path, sheet_name=[SHEET_RESUMEN, SHEET_CONTROL], dtype={"Huella": str})
+    resumen = sheets[SHEET_RESUMEN]
+    for col in DIMENSIONS:
+        resumen[col] = resumen[col].astype(object).where(resumen[col].notna(), "").astype(str)
+    control = sheets[SHEET_CONTROL]
+    for col in WEEK_KEYS:
+        control[col] = control[col].astype(object).where(control[col].notna(), "").astype(str)
+    return resumen, control
+
+
+def _update_cube(data: pd.DataFrame, prev_resumen: pd.DataFrame, prev_control: pd.DataFrame):
+    control = _week_fingerprints(data)
+    merged = control.merge(prev_control, on=WEEK_KEYS, how="left", suffixes=("", "_prev"))
+    unchanged = merged[merged["Huella"] == merged["Huella_prev"]][WEEK_KEYS]
+    changed = merged[merged["Huella"] != merged["Huella_prev"]][WEEK_KEYS]
+
+    # Semanas sin cambios: se conservan las celdas ya agregadas
+    kept = prev_resumen.merge(unchanged, on=WEEK_KEYS, how="inner")
+    # Semanas nuevas o modificadas: solo esas filas del maestro se vuelven a agregar
+    to_compute = data.merge(changed, on=WEEK_KEYS, how="inner")
+    recomputed = _aggregate(to_compute)
+
+    parts = [p for p in (kept, recomputed) if not p.empty]
+    if parts:
+        resumen = pd.concat(parts, ignore_index=True)
+    else:
+        resumen = pd.DataFrame(columns=DIMENSIONS + MEASURES + ["Filas"])
+    resumen = resumen.sort_values(DIMENSIONS).reset_index(drop=True)
+    return resumen, control, changed
+
+
+def _write_sheets(resumen: pd.DataFrame, control: pd.DataFrame, dest: Path):
+    with pd.ExcelWriter(dest, engine="openpyxl") as writer:
+        resumen.to_excel(writer, sheet_name=SHEET_RESUMEN, index=False)
+        control.to_excel(writer, sheet_name=SHEET_CONTROL, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Actualiza el resumen KPI (cubo por semana) del maestro.")
+    maestros.agregar_argumentos(parser)
+    args = parser.parse_args()
+    master = maestros.resolver(parser, args, OUTPUT_DIR)
+    dest = _resumen_path(master)
+
+    df_master = lectura_excel.leer(master, sheet_name=SHEET_MERCADEO, doc_cols=["Numero_Documento"])
+    data = _prepare(df_master)
+    prev_resumen, prev_control = _read_previous(dest)
+
+    resumen, control, changed = _update_cube(data, prev_resumen, prev_control)
+    removed = len(prev_control.merge(control[WEEK_KEYS], on=WEEK_KEYS, how="left", indicator=True)
+                  .query("_merge == 'left_only'"))
+
+    print(f"[LOG] Maestro: {master.name} | filas: {len(data)}")
+    print(f"[LOG] Semanas en maestro: {len(control)} | recalculadas: {len(changed)} | eliminadas: {removed}")
+    if not changed.empty:
+        print("[LOG] Semanas recalculadas:")
+        print(changed.to_string(index=False))
+    print(f"[LOG] Celdas del cubo (filas resumen): {len(resumen)}")
+
+    if changed.empty and not removed and dest.exists():
+        print(f"[OK] Resumen sin cambios: {dest}")
+        return
+
+    _write_sheets(resumen, control, dest)
+    print(f"[OK] Hojas '{SHEET_RESUMEN}' y '{SHEET_CONTROL}' actualizadas en: {dest}")
+
+
+if __name__ == "__main__":
+    main()
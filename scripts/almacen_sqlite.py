@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""Espejo SQLite del maestro (Datos Mercadeo, facturacion, facturacion_control) para consultas rapidas.
+
+Los scripts 02 y 03 sincronizan sus hojas al terminar. Las filas van por maestro sin version:
+formato_odontologia_FEBRERO.1.xlsx (nueva corrida del 01) reemplaza a formato_odontologia_FEBRERO.xlsx.
+Consultas:
+
+    python scripts/almacen_sqlite.py --doc 1003099855
+    python scripts/almacen_sqlite.py --semana SEMANA2 --mes FEBRERO
+"""
+import argparse
+import re
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+OUTPUT_DIR = BASE_DIR / "excel_generado"
+DB_NAME = "odontologia.sqlite3"
+
+# (columna Excel, columna SQL, tipo)
+MERCADEO_COLS = [
+    ("id_registro", "id_registro", "TEXT"),
+    ("Ocurrencia", "Ocurrencia", "INTEGER"),
+    ("Numero_Documento", "Numero_Documento", "TEXT"),
+    ("Paciente", "Paciente", "TEXT"),
+    ("Municipio", "Municipio", "TEXT"),
+    ("Convenio", "Convenio", "TEXT"),
+    ("Fecha", "Fecha", "FECHA"),
+    ("Mes", "Mes", "TEXT"),
+    ("Semana", "Semana", "TEXT"),
+    ("Agente", "Agente", "TEXT"),
+    ("Profesional_Asignado", "Profesional_Asignado", "TEXT"),
+    ("Especialidad", "Especialidad", "TEXT"),
+    ("Canal_Captacion", "Canal_Captacion", "TEXT"),
+    ("Tipo_Cita", "Tipo_Cita", "TEXT"),
+    ("Programados", "Programados", "INTEGER"),
+    ("Asistido", "Asistido", "INTEGER"),
+    ("Efectivo", "Efectivo", "INTEGER"),
+    ("Factura", "Factura", "TEXT"),
+    ("Metodo_Pago", "Metodo_Pago", "TEXT"),
+    ("Asesor_Comercial", "Asesor_Comercial", "TEXT"),
+    ("Año", "Anio", "INTEGER"),
+    ("Recaudo (venta día)", "Recaudo", "INTEGER"),
+]
+FACTURACION_COLS = [
+    ("Fecha", "Fecha", "FECHA"),
+    ("Año", "Anio", "INTEGER"),
+    ("Mes", "Mes", "TEXT"),
+    ("Semana", "Semana", "TEXT"),
+    ("Tipo_factura", "Tipo_factura", "TEXT"),
+    ("Tipo_Doc", "Tipo_Doc", "TEXT"),
+    ("Paciente", "Paciente", "TEXT"),
+    ("Recaudo (venta dia)", "Recaudo", "INTEGER"),
+    ("Total_Documentos_JSON", "Total_Documentos_JSON", "INTEGER"),
+    ("Total_Listado_JSON", "Total_Listado_JSON", "INTEGER"),
+]
+CONTROL_COLS = [
+    ("Fecha", "Fecha", "FECHA"),
+    ("Total_Listado", "Total_Listado", "INTEGER"),
+    ("Total_Documentos", "Total_Documentos", "INTEGER"),
+    ("Diferencia", "Diferencia", "INTEGER"),
+    ("Documentos_Excluidos", "Documentos_Excluidos", "TEXT"),
+    ("Valor_Excluido", "Valor_Excluido", "INTEGER"),
+    ("Estado", "Estado", "TEXT"),
+]
+
+# tabla -> (hoja, columnas, clave unica ademas de `maestro`)
+TABLAS = {
+    # 02 copia filas plantilla con el mismo id_registro: Ocurrencia las distingue (0, 1, ...)
+    "mercadeo": ("Datos Mercadeo", MERCADEO_COLS, ["id_registro", "Ocurrencia"]),
+    # 03 deja una sola fila por esta combinacion (su dedup)
+    "facturacion": ("facturacion", FACTURACION_COLS, ["Fecha", "Tipo_factura", "Tipo_Doc", "Paciente", "Recaudo"]),
+    "facturacion_control": ("facturacion_control", CONTROL_COLS, ["Fecha"]),
+}
+
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS ix_mercadeo_doc_fecha ON mercadeo (Numero_Documento, Fecha)",
+    "CREATE INDEX IF NOT EXISTS ix_mercadeo_id ON mercadeo (id_registro)",
+    "CREATE INDEX IF NOT EXISTS ix_mercadeo_semana ON mercadeo (Semana)",
+    "CREATE INDEX IF NOT EXISTS ix_facturacion_fecha ON facturacion (Fecha)",
+    "CREATE INDEX IF NOT EXISTS ix_facturacion_semana ON facturacion (Semana)",
+]
+
+
+def maestro_base(nombre: str) -> str:
+    """Nombre del maestro sin la version `.N` que agrega el 01 (formato_odontologia_FEBRERO.1.xlsx -> ...FEBRERO.xlsx)."""
+    return re.sub(r"\.\d+(\.xlsx)$", r"\1", nombre, flags=re.IGNORECASE)
+
+
+def _sql_tipo(tipo: str) -> str:
+    return "TEXT" if tipo == "FECHA" else tipo
+
+
+def _crear_esquema(conn: sqlite3.Connection):
+    for tabla, (_, cols, clave) in TABLAS.items():
+        defs = ["maestro TEXT NOT NULL"]
+        for _, sql_col, tipo in cols:
+            not_null = " NOT NULL" if sql_col in clave else ""
+            defs.append(f"{sql_col} {_sql_tipo(tipo)}{not_null}")
+        defs.append("sincronizado TEXT NOT NULL")
+        defs.append(f"PRIMARY KEY (maestro, {', '.join(clave)})")
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {tabla} ({', '.join(defs)})")
+    for sql in INDICES:
+        conn.execute(sql)
+
+
+def _valores(serie: pd.Series, tipo: str) -> list:
+    """Columna -> lista de valores nativos para sqlite3 (None en vacios)."""
+    if tipo == "INTEGER":
+        num = pd.to_numeric(serie, errors="coerce").round()
+        return [None if pd.isna(v) else int(v) for v in num.tolist()]
+    if tipo == "FECHA":
+        # Fecha ISO (AAAA-MM-DD) para que ordene y filtre por rango
+        dt = pd.to_datetime(serie, format="%d/%m/%Y", errors="coerce")
+        resto = dt.isna() & serie.notna()
+        if resto.any():
+            dt[resto] = pd.to_datetime(serie[resto], errors="coerce", dayfirst=True)
+        return [None if pd.isna(v) else v for v in dt.dt.strftime("%Y-%m-%d").tolist()]
+    # Texto: documentos numericos sin el .0 que deja Excel; vacio como NULL (igual que al releer el Excel)
+    out = []
+    for v in serie.tolist():
+        if v is None or (isinstance(v, float) and pd.isna(v)) or v is pd.NA:
+            out.append(None)
+        elif isinstance(v, float) and v.is_integer():
+            out.append(str(int(v)))
+        else:
+            out.append(str(v).strip() or None)
+    return out
+
+
+def _filas(df: pd.DataFrame, cols, clave, maestro: str, marca: str):
+    columnas = []
+    for excel_col, sql_col, tipo in cols:
+        serie = df[excel_col] if excel_col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        vals = _valores(serie, tipo)
+        if sql_col in clave:
+            vacio = 0 if tipo == "INTEGER" else ""
+            vals = [vacio if v is None else v for v in vals]
+        columnas.append(vals)
+    n = len(df)
+    return zip([maestro] * n, *columnas, [marca] * n)
+
+
+def _upsert(conn: sqlite3.Connection, tabla: str, df: pd.DataFrame, maestro: str, marca: str) -> int:
+    _, cols, clave = TABLAS[tabla]
+    if tabla == "mercadeo":
+        df = df.assign(Ocurrencia=df.groupby("id_registro", sort=False, dropna=False).cumcount())
+    sql_cols = ["maestro"] + [c for _, c, _ in cols] + ["sincronizado"]
+    no_clave = [c for c in sql_cols if c not in clave and c != "maestro"]
+    sql = (
+        f"INSERT INTO {tabla} ({', '.join(sql_cols)}) VALUES ({', '.join('?' * len(sql_cols))}) "
+        f"ON CONFLICT (maestro, {', '.join(clave)}) DO UPDATE SET "
+        + ", ".join(f"{c} = excluded.{c}" for c in no_clave)
+    )
+    conn.executemany(sql, _filas(df, cols, clave, maestro, marca))
+    # Lo que ya no esta en la hoja se borra (el Excel es la fuente)
+    conn.execute(f"DELETE FROM {tabla} WHERE maestro = ? AND sincronizado <> ?", (maestro, marca))
+    # Bases de antes de agrupar por maestro sin version: filas guardadas con el nombre versionado
+    raiz = maestro[: -len(".xlsx")] if maestro.lower().endswith(".xlsx") else maestro
+    conn.execute(f"DELETE FROM {tabla} WHERE maestro GLOB ?", (f"{raiz}.[0-9]*.xlsx",))
+    return len(df)
+
+
+def conectar(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _crear_esquema(conn)
+    return conn
+
+
+def sincronizar(db_path: Path, maestro: str, mercadeo=None, facturacion=None, control=None) -> bool:
+    """Refleja en SQLite las hojas dadas del maestro `maestro` (upsert + borrado de filas que ya no estan).
+
+    `maestro` se guarda sin version (`maestro_base`): la version nueva reemplaza a las anteriores.
+    Cada tabla va en su propia transaccion. Un error aqui no detiene el pipeline: el Excel ya quedo escrito.
+    """
+    maestro = maestro_base(maestro)
+    frames = {"mercadeo": mercadeo, "facturacion": facturacion, "facturacion_control": control}
+    marca = datetime.now().isoformat(timespec="microseconds")
+    t0 = time.perf_counter()
+    resumen = []
+    try:
+        conn = conectar(db_path)
+        try:
+            for tabla, df in frames.items():
+                if df is None:
+                    continue
+                with conn:
+                    n = _upsert(conn, tabla, df, maestro, marca)
+                resumen.append(f"{tabla} {n}")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"[LOG] No se pudo sincronizar SQLite ({db_path.name}): {e}")
+        return False
+    print(f"[LOG] SQLite {db_path.name} ({maestro}): {', '.join(resumen)} filas en {time.perf_counter() - t0:.2f}s")
+    return True
+
+
+def _consultar(conn: sqlite3.Connection, sql: str, params) -> pd.DataFrame:
+    t0 = time.perf_counter()
+    df = pd.read_sql_query(sql, conn, params=params)
+    print(f"[LOG] {len(df)} filas en {(time.perf_counter() - t0) * 1000:.1f} ms")
+    return df
+
+
+def _doc_consulta(doc: str) -> str:
+    s = str(doc).strip()
+    return s[:-2] if s.endswith(".0") else s
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas sobre el espejo SQLite del maestro.")
+    parser.add_argument("--db", type=Path, default=OUTPUT_DIR / DB_NAME)
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--doc", help="Numero_Documento (historia del paciente en todos los maestros)")
+    grupo.add_argument("--semana", help="SEMANA1..SEMANA4")
+    parser.add_argument("--mes", help="con --semana: ENERO, FEBRERO, ...")
+    parser.add_argument("--anio", type=int, help="con --semana: año de la fecha")
+    parser.add_argument("--limite", type=int, default=200, help="filas a mostrar")
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        raise FileNotFoundError(f"No existe la base {args.db}. Ejecuta los scripts 02/03 primero.")
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.doc:
+            df = _consultar(
+                conn,
+                "SELECT maestro, id_registro, Fecha, Paciente, Semana, Especialidad, Tipo_Cita, "
+                "Asistido, Efectivo, Factura, Metodo_Pago, Recaudo "
+                "FROM mercadeo WHERE Numero_Documento = ? ORDER BY Fecha, id_registro, Ocurrencia",
+                (_doc_consulta(args.doc),),
+            )
+            print(df.head(args.limite).to_string(index=False))
+            return
+
+        filtros, params = ["Semana = ?"], [args.semana.strip().upper()]
+        if args.mes:
+            filtros.append("Mes = ?")
+            params.append(args.mes.strip().upper())
+        if args.anio:
+            filtros.append("substr(Fecha, 1, 4) = ?")
+            params.append(str(args.anio))
+        where = " AND ".join(filtros)
+        df = _consultar(
+            conn,
+            f"SELECT maestro, id_registro, Numero_Documento, Paciente, Fecha, Agente, Especialidad, "
+            f"Programados, Asistido, Efectivo, Recaudo FROM mercadeo WHERE {where} ORDER BY Fecha, id_registro, Ocurrencia",
+            params,
+        )
+        print(df.head(args.limite).to_string(index=False))
+        tot = _consultar(
+            conn,
+            f"SELECT COUNT(*) AS Filas, SUM(Recaudo) AS Recaudo FROM facturacion WHERE {where}",
+            params,
+        )
+        print("[LOG] Facturacion de la semana:")
+        print(tot.to_string(index=False))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
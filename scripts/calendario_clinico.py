@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Calendario de semanas clinicas por mes (compartido por los scripts 01, 02 y 03)."""
+import calendar
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+
+SEMANAS_POR_MES = 4
+
+# Semanas clinicas (4 por mes). Ajusta aqui cuando cambien reglas de negocio.
+WEEK_RANGES_BY_MONTH = {
+    (2026, 1): {
+        "SEMANA1": (date(2026, 1, 2), date(2026, 1, 10)),
+        "SEMANA2": (date(2026, 1, 12), date(2026, 1, 17)),
+        "SEMANA3": (date(2026, 1, 19), date(2026, 1, 24)),
+        "SEMANA4": (date(2026, 1, 26), date(2026, 1, 31)),
+    },
+    (2026, 2): {
+        "SEMANA1": (date(2026, 2, 2), date(2026, 2, 7)),
+        "SEMANA2": (date(2026, 2, 9), date(2026, 2, 14)),
+        "SEMANA3": (date(2026, 2, 16), date(2026, 2, 21)),
+        "SEMANA4": (date(2026, 2, 23), date(2026, 2, 28)),
+    },
+    (2026, 3): {
+        "SEMANA1": (date(2026, 3, 2), date(2026, 3, 7)),
+        "SEMANA2": (date(2026, 3, 9), date(2026, 3, 14)),
+        "SEMANA3": (date(2026, 3, 16), date(2026, 3, 21)),
+        "SEMANA4": (date(2026, 3, 23), date(2026, 3, 31)),
+    },
+    (2026, 4): {
+        "SEMANA1": (date(2026, 4, 1), date(2026, 4, 11)),
+        "SEMANA2": (date(2026, 4, 13), date(2026, 4, 18)),
+        "SEMANA3": (date(2026, 4, 20), date(2026, 4, 25)),
+        "SEMANA4": (date(2026, 4, 27), date(2026, 4, 30)),
+    },
+}
+
+
+def semanas_del_mes(year: int, month: int) -> dict:
+    """Semanas clinicas del mes: la tabla acordada si existe; si no, semanas Lun-Sab.
+
+    Si el mes da mas de 4 semanas, la semana parcial mas corta del borde se une a su vecina
+    (misma regla que produjo los rangos acordados de marzo y abril 2026).
+    """
+    if (year, month) in WEEK_RANGES_BY_MONTH:
+        return dict(WEEK_RANGES_BY_MONTH[(year, month)])
+
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    weeks = []
+    d = first
+    while d <= last:
+        if d.weekday() == 6:  # domingo
+            d += timedelta(days=1)
+            continue
+        end = min(d + timedelta(days=5 - d.weekday()), last)
+        weeks.append([d, end])
+        d = end + timedelta(days=1)
+
+    while len(weeks) > SEMANAS_POR_MES:
+        first_len = (weeks[0][1] - weeks[0][0]).days
+        last_len = (weeks[-1][1] - weeks[-1][0]).days
+        if first_len <= last_len:
+            weeks[1][0] = weeks[0][0]
+            weeks.pop(0)
+        else:
+            weeks[-2][1] = weeks[-1][1]
+            weeks.pop()
+
+    return {f"SEMANA{i + 1}": (start, end) for i, (start, end) in enumerate(weeks)}
+
+
+@lru_cache(maxsize=None)
+def _rangos(year: int, month: int) -> tuple:
+    return tuple(semanas_del_mes(year, month).items())
+
+
+def semana_de(d) -> str | None:
+    """SEMANAn de la fecha `d` segun `semanas_del_mes`; None si no cae en ninguna (o no hay fecha)."""
+    if not isinstance(d, date) or d != d:  # None / NA / NaN / NaT
+        return None
+    if isinstance(d, datetime):
+        d = d.date()
+    for semana, (start, end) in _rangos(d.year, d.month):
+        if start <= d <= end:
+            return semana
+    return None
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Claves enteras para cruces y deduplicados: (documento, dia) empacado en un int64.
+
+Cada documento normalizado recibe un entero en un diccionario de pacientes que se guarda en
+excel_generado/.cache/ y solo crece: un documento conserva su numero entre corridas. El dia
+va como numero de dia desde 1900-01-01. Cruzar, agrupar y deduplicar sobre esta clave es
+comparar enteros, en lugar de tuplas (texto, fecha) de Python.
+
+Documento vacio y fecha faltante tienen su propio codigo (0), asi que la clave distingue
+exactamente los mismos casos que la tupla (doc_norm, Fecha_dia) que reemplaza.
+"""
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+VERSION = 1
+BITS_DIA = 17  # dias desde 1900 hasta ~2258
+_EPOCA = np.datetime64("1900-01-01", "D")
+
+
+def ruta(cache_dir: Path) -> Path:
+    return cache_dir / "pacientes.pkl"
+
+
+def cargar(path: Path) -> dict:
+    """Diccionario doc_norm -> entero (vacio si no hay o no se puede leer)."""
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "rb") as fh:
+            data = pickle.load(fh)
+    except Exception as e:
+        print(f"[LOG] Diccionario de pacientes ilegible ({path.name}): {e}. Se crea de nuevo.")
+        return {}
+    if not isinstance(data, dict) or data.get("version") != VERSION:
+        return {}
+    return data["pacientes"]
+
+
+def guardar(path: Path, pacientes: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as fh:
+        pickle.dump({"version": VERSION, "pacientes": pacientes}, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def pacientes(docs_norm: pd.Series, dicc: dict) -> np.ndarray:
+    """Entero por documento normalizado (0 = vacio). Los documentos nuevos se agregan a `dicc`."""
+    codes, uniques = pd.factorize(docs_norm.fillna("").astype(str))
+    ids = np.empty(len(uniques), dtype=np.int64)
+    for i, doc in enumerate(uniques):
+        if not doc:
+            ids[i] = 0
+            continue
+        if doc not in dicc:
+            dicc[doc] = len(dicc) + 1
+        ids[i] = dicc[doc]
+    return ids[codes] if len(uniques) else np.zeros(len(docs_norm), dtype=np.int64)
+
+
+def dias(fechas: pd.Series) -> np.ndarray:
+    """Numero de dia de cada fecha (1 = 1900-01-01); 0 = sin fecha."""
+    dt = pd.to_datetime(fechas, errors="coerce")
+    faltan = dt.isna().to_numpy()
+    n = (dt.to_numpy().astype("datetime64[D]") - _EPOCA).astype(np.int64) + 1
+    n[faltan | (n < 1) | (n >= 1 << BITS_DIA)] = 0
+    return n
+
+
+def paciente_dia(docs_norm: pd.Series, fechas: pd.Series, dicc: dict) -> pd.Series:
+    """Clave int64 (paciente, dia), con el indice de `docs_norm`."""
+    clave = (pacientes(docs_norm, dicc) << BITS_DIA) | dias(fechas)
+    return pd.Series(clave, index=docs_norm.index, dtype="int64")
+
+
+def filas(df: pd.DataFrame, cols) -> np.ndarray:
+    """Clave int64 por fila de `cols`: filas con los mismos valores (NaN incluido), misma clave."""
+    clave = np.zeros(len(df), dtype=np.int64)
+    for c in cols:
+        codes, uniques = pd.factorize(df[c], use_na_sentinel=False)
+        # Se vuelve a densificar en cada columna: la clave nunca pasa de len(df)**2
+        clave, _ = pd.factorize(clave * max(len(uniques), 1) + codes)
+    return clave.astype(np.int64)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Corridas parciales (un dia, una semana clinica, un documento o una muestra) de los scripts 01/02/03.
+
+El filtro se aplica apenas se lee cada fuente, antes de normalizar y asignar, asi que el costo
+es el de la lectura mas el de las filas elegidas. La salida va a un libro aparte en
+excel_generado/parcial/ (o a ninguna parte con --no-write): el maestro, el almacen de huellas,
+los puntos de control y el espejo SQLite no se tocan.
+
+    python scripts/02_mercadeo_pagos.py --doc 1234567890 --no-write
+    python scripts/02_mercadeo_pagos.py --week 2026-02-10 --sample 10%
+"""
+from pathlib import Path
+
+import pandas as pd
+
+from calendario_clinico import semanas_del_mes
+
+
+SCRATCH_DIRNAME = "parcial"
+
+
+def _semana_de(dia: pd.Timestamp):
+    for nombre, (start, end) in semanas_del_mes(dia.year, dia.month).items():
+        if start <= dia.date() <= end:
+            return nombre, pd.Timestamp(start), pd.Timestamp(end)
+    return None
+
+
+class Parcial:
+    """Filtro de una corrida parcial. `mascara` decide que filas de una fuente entran."""
+
+    def __init__(self, dia=None, semana=None, doc=None, muestra=None, escribir=True):
+        self.desde = self.hasta = None
+        self.doc = str(doc).strip() if doc else None
+        self.muestra = muestra
+        self.escribir = escribir
+        partes = []
+        if dia is not None:
+            self.desde = self.hasta = dia
+            partes.append(f"dia_{dia:%Y-%m-%d}")
+        if semana is not None:
+            nombre, self.desde, self.hasta = semana
+            partes.append(f"{nombre.lower()}_{self.desde:%Y-%m}")
+        if self.doc:
+            partes.append(f"doc_{self.doc}")
+        if muestra is not None:
+            partes.append(f"muestra_{muestra:g}")
+        self.etiqueta = "_".join(partes) or "completo"
+
+    def describir(self) -> str:
+        partes = []
+        if self.desde is not None:
+            partes.append(f"fechas {self.desde:%Y-%m-%d} a {self.hasta:%Y-%m-%d}")
+        if self.doc:
+            partes.append(f"documento {self.doc}")
+        if self.muestra is not None:
+            partes.append(f"muestra {self.muestra:g}% de las claves")
+        partes.append("sin escritura" if not self.escribir else f"salida en {SCRATCH_DIRNAME}/")
+        return " | ".join(partes)
+
+    def mascara(self, fechas: pd.Series, claves: pd.Series | None = None) -> pd.Series:
+        """Filas que entran. `fechas` datetime; `claves` documento normalizado (o la clave a muestrear)."""
+        keep = pd.Series(True, index=fechas.index)
+        if self.desde is not None:
+            dias = fechas.dt.normalize()
+            keep &= (dias >= self.desde) & (dias <= self.hasta)
+        if self.doc:
+            keep &= claves.astype(str) == self.doc
+        if self.muestra is not None:
+            # Muestra estable entre corridas y entre fuentes: la misma clave cae siempre del mismo lado
+            h = pd.util.hash_pandas_object(claves.astype(str), index=False).to_numpy()
+            keep &= pd.Series(h % 10000 < self.muestra * 100, index=fechas.index)
+        return keep
+
+    def filtrar(self, df: pd.DataFrame, fechas: pd.Series, claves: pd.Series | None, nombre: str) -> pd.DataFrame:
+        keep = self.mascara(fechas, claves)
+        print(f"[LOG] Parcial {nombre}: {int(keep.sum())} de {len(df)} filas")
+        return df[keep.to_numpy()].reset_index(drop=True)
+
+    def destino(self, output_dir: Path, script: str, base_name: str) -> Path | None:
+        """Libro de trabajo para la salida parcial de `script` (None con --no-write)."""
+        if not self.escribir:
+            return None
+        scratch = output_dir / SCRATCH_DIRNAME
+        scratch.mkdir(parents=True, exist_ok=True)
+        return scratch / f"{script}_{base_name}_{self.etiqueta}.xlsx"
+
+
+def agregar_argumentos(parser, doc: bool = True):
+    grupo = parser.add_argument_group("corrida parcial (no toca el maestro)")
+    grupo.add_argument("--day", metavar="AAAA-MM-DD", help="solo ese dia")
+    grupo.add_argument("--week", metavar="AAAA-MM-DD", help="solo la semana clinica que contiene esa fecha")
+    if doc:
+        grupo.add_argument("--doc", help="solo ese documento (normalizado, p. ej. 1234567890)")
+    grupo.add_argument("--sample", metavar="N%", help="solo una muestra estable de N%% de los documentos/dias")
+    grupo.add_argument("--no-write", action="store_true", help="no escribir nada (solo logs)")
+
+
+def desde_args(parser, args, dia=None, doc=None):
+    """Parcial segun los argumentos (dia/doc: valores por defecto, p. ej. DEBUG_DAY/DEBUG_DOC); None si es corrida normal."""
+    dia = args.day or dia
+    doc = getattr(args, "doc", None) or doc
+    if not (dia or args.week or doc or args.sample or args.no_write):
+        return None
+    if dia and args.week:
+        parser.error("--day y --week no se pueden combinar")
+
+    def _fecha(valor, flag):
+        ts = pd.to_datetime(valor, errors="coerce")
+        if pd.isna(ts):
+            parser.error(f"{flag}: fecha invalida {valor!r} (usar AAAA-MM-DD)")
+        return ts.normalize()
+
+    semana = None
+    if args.week:
+        semana = _semana_de(_fecha(args.week, "--week"))
+        if semana is None:
+            parser.error(f"--week: {args.week} no cae en ninguna semana clinica de su mes")
+
+    muestra = None
+    if args.sample:
+        try:
+            muestra = float(str(args.sample).strip().rstrip("%"))
+        except ValueError:
+            muestra = -1
+        if not 0 < muestra <= 100:
+            parser.error(f"--sample: porcentaje invalido {args.sample!r} (usar p. ej. 10%)")
+
+    parcial = Parcial(
+        dia=_fecha(dia, "--day") if dia else None,
+        semana=semana,
+        doc=doc,
+        muestra=muestra,
+        escribir=not args.no_write,
+    )
+    print(f"[LOG] Corrida parcial: {parcial.describir()}")
+    return parcial
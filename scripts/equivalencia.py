@@ -0,0 +1,590 @@
+# -*- coding: utf-8 -*-
+"""Arnes de equivalencia: ruta de referencia vs rutas rapidas sobre los mismos datos.
+
+Para cada semilla genera entradas (fixtures con casos borde + datos aleatorios), corre la
+referencia y cada variante rapida, compara todas las hojas de salida celda por celda y mide
+la aceleracion. La referencia es el codigo congelado de scripts/referencia.py (normalize_doc,
+loop de asignacion del 02, exclusiones diarias del 03, tal como estaban antes de las rutas
+rapidas) con parseo fila por fila y sin particiones. Cada variante cambia una sola pieza por
+su version actual; "completo" corre el script tal cual. Una variante nueva = una entrada en
+ETAPAS con los atributos del script que cambia (constantes o funciones).
+
+La etapa "02_huellas" corre el 02 con almacen de huellas, cambia la exportacion de pagos (quita
+claves completas y pagos sueltos, agrega pagos) y vuelve a correrlo: el maestro debe quedar igual
+al de una corrida completa en frio (sin .cache) sobre la segunda exportacion.
+
+    python scripts/equivalencia.py --semillas 3 --filas 600
+    python scripts/equivalencia.py --etapas 02 --min-aceleracion 1.0
+    python scripts/equivalencia.py --etapas 02_huellas --semillas 3
+
+Sale con codigo 1 si alguna salida difiere o si una variante queda bajo --min-aceleracion.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+import lectura_excel
+import parseo
+import referencia
+
+
+# Los scripts 01 y 02 traen las semanas de febrero 2026
+MES_PRUEBA = date(2026, 2, 1)
+DIAS_MES = 28
+
+
+# --- Referencia fila por fila para el parseo (reglas congeladas de 02/03 antes del modulo parseo) ---
+
+def _fila_a_fila_monto(ref):
+    def parse(serie: pd.Series):
+        return serie.map(ref).astype("int64"), pd.Series(False, index=serie.index)
+    return parse
+
+
+def _fila_a_fila_codigo(serie: pd.Series):
+    parsed = serie.map(referencia.parse_codigo)
+    out = pd.DataFrame(
+        {"Clase_Doc": parsed.map(lambda t: t[0]), "Consecutivo_Doc": parsed.map(lambda t: t[1])},
+        index=serie.index,
+    )
+    return out, pd.Series(False, index=serie.index)
+
+
+PARSEO_FILA_A_FILA = SimpleNamespace(
+    valor_pagado=referencia.parse_valor_pagado,
+    valor_caja=referencia.parse_valor,
+    codigo_doc=referencia.parse_codigo,
+    valor_pagado_serie=_fila_a_fila_monto(referencia.parse_valor_pagado),
+    valor_caja_serie=_fila_a_fila_monto(referencia.parse_valor),
+    codigo_doc_serie=_fila_a_fila_codigo,
+    reportar_invalidos=lambda *args, **kwargs: 0,
+)
+
+
+# --- Etapas y variantes ---
+# `referencia` y cada variante son atributos a reemplazar en el modulo del script;
+# la clave especial "_env" define variables de entorno durante la corrida.
+
+REFERENCIA_02 = {
+    "parseo": PARSEO_FILA_A_FILA,
+    "normalize_doc": referencia.normalize_doc,
+    "_procesar_particion": referencia.procesar_particion,
+    "PARTITION_MODE": None,
+    "PARTITION_WORKERS": 1,
+}
+REFERENCIA_03 = {
+    "parseo": PARSEO_FILA_A_FILA,
+    "_apply_daily_comparison_exclusions": referencia.apply_daily_comparison_exclusions,
+}
+
+
+def _solo(ref: dict, *rapidos: str) -> dict:
+    """La referencia con `rapidos` en su version actual (el resto queda congelado)."""
+    return {k: v for k, v in ref.items() if k not in rapidos}
+
+
+ETAPAS = {
+    "02": {
+        "script": "02_mercadeo_pagos",
+        "referencia": REFERENCIA_02,
+        "variantes": {
+            "normalize_doc": _solo(REFERENCIA_02, "normalize_doc"),
+            "asignacion": _solo(REFERENCIA_02, "_procesar_particion"),
+            "vectorizado": _solo(REFERENCIA_02, "parseo"),
+            "completo": {},
+            "particion_dia": {"PARTITION_MODE": "dia"},
+            "particion_semana_x3": {"PARTITION_MODE": "semana", "PARTITION_WORKERS": 3},
+            "lector_calamine": {"_env": {lectura_excel.ENGINE_ENV: "calamine"}},
+        },
+    },
+    "03": {
+        "script": "03_facturacion_json",
+        "referencia": REFERENCIA_03,
+        "variantes": {
+            "exclusiones": _solo(REFERENCIA_03, "_apply_daily_comparison_exclusions"),
+            "vectorizado": _solo(REFERENCIA_03, "parseo"),
+            "completo": {},
+        },
+    },
+}
+
+# Corre incremental contra frio (ver verificar_huellas)
+ETAPA_HUELLAS = "02_huellas"
+
+# Comunes a todas las corridas: sin espejo SQLite, almacen de huellas ni puntos de control (siempre corrida completa)
+FIJOS = {
+    "SYNC_SQLITE": False,
+    "USE_FINGERPRINT_STORE": False,
+    "USE_CHECKPOINTS": False,
+    "_env": {lectura_excel.ENGINE_ENV: "openpyxl"},
+}
+
+
+def cargar_script(nombre: str):
+    """Importa un script numerado (p. ej. '02_mercadeo_pagos') como modulo."""
+    return importlib.import_module(nombre)
+
+
+def _rutas(ws: Path) -> dict:
+    return {
+        "BASE_DIR": ws,
+        "OUTPUT_DIR": ws / "excel_generado",
+        "CACHE_DIR": ws / "excel_generado" / ".cache",
+        "CHECKPOINT_DIR": ws / "excel_generado" / ".checkpoints",
+        "JSON_DIR": ws / "export_json" / "facturacion_json",
+    }
+
+
+@contextlib.contextmanager
+def _parches(mod, cambios: dict):
+    env = cambios.get("_env", {})
+    # Solo atributos que el script tiene (las rutas/constantes comunes no aplican a todos)
+    attrs = {k: v for k, v in cambios.items() if k != "_env" and hasattr(mod, k)}
+    prev_attrs = {k: getattr(mod, k) for k in attrs}
+    prev_env = {k: os.environ.get(k) for k in env}
+    prev_argv = sys.argv
+    try:
+        for k, v in attrs.items():
+            setattr(mod, k, v)
+        os.environ.update(env)
+        sys.argv = [mod.__name__]
+        yield
+    finally:
+        sys.argv = prev_argv
+        for k, v in prev_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        for k, v in prev_attrs.items():
+            setattr(mod, k, v)
+
+
+def _ejecutar(mod, ws: Path, cambios: dict, input_dir: Path | None = None) -> tuple[float, str]:
+    todos = dict(FIJOS, **_rutas(ws))
+    todos.update({k: v for k, v in cambios.items() if k != "_env"})
+    todos["_env"] = dict(FIJOS["_env"], **cambios.get("_env", {}))
+    if input_dir is not None:
+        todos["INPUT_DIR"] = input_dir
+    buf = io.StringIO()
+    with _parches(mod, todos), contextlib.redirect_stdout(buf):
+        t0 = time.perf_counter()
+        mod.main()
+        elapsed = time.perf_counter() - t0
+    log = buf.getvalue()
+    errores = [line for line in log.splitlines() if line.startswith("Error:")]
+    if errores:
+        raise RuntimeError(f"{mod.__name__} fallo: {errores[0]}")
+    return elapsed, log
+
+
+# --- Datos de prueba ---
+
+NOMBRES = ["ANA", "LUIS", "MARIA", "JOSE", "CARLOS", "LUZ", "PEDRO", "SOFIA"]
+APELLIDOS = ["GOMEZ", "PEREZ", "RIOS", "DIAZ", "MUÑOZ", "LOPEZ"]
+
+# Casos borde fijos (van en todas las semillas)
+FIXTURE_DOCS = [1030432459, 1030432459.0, "1.030432459E+09", "10304324595", "80774974", " 52.123.456 ", "1,03E+09"]
+FIXTURE_VALORES = [150000, "150.000", "1.250.000,00", 80000.0, "45000.00", "$ 1.500", "abc", None, "", "-20.000", 1500.5]
+FIXTURE_FORMAS = ["Efectivo", "Descontar anticipo", "DESCONTAR ANTICPO", "Tarjeta", None, "Transferencia"]
+FIXTURE_CODIGOS = ["FV-1001", "fv - 0034", "RC-77", "SIN CODIGO", "", None, "NC-5 x"]
+FIXTURE_JSON_VALORES = [310000, "1,250,000.00", "45000", 99999.5, "abc", None]
+
+
+def generar_datos(ws: Path, semilla: int, filas: int):
+    """Entradas de 01/02/03 en `ws`: fixtures primero y luego filas aleatorias de la semilla."""
+    rnd = random.Random(semilla)
+    dir_citas = ws / "excel_dentos" / "01_citas_detallado"
+    dir_pagos = ws / "excel_dentos" / "02_citas_con_pagos"
+    dir_json = ws / "export_json" / "facturacion_json"
+    for d in (dir_citas, dir_pagos, dir_json, ws / "excel_generado"):
+        d.mkdir(parents=True, exist_ok=True)
+
+    pacientes = [(doc, rnd.choice(NOMBRES), None, rnd.choice(APELLIDOS), rnd.choice(APELLIDOS)) for doc in FIXTURE_DOCS]
+    for _ in range(max(1, filas // 3)):
+        d = rnd.randint(1000000000, 1099999999)
+        doc = rnd.choice([d, float(d), f"{d}5", f"{d:.3e}".replace("e+0", "E+"), str(rnd.randint(1000000, 99999999))])
+        pacientes.append((doc, rnd.choice(NOMBRES), rnd.choice(NOMBRES + [None]), rnd.choice(APELLIDOS), rnd.choice(APELLIDOS)))
+
+    citas = []
+    for i in range(filas):
+        p = pacientes[i] if i < len(FIXTURE_DOCS) else rnd.choice(pacientes)
+        dia = MES_PRUEBA + timedelta(days=rnd.randint(0, DIAS_MES - 1))
+        citas.append(
+            {
+                "fecha": pd.Timestamp(dia) + pd.Timedelta(hours=rnd.randint(7, 18)),
+                "documento": p[0],
+                "nombre1": p[1],
+                "nombre2": p[2],
+                "apellido1": p[3],
+                "apellido2": p[4],
+                "Tarifario": rnd.choice(["PARTICULAR", None, "SURA"]),
+                "usuario": rnd.choice(["ag1", "ag2", "ag3"]),
+                "doctor": rnd.choice(["DR A", "DR B"]),
+                "unidad": rnd.choice(["Cirugía oral", "ortodoncia", "general", "Rehabilitación "]),
+                "tipocita": rnd.choice(["Valoracion redes sociales", "Agente ia", "Control"]),
+                "finalidad": rnd.choice(["Valoracion", "Control"]),
+                "asistio": rnd.choice(["SI", "NO", "si asistio", None]),
+            }
+        )
+    pd.DataFrame(citas).to_excel(dir_citas / "citas detallado feb.xlsx", index=False)
+
+    pagos = []
+    for i, c in enumerate(rnd.sample(citas, int(filas * 0.6))):
+        factura = f"FV-{rnd.randint(1, 99999)}"
+        for _ in range(rnd.randint(1, 3)):
+            pagos.append(
+                {
+                    "fecha": c["fecha"],
+                    "documento": c["documento"] if rnd.random() > 0.1 else str(c["documento"]),
+                    "paciente": f"{c['nombre1']} {c['apellido1']}",
+                    "valor_pagado": FIXTURE_VALORES[i % len(FIXTURE_VALORES)] if i < 3 * len(FIXTURE_VALORES)
+                    else rnd.choice(FIXTURE_VALORES),
+                    "factura": rnd.choice([factura, factura, "", None]),
+                    "fac_anulada": rnd.choice(["NO"] * 8 + ["SI", " si "]),
+                    "forma_pago": rnd.choice(FIXTURE_FORMAS),
+                    "facturador": rnd.choice(["F1", "F2", None]),
+                }
+            )
+            if rnd.random() < 0.1:
+                pagos.append(dict(pagos[-1]))
+    # Pagos sin fila en el maestro
+    for _ in range(max(3, filas // 25)):
+        dia = MES_PRUEBA + timedelta(days=rnd.randint(0, DIAS_MES - 1))
+        pagos.append(
+            {
+                "fecha": pd.Timestamp(dia),
+                "documento": rnd.randint(10**9, 2 * 10**9),
+                "paciente": "NUEVO X",
+                "valor_pagado": 50000,
+                "factura": "FV-9",
+                "fac_anulada": "NO",
+                "forma_pago": "Efectivo",
+                "facturador": "F1",
+            }
+        )
+    pd.DataFrame(pagos).to_excel(dir_pagos / "pagos.xlsx", index=False)
+
+    por_dia = {}
+    for p in pagos:
+        por_dia.setdefault(p["fecha"].date(), []).append(p)
+    for i, (dia, ps) in enumerate(sorted(por_dia.items())):
+        listado = []
+        for j, p in enumerate(ps):
+            valor = rnd.randint(1, 40) * 10000
+            item = {
+                "codigo_tipo_doc": FIXTURE_CODIGOS[j] if i == 0 and j < len(FIXTURE_CODIGOS)
+                else f"{rnd.choice(['FV', 'RC', 'NC'])}-{rnd.randint(1, 9999)}",
+                "tipo_doc": "Factura",
+                "fecha": dia.strftime("%d/%m/%Y"),
+                "tercero": p["paciente"],
+                "valor": FIXTURE_JSON_VALORES[j] if i == 1 and j < len(FIXTURE_JSON_VALORES) else valor,
+            }
+            listado.append(item)
+        total = sum(parseo.valor_caja(x["valor"]) for x in listado)
+        extra = parseo.valor_caja(listado[0]["valor"]) if rnd.random() < 0.3 else 0
+        data = {
+            "fecha_consulta": dia.strftime("%d/%m/%Y"),
+            "total_valor": total,
+            "total_documentos": total - extra,
+            "listado_pagos": listado,
+        }
+        with open(dir_json / f"listado_pagos_{dia.isoformat()}.json", "w", encoding="utf-8") as fh:
+            json.dump(data, fh, ensure_ascii=False)
+
+
+def modificar_pagos(path: Path, semilla: int):
+    """Segunda exportacion de pagos: claves que pierden todos sus pagos, pagos sueltos quitados y pagos nuevos."""
+    rnd = random.Random(semilla + 1000)
+    df = pd.read_excel(path, engine="openpyxl")
+    dias = df["fecha"].dt.normalize()
+    # Primer y ultimo dia intactos: el rango de la exportacion (lo que cuenta como quitado) no cambia
+    extremos = (dias == dias.min()) | (dias == dias.max())
+    grupos = [list(g) for g in df[~extremos].groupby(["documento", "fecha"], sort=False).groups.values()]
+    rnd.shuffle(grupos)
+    n = max(2, len(grupos) // 20)
+    quitar = [i for g in grupos[:n] for i in g] + [g[0] for g in grupos[n:2 * n]]
+    nuevos = df.loc[[g[-1] for g in grupos[2 * n:3 * n]]].copy()
+    nuevos["valor_pagado"] = [rnd.randint(1, 40) * 10000 for _ in range(len(nuevos))]
+    nuevos["factura"] = [f"FV-{rnd.randint(100000, 199999)}" for _ in range(len(nuevos))]
+    pd.concat([df.drop(index=quitar), nuevos], ignore_index=True).to_excel(path, index=False)
+
+
+def _valores_aleatorios(rnd: random.Random, n: int) -> pd.Series:
+    """Mezcla de basura aleatoria (cubre reglas) y montos/codigos tipicos que se repiten (como en DentOS)."""
+    vals = list(FIXTURE_VALORES) + list(FIXTURE_CODIGOS) + list(FIXTURE_JSON_VALORES)
+    simbolos = "0123456789.,-$ abcFV"
+    tipicos = [rnd.randint(1, 400) * 5000 for _ in range(300)]
+    for _ in range(n):
+        r = rnd.random()
+        if r < 0.5:
+            v = rnd.choice(tipicos)
+            vals.append(rnd.choice([v, float(v), f"{v:,}".replace(",", "."), f"$ {v:,}".replace(",", ".") + ",00",
+                                    f"FV-{v // 5000}"]))
+        elif r < 0.6:
+            vals.append("".join(rnd.choice(simbolos) for _ in range(rnd.randint(0, 14))))
+        elif r < 0.7:
+            vals.append(rnd.choice([rnd.randint(-10**7, 10**7), rnd.uniform(-1e6, 1e6), float(rnd.randint(0, 10**6)), 2.5, -3.5]))
+        elif r < 0.78:
+            vals.append(rnd.choice([None, np.nan, "", "  ", "nan", "inf", "1e5", np.int64(7), np.float64(8.5), "1_000"]))
+        elif r < 0.88:
+            vals.append(f"{rnd.choice(['FV', 'rc', 'NC'])}{rnd.choice(['-', ' - ', ''])}{rnd.randint(0, 99999)}")
+        else:
+            miles = f"{rnd.randint(0, 10**7):,}".replace(",", rnd.choice([".", ",", ""]))
+            vals.append(miles + rnd.choice(["", ",00", ".0", ".00", ",5"]))
+    return pd.Series(vals, dtype=object)
+
+
+def _docs_aleatorios(rnd: random.Random, n: int) -> pd.Series:
+    """Documentos como llegan de DentOS: int, float, notacion cientifica, 11 digitos, con puntos o espacios."""
+    # Sin basura aleatoria con "e": '1E99999' haria a normalize_doc construir un entero gigante
+    vals = list(FIXTURE_DOCS) + [None, np.nan, "", "  ", "CC 1234567", "12-34", "1e", "1.2.3", "2,5E+3", "x"]
+    for _ in range(n):
+        d = rnd.randint(1000000, 1099999999)
+        vals.append(rnd.choice([
+            d, float(d), np.int64(d), f"{d}", f"{d}{rnd.randint(0, 9)}", f"{d}{rnd.randint(10, 99)}",
+            f"{d:.3e}".replace("e+0", "E+"), f"{d:,}".replace(",", "."), f" {d} ", f"{d}.0", f"{d},5",
+            str(rnd.randint(10**11, 10**13)), "".join(rnd.choice("0123456789., -x") for _ in range(rnd.randint(0, 12))),
+        ]))
+    return pd.Series(vals, dtype=object)
+
+
+# --- Comparacion ---
+
+def _normalizar(v):
+    """Valor comparable entre dtypes: vacios -> None, 150000.0 -> 150000, numpy -> Python."""
+    if v is None or v is pd.NA or v is pd.NaT:
+        return None
+    if isinstance(v, (np.integer, np.floating, np.bool_)):
+        v = v.item()
+    if isinstance(v, float):
+        if math.isnan(v):
+            return None
+        if v.is_integer():
+            return int(v)
+    if isinstance(v, str) and v == "":
+        return None
+    if isinstance(v, pd.Timestamp):
+        return v.to_pydatetime()
+    return v
+
+
+def comparar(ref: dict, rap: dict) -> list[dict]:
+    """Diferencias celda por celda entre dos libros {hoja: DataFrame}, en orden de hoja/columna/fila."""
+    diffs = []
+    for hoja in list(ref) + [h for h in rap if h not in ref]:
+        a, b = ref.get(hoja), rap.get(hoja)
+        if a is None or b is None:
+            diffs.append({"hoja": hoja, "detalle": f"solo en {'rapido' if a is None else 'referencia'}"})
+            continue
+        if list(a.columns) != list(b.columns):
+            diffs.append({"hoja": hoja, "detalle": f"columnas {list(a.columns)} vs {list(b.columns)}"})
+            continue
+        if len(a) != len(b):
+            diffs.append({"hoja": hoja, "detalle": f"{len(a)} filas vs {len(b)}"})
+        n = min(len(a), len(b))
+        for col in a.columns:
+            va = [_normalizar(v) for v in a[col].iloc[:n].tolist()]
+            vb = [_normalizar(v) for v in b[col].iloc[:n].tolist()]
+            for i, (x, y) in enumerate(zip(va, vb)):
+                if x != y:
+                    diffs.append({"hoja": hoja, "fila": i, "col": col, "referencia": x, "rapido": y})
+    return diffs
+
+
+def _formatear(d: dict) -> str:
+    if "detalle" in d:
+        return f"hoja '{d['hoja']}': {d['detalle']}"
+    # fila + 2 = fila en Excel (encabezado en la 1)
+    txt = f"hoja '{d['hoja']}' fila {d['fila'] + 2} col '{d['col']}': referencia={d['referencia']!r} rapido={d['rapido']!r}"
+    if "entrada" in d:
+        txt += f" (entrada={d['entrada']!r})"
+    return txt
+
+
+def _leer_salida(ws: Path) -> dict:
+    """Hojas de todos los maestros generados ({'libro:hoja': DataFrame}); 03 escribe uno por mes."""
+    libros = sorted((ws / "excel_generado").glob("formato_odontologia_*.xlsx"))
+    if not libros:
+        raise FileNotFoundError(f"Sin maestro en {ws / 'excel_generado'}")
+    return {
+        f"{p.stem}:{hoja}": df
+        for p in libros
+        for hoja, df in pd.read_excel(p, sheet_name=None, engine="openpyxl").items()
+    }
+
+
+# --- Corridas ---
+
+def _preparar_base(raiz: Path, semilla: int, filas: int) -> Path:
+    base = raiz / f"base_{semilla}"
+    generar_datos(base, semilla, filas)
+    mod01 = cargar_script("01_mercadeo_citas")
+    _ejecutar(mod01, base, {}, input_dir=base / "excel_dentos" / "01_citas_detallado")
+    return base
+
+
+def _correr_etapa(etapa: str, base: Path, raiz: Path, cambios: dict, repeticiones: int):
+    conf = ETAPAS[etapa]
+    mod = cargar_script(conf["script"])
+    mejor = None
+    for r in range(repeticiones):
+        ws = raiz / f"{etapa}_{r}"
+        shutil.rmtree(ws, ignore_errors=True)
+        shutil.copytree(base, ws)
+        elapsed, _ = _ejecutar(mod, ws, cambios, input_dir=ws / "excel_dentos" / "02_citas_con_pagos")
+        mejor = elapsed if mejor is None else min(mejor, elapsed)
+    return mejor, _leer_salida(ws)
+
+
+def _variantes(etapa: str) -> dict:
+    variantes = dict(ETAPAS[etapa]["variantes"])
+    if "lector_calamine" in variantes and lectura_excel.motor("calamine") != "calamine":
+        variantes.pop("lector_calamine")
+    return variantes
+
+
+def verificar_etapas(etapas, semillas, filas, repeticiones, mostrar):
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix="equivalencia_") as tmp:
+        raiz = Path(tmp)
+        for semilla in semillas:
+            base = _preparar_base(raiz, semilla, filas)
+            for etapa in etapas:
+                if etapa == ETAPA_HUELLAS:
+                    resultados.append(verificar_huellas(base, raiz, semilla, mostrar))
+                    continue
+                t_ref, ref = _correr_etapa(etapa, base, raiz, ETAPAS[etapa]["referencia"], repeticiones)
+                for nombre, cambios in _variantes(etapa).items():
+                    t_var, rap = _correr_etapa(etapa, base, raiz, cambios, repeticiones)
+                    diffs = comparar(ref, rap)
+                    resultados.append((f"{etapa}:{nombre}", semilla, diffs, t_ref, t_var))
+                    _reportar(resultados[-1], mostrar)
+    return resultados
+
+
+def verificar_huellas(base: Path, raiz: Path, semilla: int, mostrar: int):
+    """02 incremental (almacen de huellas, segunda exportacion) vs corrida completa en frio."""
+    mod = cargar_script("02_mercadeo_pagos")
+    con_huellas = {"USE_FINGERPRINT_STORE": True}
+    ws = raiz / ETAPA_HUELLAS
+    shutil.rmtree(ws, ignore_errors=True)
+    shutil.copytree(base, ws)
+    pagos = ws / "excel_dentos" / "02_citas_con_pagos"
+    _ejecutar(mod, ws, con_huellas, input_dir=pagos)
+    modificar_pagos(pagos / "pagos.xlsx", semilla)
+
+    # Mismo maestro y misma exportacion, sin almacen ni diccionario de pacientes
+    frio = raiz / f"{ETAPA_HUELLAS}_frio"
+    shutil.rmtree(frio, ignore_errors=True)
+    shutil.copytree(ws, frio)
+    shutil.rmtree(frio / "excel_generado" / ".cache")
+    t_ref, _ = _ejecutar(mod, frio, {}, input_dir=frio / "excel_dentos" / "02_citas_con_pagos")
+    t_var, log = _ejecutar(mod, ws, con_huellas, input_dir=pagos)
+    if "[LOG] Huellas:" not in log:
+        raise RuntimeError("La segunda corrida no uso el almacen de huellas")
+    resultado = (ETAPA_HUELLAS, semilla, comparar(_leer_salida(frio), _leer_salida(ws)), t_ref, t_var)
+    _reportar(resultado, mostrar)
+    return resultado
+
+
+def _mejor_tiempo(fn, repeticiones: int):
+    mejor, resultado = math.inf, None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = fn()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return resultado, mejor
+
+
+def _por_valor(fn):
+    """Funcion por valor con la firma de las de columna (resultado, invalidos)."""
+    return lambda serie: (serie.map(fn), None)
+
+
+def verificar_funciones(semillas, n, repeticiones, mostrar):
+    mod02 = cargar_script("02_mercadeo_pagos")
+    # (nombre, referencia congelada por valor, ruta actual por columna, datos de prueba)
+    casos = [
+        ("valor_pagado", referencia.parse_valor_pagado, parseo.valor_pagado_serie, _valores_aleatorios),
+        ("valor_caja", referencia.parse_valor, parseo.valor_caja_serie, _valores_aleatorios),
+        ("codigo_doc", referencia.parse_codigo, parseo.codigo_doc_serie, _valores_aleatorios),
+        ("normalize_doc", referencia.normalize_doc, _por_valor(mod02.normalize_doc), _docs_aleatorios),
+    ]
+    resultados = []
+    for semilla in semillas:
+        for nombre, ref, rapido, datos in casos:
+            serie = datos(random.Random(semilla), n)
+            esperado, t_ref = _mejor_tiempo(lambda: serie.map(ref), repeticiones)
+            (obtenido, _), t_var = _mejor_tiempo(lambda: rapido(serie), repeticiones)
+            if isinstance(obtenido, pd.DataFrame):
+                esperado = pd.DataFrame(esperado.tolist(), columns=obtenido.columns, index=serie.index)
+            else:
+                esperado, obtenido = esperado.to_frame("valor"), obtenido.to_frame("valor")
+            diffs = comparar({nombre: esperado}, {nombre: obtenido})
+            for d in diffs:
+                if "fila" in d:
+                    d["entrada"] = serie.iloc[d["fila"]]
+            resultados.append((f"funcion:{nombre}", semilla, diffs, t_ref, t_var))
+            _reportar(resultados[-1], mostrar)
+    return resultados
+
+
+def _reportar(resultado, mostrar: int):
+    caso, semilla, diffs, t_ref, t_var = resultado
+    acel = t_ref / t_var if t_var else float("inf")
+    estado = "OK" if not diffs else f"DIFIERE ({len(diffs)} celdas)"
+    print(f"[LOG] {caso:<32} semilla {semilla}: {estado} | referencia {t_ref:.3f}s | rapido {t_var:.3f}s | x{acel:.2f}")
+    for d in diffs[:mostrar]:
+        print(f"    {_formatear(d)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara rutas de referencia y rapidas (salidas y tiempos).")
+    todas = ["funciones", *ETAPAS, ETAPA_HUELLAS]
+    parser.add_argument("--etapas", nargs="+", default=todas, choices=todas)
+    parser.add_argument("--semillas", type=int, default=2, help="cantidad de semillas aleatorias (0, 1, ...)")
+    parser.add_argument("--filas", type=int, default=400, help="citas generadas por semilla")
+    parser.add_argument("--valores", type=int, default=20000, help="valores por semilla en las pruebas de funciones")
+    parser.add_argument("--repeticiones", type=int, default=1, help="corridas por variante (se toma el mejor tiempo)")
+    parser.add_argument("--mostrar", type=int, default=10, help="primeras diferencias a mostrar por caso")
+    parser.add_argument("--min-aceleracion", type=float, help="falla si alguna variante es mas lenta que esto (x)")
+    args = parser.parse_args()
+
+    semillas = list(range(max(1, args.semillas)))
+    resultados = []
+    if "funciones" in args.etapas:
+        resultados += verificar_funciones(semillas, args.valores, max(1, args.repeticiones), args.mostrar)
+    etapas = [e for e in args.etapas if e != "funciones"]
+    if etapas:
+        resultados += verificar_etapas(etapas, semillas, args.filas, max(1, args.repeticiones), args.mostrar)
+
+    con_diffs = [r for r in resultados if r[2]]
+    lentos = []
+    if args.min_aceleracion is not None:
+        lentos = [r for r in resultados if r[4] and r[3] / r[4] < args.min_aceleracion]
+    for caso, semilla, _, t_ref, t_var in lentos:
+        print(f"[LOG] {caso} semilla {semilla}: x{t_ref / t_var:.2f} < minimo x{args.min_aceleracion}")
+    if con_diffs or lentos:
+        print(f"[LOG] Equivalencia FALLIDA: {len(con_diffs)} casos con diferencias, {len(lentos)} bajo el minimo.")
+        sys.exit(1)
+    print(f"[OK] {len(resultados)} casos equivalentes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Esquema de columnas por etapa y chequeo previo de encabezados (sin cargar el libro).
+
+Cada entrada lee solo la fila de encabezado, la valida contra su esquema y devuelve la
+proyeccion que usa la carga real (`lectura_excel.leer(..., columnas=proyeccion)`):
+{columna_en_archivo: nombre_en_el_script}. Las requeridas se renombran a su nombre
+canonico; las opcionales se leen con el nombre que traen. Chequear un archivo a mano:
+
+    python scripts/esquemas.py "excel_dentos/02_citas_con_pagos/pagos.xlsx" --esquema pagos
+"""
+import argparse
+import difflib
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+import lectura_excel
+
+
+# Alias aceptados por columna (se comparan sin tildes, mayusculas ni separadores)
+ALIAS = {
+    "fecha": ["fecha", "fecha_cita", "fecha_pago"],
+    "documento": ["documento", "numero_documento", "n_documento", "identificacion"],
+    "paciente": ["paciente", "nombre_paciente"],
+    "valor_pagado": ["valor_pagado", "valor_pago", "monto_pagado"],
+    "asistio": ["asistio", "asistencia"],
+    "factura": ["factura", "n_factura", "numero_factura"],
+    "fac_anul": ["fac_anul", "fac_anulada", "factura_anulada", "factura anulada"],
+    "forma": [
+        "forma_pago", "forma de pago", "medio_pago", "medio de pago", "metodo_pago", "metodo de pago", "tipo_pago",
+    ],
+    "facturador": ["facturador", "asesor_comercial", "asesor comercial"],
+    "municipio": ["municipio"],
+}
+
+_CITAS_EXACTAS = [
+    "nombre1", "nombre2", "apellido1", "apellido2", "Tarifario",
+    "usuario", "doctor", "unidad", "tipocita", "finalidad",
+]
+
+# requeridas: {canonico: alias}; opcionales: {clave: alias}; todas=True: se leen todas las columnas;
+# canonizar_opcionales=True: las opcionales se renombran a su clave (si no, quedan con el nombre del archivo)
+ESQUEMAS = {
+    "citas": {
+        "descripcion": "citas detallado (script 01)",
+        "requeridas": {
+            "fecha": ALIAS["fecha"],
+            "documento": ALIAS["documento"],
+            "asistio": ALIAS["asistio"],
+            **{c: [c] for c in _CITAS_EXACTAS},
+        },
+        # Columnas de DEST_COLS que el 01 copia tal cual del origen (no se derivan de otra)
+        "opcionales": {"Municipio": ALIAS["municipio"]},
+        "canonizar_opcionales": True,
+    },
+    "pagos": {
+        "descripcion": "citas con pagos (script 02)",
+        "requeridas": {c: ALIAS[c] for c in ("fecha", "documento", "paciente", "valor_pagado")},
+        "opcionales": {c: ALIAS[c] for c in ("factura", "fac_anul", "forma", "facturador")},
+    },
+    "maestro": {
+        "descripcion": "maestro formato_odontologia (script 02)",
+        "requeridas": {c: [c] for c in ("id_registro", "Numero_Documento", "Fecha", "Paciente")},
+        "todas": True,
+    },
+}
+
+
+def norm_col(name) -> str:
+    if name is None:
+        return ""
+    s = str(name).strip().lower()
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(c for c in s if unicodedata.category(c) != "Mn")
+    s = re.sub(r"[^a-z0-9]", "", s)
+    return s
+
+
+def buscar_columna(columnas, alias):
+    """Primera columna de `columnas` que coincide con algun alias (en orden de alias); None si no hay."""
+    norm_map = {norm_col(c): c for c in columnas if c is not None}
+    for cand in alias:
+        key = norm_col(cand)
+        if key in norm_map:
+            return norm_map[key]
+    return None
+
+
+def _parecida(encabezado, alias):
+    norm_map = {norm_col(c): c for c in encabezado if c is not None}
+    for cand in alias:
+        match = difflib.get_close_matches(norm_col(cand), list(norm_map), n=1, cutoff=0.75)
+        if match:
+            return norm_map[match[0]]
+    return None
+
+
+def _reporte(nombre: str, esquema: str, encabezado, faltan) -> str:
+    lineas = [f"{nombre}: faltan columnas requeridas para {ESQUEMAS[esquema]['descripcion']}:"]
+    for canon, alias in faltan:
+        linea = f"  - {canon} (acepta: {', '.join(alias)})"
+        parecida = _parecida(encabezado, alias)
+        if parecida is not None:
+            linea += f" -> ¿renombrada? en el archivo hay '{parecida}'"
+        lineas.append(linea)
+    lineas.append(f"  Encabezado leido: {[c for c in encabezado if c is not None]}")
+    return "\n".join(lineas)
+
+
+def verificar(path: Path, esquema: str, sheet_name=0, log: bool = True):
+    """Valida el encabezado de `path` contra `esquema` y devuelve la proyeccion de la carga real.
+
+    Lanza ValueError con el detalle de lo que falta. Devuelve {columna_en_archivo: nombre_final}
+    en el orden del archivo, o None si el esquema lee todas las columnas (`todas`).
+    """
+    t0 = time.perf_counter()
+    spec = ESQUEMAS[esquema]
+    nombre = Path(path).name
+    encabezado = lectura_excel.encabezado(path, sheet_name)
+
+    renombrar, faltan = {}, []
+    for canon, alias in spec["requeridas"].items():
+        real = buscar_columna(encabezado, alias)
+        if real is None:
+            faltan.append((canon, alias))
+        else:
+            renombrar[real] = canon
+    if faltan:
+        raise ValueError(_reporte(nombre, esquema, encabezado, faltan))
+
+    opcionales = []
+    for clave, alias in spec.get("opcionales", {}).items():
+        real = buscar_columna(encabezado, alias)
+        if real is not None and real not in renombrar:
+            renombrar[real] = clave if spec.get("canonizar_opcionales") else real
+            opcionales.append(clave)
+
+    ms = (time.perf_counter() - t0) * 1000
+    if spec.get("todas"):
+        proyeccion = None
+        leidas = f"todas ({len(encabezado)})"
+    else:
+        proyeccion = {c: renombrar[c] for c in encabezado if c in renombrar}
+        leidas = f"{len(proyeccion)} de {len(encabezado)}"
+    if log:
+        print(
+            f"[LOG] Esquema {nombre} ({esquema}): {len(spec['requeridas'])} requeridas OK"
+            f" | opcionales: {', '.join(opcionales) or '-'} | columnas a leer: {leidas} ({ms:.0f} ms)"
+        )
+        if proyeccion is not None:
+            print(f"[LOG] Proyeccion {nombre}: {list(proyeccion)}")
+    return proyeccion
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida el encabezado de un Excel contra el esquema de una etapa.")
+    parser.add_argument("archivo", type=Path)
+    parser.add_argument("--esquema", required=True, choices=sorted(ESQUEMAS))
+    parser.add_argument("--hoja", default=0, help="nombre o posicion de la hoja (por defecto la primera)")
+    args = parser.parse_args()
+    hoja = int(args.hoja) if str(args.hoja).isdigit() else args.hoja
+    try:
+        verificar(args.archivo, args.esquema, hoja)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"[OK] {args.archivo.name} cumple el esquema '{args.esquema}'.")
+
+
+if __name__ == "__main__":
+    main()
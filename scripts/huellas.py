@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Huellas (hash de 64 bits) de filas normalizadas y su almacen entre corridas."""
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+import pandas as pd
+
+
+STORE_VERSION = 1
+
+# Textos que pd.read_excel convierte en vacio por defecto (na_values)
+_TEXTOS_VACIOS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+
+def hash_filas(df: pd.DataFrame, cols) -> pd.Series:
+    """Hash uint64 por fila de las columnas dadas (estable entre procesos y corridas)."""
+    return pd.util.hash_pandas_object(df[list(cols)], index=False)
+
+
+def _valor_firma(v) -> str:
+    # Excel devuelve 150000.0 donde se escribio 150000 y vacio donde se escribio '' o 'nan'
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    if isinstance(v, str) and v in _TEXTOS_VACIOS:
+        return ""
+    return str(v).strip()
+
+
+def firma_frame(df: pd.DataFrame, cols) -> str:
+    """Firma del contenido de un DataFrame, estable tras escribir y releer el Excel."""
+    data = df.reindex(columns=list(cols))
+    norm = pd.DataFrame(
+        {c: data[c].astype(object).where(data[c].notna(), "").map(_valor_firma) for c in data.columns}
+    )
+    digest = hashlib.sha1(hash_filas(norm, norm.columns).to_numpy().tobytes())
+    digest.update(str(len(norm)).encode())
+    return digest.hexdigest()
+
+
+def store_path(cache_dir: Path, master_path: Path) -> Path:
+    return cache_dir / f"huellas_{master_path.stem}.pkl"
+
+
+def cargar(path: Path):
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as fh:
+            data = pickle.load(fh)
+    except Exception as e:
+        print(f"[LOG] Almacen de huellas ilegible ({path.name}): {e}. Se hara corrida completa.")
+        return None
+    if not isinstance(data, dict) or data.get("version") != STORE_VERSION:
+        return None
+    return data
+
+
+def guardar(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = dict(data, version=STORE_VERSION)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as fh:
+        pickle.dump(data, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Lectura de Excel con motor intercambiable (calamine si esta instalado, si no openpyxl).
+
+El motor se elige por corrida con la variable de entorno EXCEL_ENGINE
+(`auto` | `calamine` | `openpyxl`). Comparar motores sobre un archivo:
+
+    python scripts/lectura_excel.py "excel_dentos/02_citas_con_pagos/pagos.xlsx" --repeticiones 3
+"""
+import argparse
+import importlib.util
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+
+
+ENGINE_ENV = "EXCEL_ENGINE"
+MOTORES = ("calamine", "openpyxl")
+_MODULO_MOTOR = {"calamine": "python_calamine", "openpyxl": "openpyxl"}
+
+
+def _instalado(nombre: str) -> bool:
+    return importlib.util.find_spec(_MODULO_MOTOR[nombre]) is not None
+
+
+def motor(pedido: str | None = None) -> str:
+    """Motor a usar: el pedido (o EXCEL_ENGINE) si esta instalado; si no, el primero disponible."""
+    pedido = (pedido or os.environ.get(ENGINE_ENV) or "auto").strip().lower()
+    if pedido != "auto" and pedido not in MOTORES:
+        raise ValueError(f"{ENGINE_ENV}={pedido!r} no es valido. Opciones: auto, {', '.join(MOTORES)}")
+    if pedido in MOTORES:
+        if _instalado(pedido):
+            return pedido
+        print(f"[LOG] Motor Excel '{pedido}' no instalado; se usa openpyxl.")
+        return "openpyxl"
+    for nombre in MOTORES:
+        if _instalado(nombre):
+            return nombre
+    return "openpyxl"
+
+
+def _canonizar_documento(serie: pd.Series) -> pd.Series:
+    # Igual que la inferencia de openpyxl: columna solo numerica -> dtype numerico
+    if serie.dtype != object:
+        return serie
+    vals = serie.dropna()
+    if vals.empty or not vals.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).all():
+        return serie
+    return pd.to_numeric(serie)
+
+
+def _canonizar_fechas(serie: pd.Series) -> pd.Series:
+    # Versiones de pandas con calamine devuelven date donde openpyxl devuelve datetime
+    es_fecha = serie.map(lambda v: isinstance(v, date) and not isinstance(v, datetime))
+    if not es_fecha.any():
+        return serie
+    out = serie.copy()
+    out[es_fecha] = out[es_fecha].map(lambda d: datetime(d.year, d.month, d.day))
+    return out.infer_objects()
+
+
+def _canonizar(df: pd.DataFrame, motor_usado: str, doc_cols) -> pd.DataFrame:
+    if motor_usado == "calamine":
+        for col in df.columns[df.dtypes == object]:
+            df[col] = _canonizar_fechas(df[col])
+    for col in doc_cols:
+        if col in df.columns:
+            df[col] = _canonizar_documento(df[col])
+    return df
+
+
+def abrir(path: Path, motor_excel: str | None = None) -> pd.ExcelFile:
+    """ExcelFile con el motor elegido (para leer varias hojas abriendo el archivo una vez)."""
+    book = pd.ExcelFile(path, engine=motor(motor_excel))
+    book.ruta = Path(path)
+    return book
+
+
+def encabezado(path: Path, sheet_name=0) -> list:
+    """Fila de encabezado (primera fila no vacia, como pd.read_excel) sin cargar el resto del libro."""
+    book = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = book.worksheets[sheet_name] if isinstance(sheet_name, int) else book[sheet_name]
+        for fila in ws.iter_rows(values_only=True):
+            if any(v is not None for v in fila):
+                # pandas descarta las celdas vacias al final del encabezado
+                while fila and fila[-1] is None:
+                    fila = fila[:-1]
+                return list(fila)
+        return []
+    finally:
+        book.close()
+
+
+def leer(fuente, sheet_name=0, doc_cols=(), motor_excel: str | None = None, log: bool = True,
+         columnas: dict | None = None, **kwargs):
+    """pd.read_excel con el motor elegido y tipos iguales entre motores.
+
+    `fuente` puede ser una ruta o un ExcelFile de `abrir`. `doc_cols` son columnas de documento
+    (llegan como numero, texto o notacion cientifica) que deben quedar con el mismo dtype
+    sin importar el motor. `columnas` es la proyeccion de `esquemas.verificar`: solo se leen
+    esas columnas y se renombran ({en_archivo: final}); `doc_cols` usa los nombres finales.
+    Con `sheet_name` lista/None devuelve dict como pd.read_excel.
+    """
+    if isinstance(fuente, pd.ExcelFile):
+        motor_usado, nombre = fuente.engine, getattr(fuente, "ruta", Path("libro")).name
+    else:
+        motor_usado, nombre = motor(motor_excel), Path(fuente).name
+    if columnas is not None:
+        kwargs["usecols"] = lambda c: c in columnas
+    t0 = time.perf_counter()
+    data = pd.read_excel(fuente, sheet_name=sheet_name, engine=motor_usado, **kwargs)
+    if columnas is not None:
+        if isinstance(data, dict):
+            data = {k: v.rename(columns=columnas) for k, v in data.items()}
+        else:
+            data = data.rename(columns=columnas)
+    if isinstance(data, dict):
+        data = {k: _canonizar(v, motor_usado, doc_cols) for k, v in data.items()}
+        filas = sum(len(v) for v in data.values())
+    else:
+        data = _canonizar(data, motor_usado, doc_cols)
+        filas = len(data)
+    if log:
+        print(f"[LOG] Lectura {nombre} [{sheet_name}] con {motor_usado}: {filas} filas en {time.perf_counter() - t0:.2f}s")
+    return data
+
+
+def _bench(path: Path, sheet_name, repeticiones: int):
+    frames = {}
+    for nombre in MOTORES:
+        if not _instalado(nombre):
+            print(f"[LOG] {nombre}: no instalado")
+            continue
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            frames[nombre] = leer(path, sheet_name=sheet_name, motor_excel=nombre, log=False)
+            tiempos.append(time.perf_counter() - t0)
+        print(f"[LOG] {nombre}: mejor {min(tiempos):.3f}s | promedio {sum(tiempos) / len(tiempos):.3f}s")
+    if len(frames) == 2:
+        a, b = frames.values()
+        try:
+            pd.testing.assert_frame_equal(a, b)
+            print("[OK] Mismo contenido y dtypes en ambos motores.")
+        except AssertionError as e:
+            print(f"[LOG] Diferencias entre motores: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara motores de lectura Excel sobre un archivo.")
+    parser.add_argument("archivo", type=Path)
+    parser.add_argument("--hoja", default=0, help="nombre o posicion de la hoja (por defecto la primera)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    hoja = int(args.hoja) if str(args.hoja).isdigit() else args.hoja
+    _bench(args.archivo, hoja, max(1, args.repeticiones))
+
+
+if __name__ == "__main__":
+    main()
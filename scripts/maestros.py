@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Que maestro formato_odontologia_*.xlsx usa cada script.
+
+El 01 registra el maestro que acaba de generar como vigente (excel_generado/.cache/
+maestro_vigente.json). El 02, 04 y 05 trabajan sobre ese, salvo que se pida otro con
+--maestro (archivo) o --mes (AAAA-MM). El 03 reparte por mes con `del_mes`. La fecha de
+modificacion de los archivos no decide nada: el 03 escribe en los maestros de varios meses y
+el 02/04 reescriben el suyo.
+
+    python scripts/02_mercadeo_pagos.py --mes 2026-03
+    python scripts/05_resumen_kpi.py --maestro formato_odontologia_MARZO_2026.xlsx
+"""
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+import lectura_excel
+
+
+PREFIJO = "formato_odontologia"
+FACTURACION = f"{PREFIJO}_FACTURACION"  # filas del 03 sin maestro del mes; no es un maestro de mercadeo
+VIGENTE = "maestro_vigente.json"
+
+MESES = {
+    1: "ENERO", 2: "FEBRERO", 3: "MARZO", 4: "ABRIL", 5: "MAYO", 6: "JUNIO",
+    7: "JULIO", 8: "AGOSTO", 9: "SEPTIEMBRE", 10: "OCTUBRE", 11: "NOVIEMBRE", 12: "DICIEMBRE",
+}
+
+
+def _version(path: Path, base: str) -> int:
+    # base.xlsx = 0, base.N.xlsx = N (versionado del 01); -1 = otro archivo (p. ej. base_2025.xlsx)
+    if path.stem == base:
+        return 0
+    resto = path.stem[len(base):]
+    return int(resto[1:]) if resto.startswith(".") and resto[1:].isdigit() else -1
+
+
+def ultima_version(output_dir: Path, base: str) -> Path | None:
+    """`base.xlsx` o su version `base.N.xlsx` mas alta (no toma MARZO_2025 al buscar MARZO)."""
+    candidates = [f for f in output_dir.glob(f"{base}*.xlsx") if _version(f, base) >= 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda p: _version(p, base))
+
+
+def _es_del_anio(path: Path, year: int) -> bool:
+    # Todas las Fecha del maestro son de `year` (un maestro vacio no dice de que año es)
+    fechas = lectura_excel.leer(path, sheet_name=0, usecols=["Fecha"], log=False)["Fecha"]
+    years = pd.to_datetime(fechas, format="%d/%m/%Y", errors="coerce").dt.year.dropna()
+    return bool(len(years)) and bool((years == year).all())
+
+
+def del_mes(output_dir: Path, year: int, month: int) -> Path | None:
+    """Maestro del mes: formato_odontologia_{MES}_{AÑO} (modo lote de 01) o formato_odontologia_{MES}.
+
+    El de nombre sin año (modo mes de 01) solo sirve si todas sus fechas son de `year`:
+    febrero 2025 y febrero 2026 no se mezclan en el mismo maestro.
+    """
+    mes = MESES[month]
+    path = ultima_version(output_dir, f"{PREFIJO}_{mes}_{year}")
+    if path is not None:
+        return path
+    path = ultima_version(output_dir, f"{PREFIJO}_{mes}")
+    if path is not None and _es_del_anio(path, year):
+        return path
+    return None
+
+
+def registrar_vigente(output_dir: Path, path: Path):
+    """Deja `path` como maestro por defecto de 02/04/05 (lo llama el 01 al generarlo)."""
+    ruta = output_dir / ".cache" / VIGENTE
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"maestro": path.name}, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, ruta)
+
+
+def vigente(output_dir: Path) -> Path | None:
+    """Maestro registrado por el 01 (None si no hay registro o el archivo ya no existe)."""
+    ruta = output_dir / ".cache" / VIGENTE
+    if not ruta.exists():
+        return None
+    try:
+        nombre = json.loads(ruta.read_text(encoding="utf-8"))["maestro"]
+    except Exception as e:
+        print(f"[LOG] Registro de maestro vigente ilegible ({ruta.name}): {e}")
+        return None
+    path = output_dir / nombre
+    return path if path.exists() else None
+
+
+def agregar_argumentos(parser):
+    grupo = parser.add_argument_group("maestro (por defecto: el que genero el 01)")
+    grupo.add_argument("--maestro", metavar="ARCHIVO", help="maestro a usar (ruta o nombre dentro de excel_generado/)")
+    grupo.add_argument("--mes", metavar="AAAA-MM", help="maestro de ese mes (formato_odontologia_MES_AÑO o _MES)")
+
+
+def resolver(parser, args, output_dir: Path) -> Path:
+    """Maestro segun --maestro / --mes o, sin argumentos, el vigente registrado por el 01."""
+    if args.maestro and args.mes:
+        parser.error("--maestro y --mes no se pueden combinar")
+    if args.maestro:
+        path = Path(args.maestro)
+        if not path.is_absolute() and not path.exists():
+            path = output_dir / path
+        if not path.exists():
+            raise FileNotFoundError(f"No existe el maestro {args.maestro}")
+        return path
+    if args.mes:
+        ts = pd.to_datetime(args.mes, format="%Y-%m", errors="coerce")
+        if pd.isna(ts):
+            parser.error(f"--mes: mes invalido {args.mes!r} (usar AAAA-MM)")
+        path = del_mes(output_dir, ts.year, ts.month)
+        if path is None:
+            raise FileNotFoundError(f"No hay maestro de {MESES[ts.month]} {ts.year} en {output_dir}")
+        return path
+
+    path = vigente(output_dir)
+    if path is not None:
+        return path
+    # Sin registro (excel_generado/ de antes del registro): si hay uno solo no hay duda
+    candidates = sorted(p for p in output_dir.glob(f"{PREFIJO}_*.xlsx") if p.stem != FACTURACION)
+    if len(candidates) == 1:
+        return candidates[0]
+    if not candidates:
+        raise FileNotFoundError(f"No se encontro el maestro {PREFIJO}_*.xlsx en {output_dir}. Ejecuta el script 01 primero.")
+    nombres = ", ".join(p.name for p in candidates)
+    raise FileNotFoundError(
+        f"Hay varios maestros y ninguno registrado como vigente ({nombres}). "
+        "Elegir uno con --maestro o --mes, o volver a ejecutar el script 01."
+    )
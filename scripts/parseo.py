@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Parseo de montos COP y codigos de documento, por valor y por columna completa.
+
+Las funciones por valor son la definicion de cada regla; las de columna (`*_serie`) toman
+en bloque los numeros que ya vienen como tales y aplican la regla una sola vez por valor
+distinto (las exportaciones repiten mucho los montos y codigos). Devuelven ademas la
+mascara de valores que no se pudieron interpretar (quedan en 0 / vacio).
+
+Sin pyarrow, cada metodo `.str` de pandas recorre la columna en Python: encadenar varios
+(quitar simbolos, comas, puntos...) resulto mas lento que una pasada de la regla por valor.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+CODIGO_DOC_RE = r"([A-Za-z]+)\s*-\s*(\d+)"
+_CODIGO_DOC = re.compile(CODIGO_DOC_RE)
+_NO_MONTO = re.compile(r'[^0-9\.,\-]')
+_DECIMAL_CERO = re.compile(r'^\d+\.0+$')
+
+# float -> str deja de ser entero exacto a partir de 1e16 (notacion cientifica)
+_MAX_ENTERO_EXACTO = 1e16
+
+
+def _valor_pagado(val):
+    """(monto, invalido) de un valor no nulo de la exportacion de pagos (script 02)."""
+    s = str(val).strip()
+    if not s:
+        return 0, False
+    # Quitar símbolos y espacios
+    s = _NO_MONTO.sub('', s)
+    if not s:
+        return 0, True
+    # Si tiene coma, asumir coma decimal y punto miles
+    if ',' in s:
+        s = s.replace('.', '').replace(',', '.')
+    else:
+        # Sin coma: si termina en .0/.00 lo tratamos como decimal y quitamos solo la parte decimal
+        if _DECIMAL_CERO.match(s):
+            s = s.split('.')[0]
+        else:
+            # Sin coma: asumir puntos como miles
+            s = s.replace('.', '')
+    try:
+        return int(float(s)), False
+    except Exception:
+        return 0, True
+
+
+def valor_pagado(val):
+    """Monto de la exportacion de pagos (script 02): coma decimal y punto de miles."""
+    if pd.isna(val):
+        return 0
+    return _valor_pagado(val)[0]
+
+
+def _valor_caja(v):
+    """(monto, invalido) de un valor no nulo del JSON de caja (script 03)."""
+    try:
+        if isinstance(v, (int, float)):
+            return int(round(v)), False
+        return int(round(float(str(v).strip().replace(",", "")))), False
+    except Exception:
+        return 0, True
+
+
+def valor_caja(v):
+    """Monto del JSON de caja (script 03): coma de miles y punto decimal, redondeado."""
+    if pd.isna(v):
+        return 0
+    return _valor_caja(v)[0]
+
+
+def _codigo_doc(codigo):
+    """(('FV', '12345'), invalido) de un valor no nulo."""
+    txt = str(codigo).strip()
+    m = _CODIGO_DOC.search(txt)
+    if not m:
+        return ("", ""), bool(txt)
+    return (m.group(1).upper(), m.group(2)), False
+
+
+def codigo_doc(codigo):
+    """'FV-12345' -> ('FV', '12345'); ('', '') si no tiene el formato."""
+    if pd.isna(codigo):
+        return "", ""
+    return _codigo_doc(codigo)[0]
+
+
+def _por_unicos(serie: pd.Series, regla, vacio):
+    """Aplica `regla` (valor no nulo -> (resultado, invalido)) una vez por valor distinto y lo expande.
+
+    Los nulos quedan con codigo -1: se agrega `vacio` al final de los resultados para que
+    apunten ahi (tambien cuando toda la columna es nula y no hay valores distintos).
+    Devuelve (resultados por fila, mascara de invalidos por fila) como arrays.
+    """
+    codes, uniques = pd.factorize(serie, use_na_sentinel=True)
+    pares = [regla(u) for u in uniques]
+    vals = [p[0] for p in pares] + [vacio]
+    bad = np.array([p[1] for p in pares] + [False], dtype=bool)
+    return vals, codes, bad[codes]
+
+
+def _montos(vals):
+    try:
+        return np.array(vals, dtype="int64")
+    except OverflowError:
+        # Texto con mas digitos de los que caben en int64: se conserva el entero de Python
+        return np.array(vals, dtype=object)
+
+
+def valor_pagado_serie(serie: pd.Series):
+    """Version por columna de `valor_pagado`. Devuelve (int64, mascara_invalidos)."""
+    if not pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+        # Texto/mixto: los nulos ya caen en el codigo -1 de factorize
+        vals, codes, bad = _por_unicos(serie, _valor_pagado, 0)
+        return pd.Series(_montos(vals)[codes], index=serie.index), pd.Series(bad, index=serie.index)
+
+    out = np.zeros(len(serie), dtype="int64")
+    invalid = np.zeros(len(serie), dtype=bool)
+    pending = serie.notna().to_numpy().copy()
+
+    # Enteros (o x.0) se toman tal cual; el resto sigue la regla de texto como antes
+    num = serie.to_numpy(dtype="float64", na_value=np.nan)
+    exact = pending & (num == np.trunc(num)) & (np.abs(num) < _MAX_ENTERO_EXACTO)
+    out[exact] = num[exact].astype("int64")
+    pending &= ~exact
+
+    if pending.any():
+        vals, codes, bad = _por_unicos(serie[pending], _valor_pagado, 0)
+        vals = _montos(vals)
+        if vals.dtype == object:
+            out = out.astype(object)
+        out[pending] = vals[codes]
+        invalid[pending] = bad
+
+    return pd.Series(out, index=serie.index), pd.Series(invalid, index=serie.index)
+
+
+def valor_caja_serie(serie: pd.Series):
+    """Version por columna de `valor_caja`. Devuelve (int64, mascara_invalidos)."""
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        num = serie.to_numpy(dtype="float64", na_value=np.nan)
+        present = ~np.isnan(num)
+        ok = present & np.isfinite(num)
+        out = np.round(np.where(ok, num, 0)).astype("int64")
+        return pd.Series(out, index=serie.index), pd.Series(present & ~ok, index=serie.index)
+
+    vals, codes, bad = _por_unicos(serie, _valor_caja, 0)
+    return pd.Series(_montos(vals)[codes], index=serie.index), pd.Series(bad, index=serie.index)
+
+
+def codigo_doc_serie(serie: pd.Series):
+    """Version por columna de `codigo_doc`. Devuelve (DataFrame Clase_Doc/Consecutivo_Doc, mascara)."""
+    vals, codes, bad = _por_unicos(serie, _codigo_doc, ("", ""))
+    out = pd.DataFrame(
+        {
+            "Clase_Doc": np.array([v[0] for v in vals], dtype=object)[codes],
+            "Consecutivo_Doc": np.array([v[1] for v in vals], dtype=object)[codes],
+        },
+        index=serie.index,
+    )
+    return out, pd.Series(bad, index=serie.index)
+
+
+def reportar_invalidos(etiqueta: str, serie: pd.Series, invalid: pd.Series, max_ejemplos: int = 5):
+    n = int(invalid.sum())
+    if not n:
+        return 0
+    ejemplos = pd.unique(serie[invalid].astype(str))[:max_ejemplos]
+    print(f"[LOG] {etiqueta}: {n} valores no interpretables (quedan en 0/vacio). Ejemplos: {list(ejemplos)}")
+    return n
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Puntos de control entre fases de un script largo, para retomar tras un fallo (`--resume`).
+
+Cada fase guarda su estado (DataFrames y valores sueltos) en un archivo por fase. La clave
+combina el contenido de las entradas y la configuracion que cambia el resultado: si cambia
+un archivo o una constante, los puntos anteriores dejan de coincidir y no se usan.
+
+Formato pickle y no parquet/feather: no requiere pyarrow y el maestro lleva columnas object
+con texto, numeros y fechas mezclados que deben volver identicas para escribir el mismo Excel.
+"""
+import hashlib
+import os
+import pickle
+import time
+from pathlib import Path
+
+
+VERSION = 1
+
+
+def clave(entradas, config: dict) -> str:
+    """Hash del contenido de `entradas` (rutas; las que no existen cuentan como ausentes) y de `config`."""
+    h = hashlib.sha1(f"v{VERSION}".encode())
+    for path in entradas:
+        path = Path(path)
+        h.update(path.name.encode())
+        if not path.exists():
+            h.update(b"<ausente>")
+            continue
+        with open(path, "rb") as fh:
+            for bloque in iter(lambda: fh.read(1 << 20), b""):
+                h.update(bloque)
+    h.update(repr(sorted(config.items())).encode())
+    return h.hexdigest()[:16]
+
+
+def _ruta(directorio: Path, script: str, clave_: str, fase: str) -> Path:
+    return directorio / f"{script}_{clave_}_{fase}.pkl"
+
+
+def guardar(directorio: Path, script: str, clave_: str, fase: str, estado: dict):
+    t0 = time.perf_counter()
+    directorio.mkdir(parents=True, exist_ok=True)
+    path = _ruta(directorio, script, clave_, fase)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as fh:
+        pickle.dump({"version": VERSION, "fase": fase, "estado": estado}, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    mb = path.stat().st_size / 1e6
+    print(f"[LOG] Punto de control '{fase}' guardado ({mb:.1f} MB, {time.perf_counter() - t0:.2f}s)")
+
+
+def ultimo(directorio: Path, script: str, clave_: str, fases) -> tuple:
+    """(fase, estado) del punto mas avanzado valido para la clave; (None, None) si no hay."""
+    for fase in reversed(list(fases)):
+        path = _ruta(directorio, script, clave_, fase)
+        if not path.exists():
+            continue
+        try:
+            with open(path, "rb") as fh:
+                data = pickle.load(fh)
+        except Exception as e:
+            print(f"[LOG] Punto de control ilegible ({path.name}): {e}")
+            continue
+        if not isinstance(data, dict) or data.get("version") != VERSION or data.get("fase") != fase:
+            continue
+        print(f"[LOG] Retomando desde el punto de control '{fase}' ({path.name})")
+        return fase, data["estado"]
+    return None, None
+
+
+def existentes(directorio: Path, script: str, clave_: str, fases) -> list:
+    return [f for f in fases if _ruta(directorio, script, clave_, f).exists()]
+
+
+def limpiar(directorio: Path, script: str, conservar: str | None = None):
+    """Borra los puntos de `script`, salvo los de la clave `conservar`."""
+    if not directorio.exists():
+        return
+    for path in directorio.glob(f"{script}_*.pkl"):
+        if conservar is None or not path.name.startswith(f"{script}_{conservar}_"):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+"""Implementaciones de referencia congeladas para el arnes de equivalencia (scripts/equivalencia.py).
+
+Copia de `normalize_doc`, `_parse_valor_pagado` y del loop de asignacion del 02 y de
+`_parse_valor`, `_parse_codigo` y `_apply_daily_comparison_exclusions` del 03 tal como estaban
+antes de las rutas rapidas (commit baseline, antes de particiones, claves enteras y modulo
+parseo). No se editan: una ruta nueva se acepta si da lo mismo que esto.
+
+El loop de asignacion vivia dentro de main(); aqui es una funcion con la interfaz de
+`_procesar_particion` (mismas entradas y salidas) para poder reemplazarla en el 02. Las lineas
+de interfaz van marcadas con [interfaz]; la logica (claves (doc, dia) en tuplas, iterrows,
+asignacion fila por fila) es la original.
+"""
+import re
+from datetime import datetime
+from itertools import combinations
+
+import pandas as pd
+
+
+MONTH_MAP = {
+    1: 'ENERO', 2: 'FEBRERO', 3: 'MARZO', 4: 'ABRIL',
+    5: 'MAYO', 6: 'JUNIO', 7: 'JULIO', 8: 'AGOSTO',
+    9: 'SEPTIEMBRE', 10: 'OCTUBRE', 11: 'NOVIEMBRE', 12: 'DICIEMBRE',
+}
+
+EXPAND_MASTER = True        # crear filas nuevas si faltan pagos (solo caso factura igual con forma/valor distinto)
+
+# Rango de semanas (actualiza aquí cuando cambie el mes)
+WEEK_RANGES = {
+    'SEMANA1': (datetime(2026, 2, 2).date(), datetime(2026, 2, 7).date()),
+    'SEMANA2': (datetime(2026, 2, 9).date(), datetime(2026, 2, 14).date()),
+    'SEMANA3': (datetime(2026, 2, 16).date(), datetime(2026, 2, 21).date()),
+    'SEMANA4': (datetime(2026, 2, 23).date(), datetime(2026, 2, 28).date()),
+}
+
+def _week_from_date(d):
+    if not d:
+        return pd.NA
+    for name, (start, end) in WEEK_RANGES.items():
+        if start <= d <= end:
+            return name
+    return pd.NA
+
+
+# --- 02: documentos y montos ---
+
+def normalize_doc(doc):
+    if pd.isna(doc):
+        return ''
+    # Manejar numéricos y notación científica correctamente
+    if isinstance(doc, (int, float)):
+        try:
+            return str(int(round(doc)))
+        except Exception:
+            return str(doc).strip()
+    s = str(doc).strip()
+    if not s:
+        return ''
+    # Normalizar separadores y limpiar
+    s = s.replace(' ', '')
+    # Si viene con coma decimal, convertir a punto
+    if ',' in s and '.' not in s:
+        s = s.replace(',', '.')
+    # Limpiar caracteres no numéricos relevantes
+    s = re.sub(r'[^0-9eE\+\-\.]', '', s)
+    # Notación científica
+    if 'e' in s.lower():
+        try:
+            from decimal import Decimal
+            return str(int(Decimal(s)))
+        except Exception:
+            pass
+    # Decimal simple
+    if re.match(r'^\d+\.0+$', s):
+        return s.split('.')[0]
+    # Otros casos con punto
+    if '.' in s:
+        try:
+            return str(int(float(s)))
+        except Exception:
+            return s.split('.')[0]
+    # Si tiene más de 11 dígitos, recortar a 11 (nos quedamos con los últimos 11)
+    if re.match(r'^\d{12,}$', s):
+        s = s[-11:]
+    # Si quedó con 11 dígitos:
+    # - Si empieza con 1: eliminar el último dígito
+    # - Si no empieza con 1: eliminar el primer dígito
+    if re.match(r'^\d{11}$', s):
+        if s.startswith('1'):
+            return s[:-1]
+        return s[1:]
+    return s
+
+
+def parse_valor_pagado(val):
+    if pd.isna(val):
+        return 0
+    s = str(val).strip()
+    if not s:
+        return 0
+    # Quitar símbolos y espacios
+    s = re.sub(r'[^0-9\.,\-]', '', s)
+    if not s:
+        return 0
+    # Si tiene coma, asumir coma decimal y punto miles
+    if ',' in s:
+        s = s.replace('.', '').replace(',', '.')
+    else:
+        # Sin coma: si termina en .0/.00 lo tratamos como decimal y quitamos solo la parte decimal
+        if re.match(r'^\d+\.0+$', s):
+            s = s.split('.')[0]
+        else:
+            # Sin coma: asumir puntos como miles
+            s = s.replace('.', '')
+    try:
+        return int(float(s))
+    except Exception:
+        return 0
+
+
+# --- 02: loop de asignacion ---
+
+def procesar_particion(df_master, df_pagos_clean, factura_col, forma_col, facturador_col):
+    # [interfaz] Mismo contrato que _procesar_particion del 02: filas nuevas marcadas con
+    # _nueva_tipo/_nueva_orden (el id_registro lo pone el 02 al unir), huella del pago en _huella,
+    # claves sin match en missing_log (el 02 imprime el log) y contadores en stats.
+    # Limpiar valores previos en maestro para las fechas/documentos que vamos a recalcular
+    keys = set(zip(df_pagos_clean['doc_norm'], df_pagos_clean['Fecha_dia']))
+    df_master['Fecha_dia'] = df_master['Fecha_dt'].dt.date
+    mask = df_master.apply(lambda r: (r['doc_norm'], r['Fecha_dia']) in keys, axis=1)
+    cols_clear = ['Recaudo (venta día)', 'Asesor_Comercial', 'Factura', 'Metodo_Pago', 'Efectivo']
+    for col in cols_clear:
+        if col in df_master.columns:
+            df_master.loc[mask, col] = pd.NA
+
+    # 2. Agrupar pagos por Paciente y Fecha (Día) SIN SUMAR
+    # Clave: (doc_norm, fecha_date) -> {pagos: [...], factura_counts: {factura: set((forma, valor))}}
+    daily_payments = {}
+    pagos_by_key = {}
+    for _, row in df_pagos_clean.iterrows():
+        doc = row['doc_norm']
+        if not doc:
+            continue
+
+        if pd.isna(row['Fecha_dt']):
+            continue
+        day_key = (doc, row['Fecha_dia'])
+        pagos_by_key.setdefault(day_key, []).append(row)
+
+        valor = row.get('valor_pagado_num', 0)
+        try:
+            valor = float(valor)
+        except:
+            valor = 0
+
+        if day_key not in daily_payments:
+            daily_payments[day_key] = {'pagos': [], 'factura_counts': {}}
+
+        if valor > 0:
+            factura_val = ''
+            if factura_col:
+                factura_val = row.get(factura_col, '')
+            if pd.isna(factura_val) or str(factura_val).strip().lower() in ('nan', 'none'):
+                factura_val = ''
+            factura_vacia = str(factura_val).strip() == ''
+            forma_val = row.get(forma_col, '') if forma_col else ''
+            daily_payments[day_key]['pagos'].append({
+                'valor': valor,
+                'factura_vacia': factura_vacia,
+                'facturador': row.get(facturador_col, '') if facturador_col else '',
+                'huella': row['huella'],  # [interfaz]
+                'factura': str(factura_val).strip(),
+                'forma': str(forma_val).strip(),
+            })
+            # Track distinct (forma, valor) per factura
+            factura_key = str(factura_val).strip()
+            fv_set = daily_payments[day_key]['factura_counts'].setdefault(factura_key, set())
+            fv_set.add((str(forma_val).strip(), valor))
+
+    # 3. Asignar al Maestro
+    # Convertir columna a objeto para evitar FutureWarning si estaba vacía (float/NaN)
+    df_master['Asesor_Comercial'] = df_master['Asesor_Comercial'].astype(object)
+
+    updates_asesor = 0
+    updates_efectivo = 0
+    updates_recaudo = 0 # Nuevo contador
+
+    # Expandir maestro si faltan filas por:
+    # - misma factura con forma/valor distintos
+    # - pagos con factura vacía
+    key_to_rows = {}
+    for idx, row in df_master.iterrows():
+        doc = row['doc_norm']
+        if pd.isna(row['Fecha_dt']):
+            continue
+        key = (doc, row['Fecha_dt'].date())
+        key_to_rows.setdefault(key, []).append(idx)
+
+    rows_to_append = []
+
+    # Log: documentos/fechas que no existen en el maestro
+    missing_keys = []
+    for key in daily_payments.keys():
+        if key not in key_to_rows:
+            missing_keys.append(key)
+    # [interfaz] En lugar de imprimir el log aquí, se devuelve en el formato de _procesar_particion
+    missing_log = []
+    for key in missing_keys:
+        rows = pagos_by_key.get(key, [])
+        if not rows:
+            continue
+        r0 = rows[0]
+        missing_log.append((r0['_orden_clave'], key, str(r0.get('paciente', '')).strip()))
+
+    # Si no hay match en el maestro, agregar filas nuevas al final con datos mínimos
+    rows_added_missing = 0
+    if EXPAND_MASTER and missing_keys:
+        for key in missing_keys:
+            pagos_list = pagos_by_key.get(key, [])
+            for pago_row in pagos_list:
+                new_row = {col: pd.NA for col in df_master.columns}
+                new_row['_nueva_tipo'] = 0  # [interfaz]
+                new_row['_nueva_orden'] = pago_row['_orden_clave']  # [interfaz]
+                new_row['Numero_Documento'] = key[0]
+                pac = str(pago_row.get('paciente', '')).strip()
+                new_row['Paciente'] = pac if pac else pd.NA
+                dt = pd.to_datetime(key[1], errors='coerce')
+                if pd.notna(dt):
+                    new_row['Fecha'] = dt.strftime('%d/%m/%Y')
+                    new_row['Año'] = dt.year
+                    new_row['Mes'] = MONTH_MAP.get(dt.month, pd.NA)
+                new_row['Semana'] = _week_from_date(key[1])
+                new_row['doc_norm'] = key[0]
+                new_row['Fecha_dt'] = pd.to_datetime(key[1], errors='coerce')
+                new_row['Fecha_dia'] = key[1]
+                rows_to_append.append(new_row)
+                rows_added_missing += 1
+
+    for key, info in daily_payments.items():
+        if key not in key_to_rows:
+            continue
+        rows = key_to_rows[key]
+        needed = len(info['pagos']) - len(rows)
+        if needed > 0:
+            # Expandir si hay facturas con múltiples (forma,valor) o pagos con factura vacía
+            has_multi_for_factura = any(len(v) > 1 for v in info['factura_counts'].values())
+            has_empty_factura = any(p.get('factura_vacia') for p in info['pagos'])
+            if has_multi_for_factura or has_empty_factura:
+                template = df_master.loc[rows[0]].copy()
+                template['_nueva_tipo'] = 1  # [interfaz]
+                template['_nueva_orden'] = pagos_by_key[key][0]['_orden_clave']  # [interfaz]
+                for _ in range(needed):
+                    rows_to_append.append(template.copy())
+
+    rows_added = len(rows_to_append)
+    if EXPAND_MASTER and rows_to_append:
+        df_master = pd.concat([df_master, pd.DataFrame(rows_to_append)], ignore_index=True)
+        # Recalcular índice de filas por clave después de expandir
+        key_to_rows = {}
+        for idx, row in df_master.iterrows():
+            doc = row['doc_norm']
+            if pd.isna(row['Fecha_dt']):
+                continue
+            key = (doc, row['Fecha_dt'].date())
+            key_to_rows.setdefault(key, []).append(idx)
+
+    for idx, row in df_master.iterrows():
+        doc = row['doc_norm']
+        if pd.isna(row['Fecha_dt']):
+            continue
+        fecha_cita_date = row['Fecha_dt'].date()
+        key = (doc, fecha_cita_date)
+
+        if key in daily_payments:
+            info = daily_payments[key]
+
+            # Recaudo: asignar un pago por fila (sin sumar)
+            if info['pagos']:
+                pago = info['pagos'].pop(0)
+                factura_vacia = bool(pago.get('factura_vacia'))
+                if not factura_vacia:
+                    valor_asignado = pago['valor']
+                    try:
+                        valor_asignado = int(valor_asignado)
+                    except Exception:
+                        pass
+                    df_master.at[idx, 'Recaudo (venta día)'] = valor_asignado
+                    updates_recaudo += 1
+                # Siempre marcar efectivo si hay pago, pero sin recaudo si no hay factura
+                df_master.at[idx, 'Efectivo'] = 1
+                df_master.at[idx, '_huella'] = pago['huella']  # [interfaz]
+                updates_efectivo += 1
+                # Factura y Metodo_Pago del pago asignado
+                df_master.at[idx, 'Factura'] = pago.get('factura', '')
+                df_master.at[idx, 'Metodo_Pago'] = pago.get('forma', '')
+                # Asesor_Comercial: solo el facturador de este pago
+                fact_name = str(pago.get('facturador', '')).strip()
+                if fact_name:
+                    df_master.at[idx, 'Asesor_Comercial'] = fact_name
+                    updates_asesor += 1
+
+    # [interfaz]
+    stats = {
+        'rows_added': rows_added,
+        'rows_added_missing': rows_added_missing,
+        'updates_recaudo': updates_recaudo,
+        'updates_asesor': updates_asesor,
+        'updates_efectivo': updates_efectivo,
+    }
+    return df_master, missing_log, stats
+
+
+# --- 03: montos, codigos y exclusiones por diferencia diaria ---
+
+def parse_valor(v):
+    if pd.isna(v):
+        return 0
+    if isinstance(v, (int, float)):
+        return int(round(v))
+    s = str(v).strip().replace(",", "")
+    try:
+        return int(round(float(s)))
+    except Exception:
+        return 0
+
+
+def parse_codigo(codigo: str):
+    txt = "" if pd.isna(codigo) else str(codigo).strip()
+    m = re.search(r"([A-Za-z]+)\s*-\s*(\d+)", txt)
+    if not m:
+        return "", ""
+    return m.group(1).upper(), m.group(2)
+
+
+def _find_docs_to_exclude(doc_sums: pd.Series, diff: int):
+    if diff <= 0 or doc_sums.empty:
+        return []
+
+    exact = doc_sums[doc_sums == diff]
+    if not exact.empty:
+        return [exact.index[0]]
+
+    doc_items = list(doc_sums.items())
+    for r in (2, 3):
+        for combo in combinations(doc_items, r):
+            if sum(v for _, v in combo) == diff:
+                return [k for k, _ in combo]
+
+    return []
+
+
+def apply_daily_comparison_exclusions(df: pd.DataFrame):
+    if df.empty:
+        return df.copy(), pd.DataFrame()
+
+    work = df.copy()
+    work["Excluir_Ajuste"] = False
+
+    control_rows = []
+
+    for fecha, g in work.groupby("Fecha", dropna=False):
+        total_listado = int(g["Recaudo (venta dia)"].sum())
+        total_documentos_vals = g["Total_Documentos_JSON"].dropna().astype(int)
+        total_documentos = int(total_documentos_vals.iloc[0]) if not total_documentos_vals.empty else 0
+
+        if total_documentos <= 0:
+            control_rows.append(
+                {
+                    "Fecha": fecha,
+                    "Total_Listado": total_listado,
+                    "Total_Documentos": total_documentos,
+                    "Diferencia": None,
+                    "Documentos_Excluidos": "",
+                    "Valor_Excluido": 0,
+                    "Estado": "SIN_TOTAL_DOCUMENTOS",
+                }
+            )
+            continue
+
+        diff = total_listado - total_documentos
+        excluded_docs = []
+        excluded_val = 0
+        status = "OK"
+
+        if diff > 0:
+            doc_sums = g.groupby("Codigo_Tipo_Doc")["Recaudo (venta dia)"].sum().sort_values(ascending=False)
+            excluded_docs = _find_docs_to_exclude(doc_sums, diff)
+            if excluded_docs:
+                mask = (work["Fecha"] == fecha) & (work["Codigo_Tipo_Doc"].isin(excluded_docs))
+                work.loc[mask, "Excluir_Ajuste"] = True
+                excluded_val = int(work.loc[mask, "Recaudo (venta dia)"].sum())
+                status = "EXCLUIDO_POR_DIFERENCIA"
+            else:
+                status = "DIFERENCIA_SIN_MATCH"
+        elif diff < 0:
+            status = "LISTADO_MENOR_A_TOTAL"
+
+        control_rows.append(
+            {
+                "Fecha": fecha,
+                "Total_Listado": total_listado,
+                "Total_Documentos": total_documentos,
+                "Diferencia": diff,
+                "Documentos_Excluidos": " | ".join(excluded_docs),
+                "Valor_Excluido": excluded_val,
+                "Estado": status,
+            }
+        )
+
+    control = pd.DataFrame(control_rows)
+    filtered = work[~work["Excluir_Ajuste"]].copy()
+    return filtered, control